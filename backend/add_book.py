@@ -3,6 +3,7 @@ Script para adicionar um livro ao banco de dados diretamente.
 """
 from app import create_app, db
 from app.modules.inventory.models import Book, Transaction
+from app.modules.logistics.occupancy import apply_occupancy_changes
 from app.modules.user_management.models import User
 
 app = create_app()
@@ -42,6 +43,7 @@ with app.app_context():
         notes='Livro adicionado via script'
     )
     db.session.add(transaction)
+    apply_occupancy_changes([(book.storage_section, book.status, 1)])
     db.session.commit()
     
     print(f"Livro '{book.title}' adicionado com sucesso!")
@@ -3,6 +3,7 @@ Script para adicionar mais livros ao banco de dados.
 """
 from app import create_app, db
 from app.modules.inventory.models import Book, Transaction
+from app.modules.logistics.occupancy import apply_occupancy_changes
 from app.modules.user_management.models import User
 
 app = create_app()
@@ -74,7 +75,8 @@ with app.app_context():
             storage_section=book_data['storage_section']
         )
         db.session.add(book)
-        db.session.commit()
+        # Flush para obter o id do livro sem fazer commit a cada livro
+        db.session.flush()
         
         # Criar transação
         transaction = Transaction(
@@ -85,8 +87,11 @@ with app.app_context():
             notes='Livro adicionado via script'
         )
         db.session.add(transaction)
-        db.session.commit()
+        apply_occupancy_changes([(book.storage_section, book.status, 1)])
         
         print(f"Livro '{book.title}' adicionado com sucesso! ID: {book.id}")
     
+    # Um único commit para todos os livros e transações
+    db.session.commit()
+    
     print("\nTodos os livros foram adicionados com sucesso!") 
\ No newline at end of file
@@ -25,6 +25,10 @@ def create_app(test_config=None):
     """
     app = Flask(__name__, instance_relative_config=True)
     
+    # JSON provider que aceita fragmentos já serializados (ver app.serialization)
+    from app.serialization import FragmentJSONProvider
+    app.json = FragmentJSONProvider(app)
+    
     # Default configuration
     app.config.from_mapping(
         SECRET_KEY=os.environ.get('SECRET_KEY', 'dev_key_not_for_production'),
@@ -51,7 +55,26 @@ def create_app(test_config=None):
     
     # Importar e registrar blueprints
     from app.modules.inventory.routes import inventory_bp
+    from app.modules.logistics.routes import logistics_bp
+    from app.modules.reporting.routes import reporting_bp
     app.register_blueprint(inventory_bp)
+    app.register_blueprint(logistics_bp)
+    app.register_blueprint(reporting_bp)
+    
+    # Agregados diários de transações, mantidos por gatilho (ver app.modules.reporting.rollups)
+    from app.modules.reporting import rollups  # noqa: F401
+    
+    # Cache de relatórios compartilhado entre os workers (ver app.report_cache)
+    from app.report_cache import init_report_cache
+    init_report_cache(app)
+    
+    # Exportações de relatórios em segundo plano (ver app.modules.reporting.jobs)
+    from app.modules.reporting.jobs import init_report_jobs
+    init_report_jobs(app)
+    
+    # Registrar comandos de manutenção (flask <comando>)
+    from app.commands import register_commands
+    register_commands(app)
     
     # Mantendo as rotas temporárias até que todos os blueprints estejam prontos
     @app.route('/health')
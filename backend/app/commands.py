@@ -0,0 +1,74 @@
+"""
+Flask CLI commands for the Book Logistics API.
+"""
+import click
+from app import db
+
+
+def register_commands(app):
+    """Register the maintenance commands on the app's CLI."""
+
+    @app.cli.command('rebuild-occupancy')
+    def rebuild_occupancy_command():
+        """Recompute the section occupancy counters from the books table."""
+        from app.modules.logistics.occupancy import rebuild_occupancy
+
+        sections = rebuild_occupancy()
+        db.session.commit()
+        click.echo(f'Rebuilt occupancy counters for {sections} sections')
+
+    @app.cli.command('rebuild-rollups')
+    @click.option('--since', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Only rebuild the days from this date (YYYY-MM-DD) on.')
+    def rebuild_rollups_command(since):
+        """Recompute the daily transaction rollups from the transactions table."""
+        from app.modules.reporting.rollups import rebuild_rollups
+
+        rows = rebuild_rollups(since.date() if since else None)
+        db.session.commit()
+        click.echo(f'Rebuilt {rows} daily rollup rows')
+
+    @app.cli.command('clear-report-cache')
+    def clear_report_cache():
+        """Remove every cached report response."""
+        from app.report_cache import get_report_cache
+
+        cache = get_report_cache()
+        if cache is None:
+            raise click.ClickException('The report cache is disabled')
+        cache.clear()
+        click.echo('Report cache cleared')
+
+    @app.cli.command('purge-report-jobs')
+    @click.option('--days', type=click.IntRange(min=0), default=7, show_default=True,
+                  help='Delete the jobs created more than this many days ago.')
+    def purge_report_jobs_command(days):
+        """Delete old report export jobs and their files."""
+        from datetime import timedelta
+        from app.modules.reporting.jobs import purge_report_jobs
+
+        jobs = purge_report_jobs(timedelta(days=days))
+        db.session.commit()
+        click.echo(f'Deleted {jobs} report jobs')
+
+    @app.cli.command('refresh-analytics-snapshot')
+    @click.option('--full', is_flag=True, help='Rebuild the snapshot from scratch instead of appending.')
+    def refresh_analytics_snapshot_command(full):
+        """Export new transactions to the columnar analytics snapshot."""
+        from app.modules.reporting.columnar import SnapshotBusy, refresh_snapshot
+
+        try:
+            manifest, exported = refresh_snapshot(full=full)
+        except SnapshotBusy as e:
+            raise click.ClickException(str(e))
+        click.echo(f'Exported {exported} transactions ({manifest["rows"]} in the snapshot, '
+                   f'up to id {manifest["watermark"]})')
+
+    @app.cli.command('refresh-similar-books')
+    @click.option('--full', is_flag=True, help='Rebuild the index from scratch instead of adding the new books.')
+    def refresh_similar_books_command(full):
+        """Add new books to the similar books index, or rebuild it."""
+        from app.modules.inventory.similarity import refresh_similarity_index
+
+        books, works = refresh_similarity_index(full=full)
+        click.echo(f'Indexed {books} books ({works} new titles)')
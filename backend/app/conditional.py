@@ -0,0 +1,50 @@
+"""
+HTTP conditional request helpers (ETag / Last-Modified).
+
+Validators are computed from cheap database reads so that unchanged
+resources can be answered with `304 Not Modified` before any row is
+loaded or serialized.
+"""
+import hashlib
+from datetime import timezone
+from flask import Response, request
+
+
+def compute_etag(*parts):
+    """Build an ETag value from the parts that identify a representation."""
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _as_http_date(value):
+    """Convert a naive UTC datetime to an aware one truncated to seconds."""
+    if value is None:
+        return None
+    return value.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def is_not_modified(etag, last_modified=None):
+    """
+    Evaluate If-None-Match / If-Modified-Since against the current validators.
+
+    If-None-Match takes precedence, as required by RFC 9110.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return _as_http_date(last_modified) <= request.if_modified_since
+    return False
+
+
+def set_validators(response, etag, last_modified=None, weak=True):
+    """Attach ETag, Last-Modified and a revalidation policy to a response."""
+    response.set_etag(etag, weak=weak)
+    if last_modified is not None:
+        response.last_modified = _as_http_date(last_modified)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def not_modified_response(etag, last_modified=None, weak=True):
+    """Build an empty 304 response carrying the validators."""
+    return set_validators(Response(status=304), etag, last_modified, weak=weak)
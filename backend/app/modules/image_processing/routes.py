@@ -10,6 +10,8 @@ from werkzeug.utils import secure_filename
 from PIL import Image
 from app import db
 from app.modules.inventory.models import Book
+from app.modules.logistics.occupancy import SectionCapacityExceeded, apply_occupancy_changes
+from app.modules.logistics.slotting import plan_slots
 
 image_bp = Blueprint('image', __name__, url_prefix='/api/images')
 
@@ -79,10 +81,12 @@ def process_book_image(image_path):
         'author': 'Sample Author',
         'genre': 'Fiction',
         'description': 'This is a sample book description that would be generated by the AI service.',
-        'suggested_storage_section': 'Fiction-A3',
         'confidence_score': 0.85
     }
     
+    # Suggest the section the slotting engine would pick for this genre
+    book_info['suggested_storage_section'] = plan_slots([{'genre': book_info['genre']}])[0]
+    
     return book_info
 
 @image_bp.route('/analyze', methods=['POST'])
@@ -133,6 +137,12 @@ def analyze_and_create_book():
     )
     
     db.session.add(book)
+    db.session.flush()
+    try:
+        apply_occupancy_changes([(book.storage_section, book.status, 1)])
+    except SectionCapacityExceeded as e:
+        db.session.rollback()
+        return jsonify({'error': f'Storage section {e.section} is full'}), 409
     db.session.commit()
     
     return jsonify({
@@ -0,0 +1,162 @@
+"""
+Bulk book ingestion: incremental parsing of request bodies and batched inserts.
+"""
+import codecs
+import json
+from sqlalchemy import insert
+from app import db
+from app.modules.inventory.models import Book, Transaction
+from app.modules.logistics.occupancy import apply_occupancy_changes
+
+BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 64 * 1024
+
+# Fields accepted for each incoming book; `notes` goes to the addition transaction
+BOOK_INPUT_FIELDS = ('title', 'author', 'genre', 'description', 'storage_section', 'image_path')
+REQUIRED_FIELDS = ('title', 'author')
+
+
+def _read_text(stream):
+    """Yield decoded text chunks from a binary stream."""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        chunk = stream.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+def iter_ndjson(stream):
+    """Yield one decoded value per non-empty line of an NDJSON stream."""
+    buffer = ''
+    for text in _read_text(stream):
+        buffer += text
+        *lines, buffer = buffer.split('\n')
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if buffer.strip():
+        yield json.loads(buffer)
+
+
+def iter_json_array(stream):
+    """Yield the elements of a top-level JSON array without loading it whole."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = finished = False
+    chunks = _read_text(stream)
+    exhausted = False
+
+    while True:
+        # Skip whitespace and separators between elements
+        while position < len(buffer) and (buffer[position].isspace() or (started and buffer[position] == ',')):
+            position += 1
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != '[':
+                    raise ValueError('Expected a JSON array')
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                finished = True
+                break
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if exhausted:
+                    raise
+            else:
+                # A number may continue in the next chunk, so wait for a delimiter
+                if end < len(buffer) or exhausted:
+                    yield value
+                    buffer = buffer[end:]
+                    position = 0
+                    continue
+        if exhausted:
+            break
+        try:
+            buffer += next(chunks)
+        except StopIteration:
+            exhausted = True
+
+    if not finished:
+        raise ValueError('Unterminated JSON array')
+
+
+def validate_book_row(row):
+    """
+    Validate one incoming book.
+
+    Returns:
+        Error message, or None when the row is valid
+    """
+    if not isinstance(row, dict):
+        return 'Row must be a JSON object'
+    for field in REQUIRED_FIELDS:
+        if not row.get(field):
+            return f'Missing required field: {field}'
+    for field in BOOK_INPUT_FIELDS + ('notes',):
+        value = row.get(field)
+        if value is not None and not isinstance(value, str):
+            return f'Field {field} must be a string'
+    for field in BOOK_INPUT_FIELDS:
+        max_length = getattr(Book.__table__.c[field].type, 'length', None)
+        if max_length and row.get(field) and len(row[field]) > max_length:
+            return f'Field {field} exceeds {max_length} characters'
+    velocity = row.get('velocity')
+    if velocity is not None and (not isinstance(velocity, (int, float)) or isinstance(velocity, bool) or velocity < 0):
+        return 'Field velocity must be a non-negative number'
+    return None
+
+
+def insert_book_batch(rows, user_id):
+    """
+    Insert a batch of validated books and their addition transactions.
+
+    Uses one multi-row INSERT ... RETURNING for the books and one executemany
+    for the transactions, then adds the books to the section occupancy
+    counters. The caller owns the database transaction.
+
+    Args:
+        rows: List of validated row dictionaries
+        user_id: User recorded on the addition transactions
+
+    Returns:
+        List with the new book ids, in the same order as `rows`
+    """
+    if not rows:
+        return []
+
+    book_params = [{field: row.get(field) for field in BOOK_INPUT_FIELDS} for row in rows]
+    for params in book_params:
+        params['status'] = 'available'
+
+    connection = db.session.connection()
+    if connection.dialect.insert_executemany_returning_sort_by_parameter_order:
+        result = connection.execute(
+            insert(Book.__table__).returning(Book.__table__.c.id, sort_by_parameter_order=True),
+            book_params
+        )
+        book_ids = [row.id for row in result]
+    else:
+        book_ids = [
+            connection.execute(insert(Book.__table__), params).inserted_primary_key[0]
+            for params in book_params
+        ]
+
+    connection.execute(insert(Transaction.__table__), [
+        {
+            'book_id': book_id,
+            'user_id': user_id,
+            'transaction_type': 'addition',
+            'from_section': None,
+            'to_section': row.get('storage_section'),
+            'notes': row.get('notes'),
+        }
+        for book_id, row in zip(book_ids, rows)
+    ])
+    apply_occupancy_changes((params['storage_section'], 'available', 1) for params in book_params)
+    return book_ids
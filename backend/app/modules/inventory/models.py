@@ -3,10 +3,16 @@ Inventory models for the Book Logistics API.
 """
 from datetime import datetime
 from app import db
+from app.serialization import RowSerializer, fragment_cache
 
 class Book(db.Model):
     """Book model for inventory management."""
     __tablename__ = 'books'
+    __table_args__ = (
+        db.Index('ix_books_section_status_genre', 'storage_section', 'status', 'genre'),
+        db.Index('ix_books_status_genre', 'status', 'genre'),
+        db.Index('ix_books_genre', 'genre'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -16,6 +22,7 @@ class Book(db.Model):
     storage_section = db.Column(db.String(50), nullable=True)
     image_path = db.Column(db.String(255), nullable=True)
     status = db.Column(db.String(20), default='available')  # available, sold, reserved
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # optimistic locking
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -39,6 +46,7 @@ class Book(db.Model):
             'storage_section': self.storage_section,
             'image_path': self.image_path,
             'status': self.status,
+            'version': self.version,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
@@ -49,6 +57,13 @@ class Book(db.Model):
 class Transaction(db.Model):
     """Transaction model for tracking book sales and movements."""
     __tablename__ = 'transactions'
+    __table_args__ = (
+        db.Index('ix_transactions_type_created_at', 'transaction_type', 'created_at'),
+        db.Index('ix_transactions_user_type_created_at', 'user_id', 'transaction_type', 'created_at'),
+        db.Index('ix_transactions_from_section_type', 'from_section', 'transaction_type'),
+        db.Index('ix_transactions_book_id_created_at', 'book_id', 'created_at'),
+        db.Index('ix_transactions_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     book_id = db.Column(db.Integer, db.ForeignKey('books.id'), nullable=False)
@@ -85,4 +100,8 @@ class Transaction(db.Model):
         }
     
     def __repr__(self):
-        return f'<Transaction {self.id} - {self.transaction_type}>' 
\ No newline at end of file
+        return f'<Transaction {self.id} - {self.transaction_type}>'
+
+# Core row serializers used by the list endpoints (same shape as to_dict())
+book_serializer = RowSerializer(Book.__table__, cache=fragment_cache)
+transaction_serializer = RowSerializer(Transaction.__table__)
@@ -0,0 +1,185 @@
+"""
+Atomic write operations on books.
+
+Every state change is a single conditional UPDATE guarded by the book's
+`status` and/or `version`, so concurrent requests cannot both succeed
+(e.g. two registers selling the same copy). The caller owns the database
+transaction and records the matching Transaction rows.
+"""
+import re
+from datetime import datetime
+from flask import request
+from sqlalchemy import select, tuple_, update
+from app import db
+from app.modules.inventory.models import Book, book_serializer
+
+_ENTITY_TAG_PATTERN = re.compile(r'^(\d+)-(\d+)$')
+
+# Maximum number of ids per IN list in bulk operations
+BULK_CHUNK_SIZE = 500
+
+
+class BookUpdateRejected(Exception):
+    """Raised when a conditional update on a book matches no row."""
+
+    def __init__(self, reason, current_status=None):
+        # reason: 'not_found', 'not_available' or 'conflict'
+        super().__init__(reason)
+        self.reason = reason
+        self.current_status = current_status
+
+
+def book_entity_tag(book_id, version):
+    """Strong ETag for a single book; changes whenever its version does."""
+    return f'{book_id}-{version}'
+
+
+def expected_version_from_request(book_id):
+    """
+    Read the version the client expects from the If-Match header.
+
+    Returns:
+        The expected version, or None when If-Match is absent or `*`
+
+    Raises:
+        BookUpdateRejected: If If-Match does not name a version of this book
+    """
+    if not request.if_match or request.if_match.star_tag:
+        return None
+    for tag in request.if_match.as_set():
+        match = _ENTITY_TAG_PATTERN.match(tag)
+        if match and int(match.group(1)) == book_id:
+            return int(match.group(2))
+    raise BookUpdateRejected('conflict')
+
+
+def get_book_row(book_id):
+    """Fetch a book as a Core row laid out for book_serializer, or None."""
+    return db.session.execute(select(*book_serializer.columns()).where(Book.id == book_id)).first()
+
+
+def conditional_book_update(book_id, values, require_status=None, expected_version=None):
+    """
+    Update a book in one statement, only if it is in the expected state.
+
+    Args:
+        book_id: Book to update
+        values: Column values to set; `version` and `updated_at` are bumped automatically
+        require_status: Only update if the book currently has this status
+        expected_version: Only update if the book currently has this version
+
+    Returns:
+        Core row with the book after the update, laid out for book_serializer
+
+    Raises:
+        BookUpdateRejected: If no row matched; `reason` tells why
+    """
+    statement = (
+        update(Book.__table__)
+        .where(Book.id == book_id)
+        .values(**values, version=Book.version + 1, updated_at=datetime.utcnow())
+    )
+    if require_status is not None:
+        statement = statement.where(Book.status == require_status)
+    if expected_version is not None:
+        statement = statement.where(Book.version == expected_version)
+
+    connection = db.session.connection()
+    if connection.dialect.update_returning:
+        row = connection.execute(statement.returning(*book_serializer.columns())).first()
+    elif connection.execute(statement).rowcount:
+        row = get_book_row(book_id)
+    else:
+        row = None
+
+    if row is not None:
+        return row
+
+    # Nothing matched: one extra read on the failure path to explain why
+    current = connection.execute(select(Book.status, Book.version).where(Book.id == book_id)).first()
+    if current is None:
+        raise BookUpdateRejected('not_found')
+    if expected_version is not None and current.version != expected_version:
+        raise BookUpdateRejected('conflict', current.status)
+    raise BookUpdateRejected('not_available', current.status)
+
+
+def bulk_conditional_book_update(book_ids, values, require_status=None):
+    """
+    Apply the same change to many books with set-based statements.
+
+    For each chunk of ids the current state is read with one SELECT and the
+    change is written with one UPDATE guarded by `(id, version)`, so a book
+    changed concurrently between both statements is rejected, never
+    overwritten.
+
+    Args:
+        book_ids: Books to update (duplicates are ignored)
+        values: Column values to set; `version` and `updated_at` are bumped automatically
+        require_status: Only update books that currently have this status
+
+    Returns:
+        Tuple `(updated, rejected)`: `updated` lists the rows (id, status,
+        storage_section, version) of the updated books as they were *before*
+        the update; `rejected` lists BookUpdateRejected errors with a `book_id`
+    """
+    book_ids = list(dict.fromkeys(book_ids))
+    updated = []
+    rejected = []
+    connection = db.session.connection()
+    now = datetime.utcnow()
+
+    def reject(book_id, reason, current_status=None):
+        error = BookUpdateRejected(reason, current_status)
+        error.book_id = book_id
+        rejected.append(error)
+
+    for start in range(0, len(book_ids), BULK_CHUNK_SIZE):
+        chunk = book_ids[start:start + BULK_CHUNK_SIZE]
+        current = {
+            row.id: row
+            for row in connection.execute(
+                select(Book.id, Book.status, Book.storage_section, Book.version).where(Book.id.in_(chunk))
+            )
+        }
+
+        candidates = []
+        for book_id in chunk:
+            row = current.get(book_id)
+            if row is None:
+                reject(book_id, 'not_found')
+            elif require_status is not None and row.status != require_status:
+                reject(book_id, 'not_available', row.status)
+            else:
+                candidates.append(row)
+        if not candidates:
+            continue
+
+        statement = (
+            update(Book.__table__)
+            .values(**values, version=Book.version + 1, updated_at=now)
+        )
+        if require_status is not None:
+            statement = statement.where(Book.status == require_status)
+
+        if connection.dialect.update_returning:
+            guarded = statement.where(
+                tuple_(Book.id, Book.version).in_([(row.id, row.version) for row in candidates])
+            )
+            matched = set(connection.execute(guarded.returning(Book.id)).scalars())
+        else:
+            matched = {
+                row.id for row in candidates
+                if connection.execute(
+                    statement.where(Book.id == row.id, Book.version == row.version)
+                ).rowcount
+            }
+
+        for row in candidates:
+            if row.id in matched:
+                updated.append(row)
+            else:
+                reject(row.id, 'conflict')
+
+    return updated, rejected
+
@@ -0,0 +1,88 @@
+"""
+Keyset pagination and sparse fieldset helpers for the inventory listings.
+"""
+import base64
+import json
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(values):
+    """Encode the sort key of the last row of a page as an opaque cursor."""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, expected_length, datetime_positions=()):
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor: Opaque cursor string received from the client
+        expected_length: Number of values in the sort key
+        datetime_positions: Indexes of the key values that are datetimes;
+            the others must be integers
+
+    Returns:
+        List with the sort key values
+
+    Raises:
+        ValueError: If the cursor is malformed, always with the message
+            'Invalid cursor'
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(values, list) or len(values) != expected_length:
+            raise ValueError
+        for position, value in enumerate(values):
+            if position in datetime_positions:
+                values[position] = datetime.fromisoformat(value)
+            elif not isinstance(value, int) or isinstance(value, bool):
+                raise ValueError
+    except (ValueError, TypeError, UnicodeError):
+        raise ValueError('Invalid cursor') from None
+    return values
+
+
+def parse_limit(raw_limit):
+    """Parse the requested page size, capping it at MAX_PAGE_SIZE."""
+    if raw_limit is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(raw_limit)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def parse_fields(raw_fields, allowed):
+    """
+    Parse a comma separated `fields` parameter.
+
+    Args:
+        raw_fields: Value of the `fields` query parameter (or None)
+        allowed: Ordered collection with the selectable field names
+
+    Returns:
+        List of requested field names, or all allowed fields when omitted
+
+    Raises:
+        ValueError: If an unknown field is requested
+    """
+    if not raw_fields:
+        return list(allowed)
+    fields = []
+    for name in raw_fields.split(','):
+        name = name.strip()
+        if not name or name in fields:
+            continue
+        if name not in allowed:
+            raise ValueError(f'Unknown field: {name}')
+        fields.append(name)
+    return fields
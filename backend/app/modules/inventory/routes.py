@@ -1,47 +1,171 @@
 """
 Inventory routes for the Book Logistics API.
 """
+from datetime import datetime, timezone
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt, verify_jwt_in_request
+from sqlalchemy import func, insert, tuple_
 from app import db
-from app.modules.inventory.models import Book, Transaction
+from app.conditional import compute_etag, is_not_modified, not_modified_response, set_validators
+from app.modules.inventory.models import Book, Transaction, book_serializer, transaction_serializer
+from app.modules.inventory.ingestion import (
+    BATCH_SIZE, insert_book_batch, iter_json_array, iter_ndjson, validate_book_row
+)
+from app.modules.inventory.operations import (
+    BookUpdateRejected, book_entity_tag, bulk_conditional_book_update, conditional_book_update,
+    expected_version_from_request, get_book_row
+)
+from app.modules.inventory.pagination import encode_cursor, decode_cursor, parse_limit, parse_fields
+from app.modules.inventory.search import build_search_query, extract_terms
+from app.modules.inventory.similarity import SIMILAR_TOP_K, load_similarity_index
+from app.modules.logistics.occupancy import SectionCapacityExceeded, apply_occupancy_changes, transition
+from app.modules.logistics.slotting import plan_slots
 from app.modules.user_management.models import User
+from app.streaming import iter_rows, ndjson_requested, stream_response, streaming_requested
 
 inventory_bp = Blueprint('inventory', __name__, url_prefix='/api/inventory')
 
+# Columns exposed by the listing endpoints, in response order
+BOOK_FIELDS = book_serializer.fields
+UPDATABLE_BOOK_FIELDS = (
+    'title', 'author', 'genre', 'description', 'storage_section', 'image_path', 'status'
+)
+TRANSACTION_FIELDS = (
+    'id', 'book_id', 'user_id', 'transaction_type', 'from_section',
+    'to_section', 'notes', 'created_at', 'book', 'user'
+)
+# Copies looked up per similar title when picking the one to show
+MAX_COPIES_PER_TITLE = 20
+
 @inventory_bp.route('/books', methods=['GET'])
 # Temporariamente removido para testes: @jwt_required()
 def get_books():
-    """Get all books with optional filtering."""
+    """
+    Get books with optional filtering.
+
+    Passing `limit` or `cursor` switches to keyset pagination on `id` and
+    wraps the list in `{'items': [...], 'next_cursor': ...}`. `fields`
+    selects a comma separated subset of columns at the SQL level.
+    Unpaginated listings are streamed when NDJSON (`Accept:
+    application/x-ndjson`) or `stream=true` is requested. Responses carry
+    an ETag derived from the row count and latest `updated_at` of the
+    filtered set, and unchanged listings get a 304. No Last-Modified is
+    sent: a book leaving the set (sold, moved or deleted) rarely changes
+    the latest `updated_at`, so If-Modified-Since would answer 304 with a
+    stale list.
+    """
     # Get query parameters for filtering
     status = request.args.get('status')
     genre = request.args.get('genre')
     section = request.args.get('section')
+    paginate = 'limit' in request.args or 'cursor' in request.args
     
-    # Start with base query
-    query = Book.query
+    try:
+        fields = parse_fields(request.args.get('fields'), BOOK_FIELDS)
+        limit = parse_limit(request.args.get('limit'))
+        cursor = request.args.get('cursor')
+        after_id = decode_cursor(cursor, 1)[0] if cursor else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     # Apply filters if provided
+    filters = []
     if status:
-        query = query.filter(Book.status == status)
+        filters.append(Book.status == status)
     if genre:
-        query = query.filter(Book.genre == genre)
+        filters.append(Book.genre == genre)
     if section:
-        query = query.filter(Book.storage_section == section)
+        filters.append(Book.storage_section == section)
+    
+    # Collection validator: row count and latest change for the active filters (ETag only)
+    count, last_modified = db.session.execute(
+        db.select(func.count(Book.id), func.max(Book.updated_at)).where(*filters)
+    ).one()
+    etag = compute_etag('books', request.query_string, ndjson_requested(), count, last_modified)
+    if is_not_modified(etag):
+        return not_modified_response(etag)
+    
+    # Start with base query; the serializer always selects `id`, the keyset column
+    query = db.select(*book_serializer.columns(fields)).where(*filters).order_by(Book.id)
+    
+    if not paginate:
+        if streaming_requested():
+            response = stream_response(book_serializer.fragment(row, fields) for row in iter_rows(query))
+        else:
+            rows = db.session.execute(query).all()
+            response = jsonify([book_serializer.fragment(row, fields) for row in rows])
+        return set_validators(response, etag), 200
+    
+    if after_id is not None:
+        query = query.where(Book.id > after_id)
     
-    # Execute query and return results
-    books = query.all()
-    return jsonify([book.to_dict() for book in books]), 200
+    # Fetch one extra row to know whether another page exists
+    rows = db.session.execute(query.limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].id])
+    
+    response = jsonify({
+        'items': [book_serializer.fragment(row, fields) for row in rows],
+        'next_cursor': next_cursor
+    })
+    return set_validators(response, etag), 200
 
 @inventory_bp.route('/books/<int:book_id>', methods=['GET'])
 # Temporariamente removido para testes: @jwt_required()
 def get_book(book_id):
-    """Get a specific book by ID."""
-    book = Book.query.get(book_id)
+    """Get a specific book by ID, answering 304 when the client copy is current."""
+    book = get_book_row(book_id)
     if not book:
         return jsonify({'error': 'Book not found'}), 404
     
-    return jsonify(book.to_dict()), 200
+    # Strong ETag from the version, so it can be sent back in If-Match
+    etag = book_entity_tag(book.id, book.version)
+    if is_not_modified(etag, book.updated_at):
+        return not_modified_response(etag, book.updated_at, weak=False)
+    
+    return set_validators(jsonify(book_serializer.fragment(book)), etag, book.updated_at, weak=False), 200
+
+@inventory_bp.route('/search', methods=['GET'])
+# Temporariamente removido para testes: @jwt_required()
+def search_books():
+    """
+    Full-text search over title, author, description and genre.
+
+    Results are ranked by relevance and can be combined with the same
+    `status`/`genre`/`section` filters and `limit`/`fields` parameters
+    as `get_books`.
+    """
+    q = request.args.get('q')
+    if not q:
+        return jsonify({'error': 'Missing required parameter: q'}), 400
+    
+    try:
+        fields = parse_fields(request.args.get('fields'), BOOK_FIELDS)
+        limit = parse_limit(request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    terms = extract_terms(q)
+    if not terms:
+        return jsonify([]), 200
+    
+    query = build_search_query(terms, book_serializer.columns(fields))
+    
+    # Apply filters if provided
+    status = request.args.get('status')
+    genre = request.args.get('genre')
+    section = request.args.get('section')
+    if status:
+        query = query.where(Book.status == status)
+    if genre:
+        query = query.where(Book.genre == genre)
+    if section:
+        query = query.where(Book.storage_section == section)
+    
+    rows = db.session.execute(query.limit(limit)).all()
+    return jsonify([book_serializer.fragment(row, fields) for row in rows]), 200
 
 @inventory_bp.route('/books', methods=['POST'])
 # Temporariamente removido para testes: @jwt_required()
@@ -66,6 +190,8 @@ def add_book():
     )
     
     db.session.add(book)
+    # Flush so the book has an id before the transaction references it
+    db.session.flush()
     
     # Create transaction record
     # Temporariamente definido para teste: user_id = 1
@@ -79,18 +205,106 @@ def add_book():
     )
     
     db.session.add(transaction)
+    try:
+        apply_occupancy_changes([(book.storage_section, book.status, 1)])
+    except SectionCapacityExceeded as e:
+        db.session.rollback()
+        return jsonify({'error': f'Storage section {e.section} is full'}), 409
     db.session.commit()
     
     return jsonify({'message': 'Book added successfully', 'book': book.to_dict()}), 201
 
+@inventory_bp.route('/books/bulk', methods=['POST'])
+# Temporariamente removido para testes: @jwt_required()
+def add_books_bulk():
+    """
+    Add many books in a single database transaction.
+
+    The body is streamed and validated row by row, either as NDJSON
+    (`Content-Type: application/x-ndjson`) or as a JSON array. Valid rows
+    are inserted in batches together with their addition transactions;
+    invalid rows are reported and skipped. If the books would overfill a
+    storage section, the whole request is rolled back (409 Conflict).
+
+    With `?auto_slot=true`, rows without a `storage_section` are placed by
+    the slotting engine (by genre and optional `velocity`), one plan per
+    batch.
+    """
+    # Temporariamente definido para teste: user_id = 1
+    user_id = 1  # Valor fixo para testes (sem JWT)
+    auto_slot = request.args.get('auto_slot', '').lower() in ('1', 'true')
+    
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        rows = iter_ndjson(request.stream)
+    else:
+        rows = iter_json_array(request.stream)
+    
+    results = []
+    batch = []
+    
+    def flush_batch():
+        if auto_slot:
+            unplaced = [(result, row) for result, row in batch if not row.get('storage_section')]
+            sections = plan_slots([row for _, row in unplaced])
+            for (result, row), section in zip(unplaced, sections):
+                row['storage_section'] = result['storage_section'] = section
+        book_ids = insert_book_batch([row for _, row in batch], user_id)
+        for (result, _), book_id in zip(batch, book_ids):
+            result['id'] = book_id
+        batch.clear()
+    
+    try:
+        for index, row in enumerate(rows):
+            error = validate_book_row(row)
+            if error:
+                results.append({'row': index, 'status': 'error', 'error': error})
+                continue
+            
+            result = {'row': index, 'status': 'created'}
+            results.append(result)
+            batch.append((result, row))
+            if len(batch) >= BATCH_SIZE:
+                flush_batch()
+        flush_batch()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': f'Invalid request body: {e}'}), 400
+    except SectionCapacityExceeded as e:
+        db.session.rollback()
+        return jsonify({'error': f'Storage section {e.section} is full'}), 409
+    
+    db.session.commit()
+    
+    created = sum(1 for result in results if result['status'] == 'created')
+    return jsonify({
+        'message': f'{created} books added successfully',
+        'created': created,
+        'failed': len(results) - created,
+        'results': results
+    }), 201 if created else 400
+
 @inventory_bp.route('/books/<int:book_id>', methods=['PUT'])
 # Temporariamente removido para testes: @jwt_required()
 def update_book(book_id):
-    """Update a book's information."""
-    book = Book.query.get(book_id)
+    """
+    Update a book's information.
+
+    The write is a single UPDATE guarded by the version that was read, so
+    concurrent edits are rejected instead of overwriting each other. Send
+    the ETag from `GET /books/<id>` in If-Match to detect edits made since
+    the client loaded the book (412 Precondition Failed).
+    """
+    book = get_book_row(book_id)
     if not book:
         return jsonify({'error': 'Book not found'}), 404
     
+    try:
+        expected_version = expected_version_from_request(book_id)
+        if expected_version is not None and expected_version != book.version:
+            raise BookUpdateRejected('conflict', book.status)
+    except BookUpdateRejected:
+        return jsonify({'error': 'Book was modified since it was loaded'}), 412
+    
     data = request.get_json()
     # Temporariamente definido para teste: user_id = 1
     user_id = 1  # Valor fixo para testes (sem JWT)
@@ -101,20 +315,21 @@ def update_book(book_id):
     section_changed = new_section and old_section != new_section
     
     # Update fields if provided
-    if 'title' in data:
-        book.title = data['title']
-    if 'author' in data:
-        book.author = data['author']
-    if 'genre' in data:
-        book.genre = data['genre']
-    if 'description' in data:
-        book.description = data['description']
-    if 'storage_section' in data:
-        book.storage_section = data['storage_section']
-    if 'image_path' in data:
-        book.image_path = data['image_path']
-    if 'status' in data:
-        book.status = data['status']
+    values = {field: data[field] for field in UPDATABLE_BOOK_FIELDS if field in data}
+    old_status = book.status
+    try:
+        book = conditional_book_update(book_id, values, expected_version=book.version)
+    except BookUpdateRejected as e:
+        db.session.rollback()
+        if e.reason == 'not_found':
+            return jsonify({'error': 'Book not found'}), 404
+        return jsonify({'error': 'Book was modified by another request, please retry'}), 409
+    
+    try:
+        apply_occupancy_changes(transition(old_section, old_status, book.storage_section, book.status))
+    except SectionCapacityExceeded as e:
+        db.session.rollback()
+        return jsonify({'error': f'Storage section {e.section} is full'}), 409
     
     # Create transaction record if section changed
     if section_changed:
@@ -130,25 +345,35 @@ def update_book(book_id):
     
     db.session.commit()
     
-    return jsonify({'message': 'Book updated successfully', 'book': book.to_dict()}), 200
+    return jsonify({'message': 'Book updated successfully', 'book': book_serializer.fragment(book)}), 200
 
 @inventory_bp.route('/books/<int:book_id>/sell', methods=['POST'])
 # Temporariamente removido para testes: @jwt_required()
 def sell_book(book_id):
-    """Mark a book as sold and record the transaction."""
-    book = Book.query.get(book_id)
-    if not book:
-        return jsonify({'error': 'Book not found'}), 404
-    
-    if book.status != 'available':
-        return jsonify({'error': f'Book is not available for sale (current status: {book.status})'}), 400
-    
+    """
+    Mark a book as sold and record the transaction.
+
+    The availability check and the status change are one conditional
+    UPDATE (`... WHERE id = ? AND status = 'available'`), so two registers
+    can never sell the same copy. If-Match is honoured as in `update_book`.
+    """
     data = request.get_json() or {}
     # Temporariamente definido para teste: user_id = 1
     user_id = 1  # Valor fixo para testes (sem JWT)
     
-    # Update book status
-    book.status = 'sold'
+    # Update book status only if it is still available
+    try:
+        expected_version = expected_version_from_request(book_id)
+        book = conditional_book_update(
+            book_id, {'status': 'sold'}, require_status='available', expected_version=expected_version
+        )
+    except BookUpdateRejected as e:
+        db.session.rollback()
+        if e.reason == 'not_found':
+            return jsonify({'error': 'Book not found'}), 404
+        if e.reason == 'conflict':
+            return jsonify({'error': 'Book was modified since it was loaded'}), 412
+        return jsonify({'error': f'Book is not available for sale (current status: {e.current_status})'}), 400
     
     # Create transaction record
     transaction = Transaction(
@@ -160,51 +385,278 @@ def sell_book(book_id):
     )
     
     db.session.add(transaction)
+    apply_occupancy_changes(transition(book.storage_section, 'available', book.storage_section, 'sold'))
     db.session.commit()
     
-    return jsonify({'message': 'Book marked as sold', 'book': book.to_dict()}), 200
+    return jsonify({'message': 'Book marked as sold', 'book': book_serializer.fragment(book)}), 200
+
+@inventory_bp.route('/books/bulk-sell', methods=['POST'])
+# Temporariamente removido para testes: @jwt_required()
+def sell_books_bulk():
+    """
+    Mark many books as sold in a single database transaction.
+
+    Body: `{'book_ids': [...], 'notes': ...}`. Available books are sold with
+    set-based UPDATEs and their sale transactions written in one batched
+    insert; the others are reported in `rejected`.
+    """
+    data = request.get_json() or {}
+    if 'book_ids' not in data:
+        return jsonify({'error': 'Missing required field: book_ids'}), 400
+    book_ids = data['book_ids']
+    if not isinstance(book_ids, list) or not all(isinstance(book_id, int) for book_id in book_ids):
+        return jsonify({'error': 'book_ids must be a list of integers'}), 400
+    
+    # Temporariamente definido para teste: user_id = 1
+    user_id = 1  # Valor fixo para testes (sem JWT)
+    
+    sold, rejected = bulk_conditional_book_update(book_ids, {'status': 'sold'}, require_status='available')
+    
+    if sold:
+        db.session.execute(insert(Transaction.__table__), [
+            {
+                'book_id': book.id,
+                'user_id': user_id,
+                'transaction_type': 'sale',
+                'from_section': book.storage_section,
+                'to_section': None,
+                'notes': data.get('notes')
+            }
+            for book in sold
+        ])
+        apply_occupancy_changes(
+            change
+            for book in sold
+            for change in transition(book.storage_section, book.status, book.storage_section, 'sold')
+        )
+    db.session.commit()
+    
+    rejection_messages = {
+        'not_found': 'Book not found',
+        'not_available': 'Book is not available for sale',
+        'conflict': 'Book was modified by another request'
+    }
+    return jsonify({
+        'message': f'{len(sold)} books marked as sold',
+        'sold': [book.id for book in sold],
+        'rejected': [
+            {
+                'id': error.book_id,
+                'error': rejection_messages[error.reason],
+                'current_status': error.current_status
+            }
+            for error in rejected
+        ]
+    }), 200
 
 @inventory_bp.route('/transactions', methods=['GET'])
 # Temporariamente removido para testes: @jwt_required()
 def get_transactions():
-    """Get transaction history with optional filtering."""
+    """
+    Get transaction history with optional filtering.
+
+    Supports the same `limit`/`cursor`/`fields` and streaming options as `get_books`,
+    with the keyset on `(created_at, id)` in descending order, plus a
+    `start_date`/`end_date` range (ISO 8601). `book` and `user` can be
+    requested in `fields` to embed the related rows.
+    """
     # Check if admin for full access
-    claims = get_jwt()
-    user_id = get_jwt_identity()
-    is_admin = claims.get('role') == 'admin'
+    # Temporariamente sem token obrigatório: sem JWT, user_id = 1 com acesso total
+    if verify_jwt_in_request(optional=True):
+        user_id = get_jwt_identity()
+        is_admin = get_jwt().get('role') == 'admin'
+    else:
+        user_id = 1  # Valor fixo para testes (sem JWT)
+        is_admin = True
     
     # Get query parameters for filtering
     book_id = request.args.get('book_id', type=int)
     transaction_type = request.args.get('type')
     
-    # Start with base query
-    query = Transaction.query
-    
-    # Apply filters if provided
+    filters = []
     if book_id:
-        query = query.filter(Transaction.book_id == book_id)
+        filters.append(Transaction.book_id == book_id)
     if transaction_type:
-        query = query.filter(Transaction.transaction_type == transaction_type)
+        filters.append(Transaction.transaction_type == transaction_type)
     
     # Limit to user's own transactions if not admin
     if not is_admin:
-        query = query.filter(Transaction.user_id == user_id)
+        filters.append(Transaction.user_id == user_id)
+    
+    return _list_transactions(filters)
+
+@inventory_bp.route('/books/<int:book_id>/history', methods=['GET'])
+# Temporariamente removido para testes: @jwt_required()
+def get_book_history(book_id):
+    """Get the transaction history of a book, most recent first."""
+    if db.session.execute(db.select(Book.id).where(Book.id == book_id)).first() is None:
+        return jsonify({'error': 'Book not found'}), 404
+    
+    filters = [Transaction.book_id == book_id]
+    transaction_type = request.args.get('type')
+    if transaction_type:
+        filters.append(Transaction.transaction_type == transaction_type)
+    
+    return _list_transactions(filters)
+
+@inventory_bp.route('/books/<int:book_id>/similar', methods=['GET'])
+# Temporariamente removido para testes: @jwt_required()
+def get_similar_books(book_id):
+    """
+    Get books similar to a book, most similar first.
+
+    Answered from the precomputed similarity index (see
+    app.modules.inventory.similarity): one copy per similar title, an
+    available one when there is one. `status` only considers copies with
+    that status; `limit` defaults to 10, up to SIMILAR_TOP_K.
+    """
+    try:
+        limit = min(parse_limit(request.args.get('limit', 10)), SIMILAR_TOP_K)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    status = request.args.get('status')
+    
+    index = load_similarity_index()
+    if index is None:
+        return jsonify({'error': 'Similar books index has not been built yet'}), 503
+    
+    work = index.work_of(book_id)
+    if work is not None:
+        neighbours = index.neighbours(work)
+    else:
+        # Book added after the index was built
+        book = get_book_row(book_id)
+        if not book:
+            return jsonify({'error': 'Book not found'}), 404
+        neighbours = index.similar_to_text(book.title, book.author, book.description, book.genre)
+    
+    # One query for the copies of every similar title
+    copy_ids = [copy_id for neighbour, _ in neighbours for copy_id in index.copies(neighbour)[:MAX_COPIES_PER_TITLE]]
+    query = db.select(*book_serializer.columns()).where(Book.id.in_(copy_ids))
+    if status:
+        query = query.where(Book.status == status)
+    copies = {row.id: row for row in db.session.execute(query)}
+    
+    items = []
+    for neighbour, score in neighbours:
+        candidates = [copies[copy_id] for copy_id in index.copies(neighbour)[:MAX_COPIES_PER_TITLE] if copy_id in copies]
+        if not candidates:
+            continue
+        copy = next((row for row in candidates if row.status == 'available'), candidates[0])
+        items.append({'book': book_serializer.fragment(copy), 'similarity': round(score, 4)})
+        if len(items) == limit:
+            break
+    
+    return jsonify({'book_id': book_id, 'items': items}), 200
+
+def _list_transactions(filters):
+    """
+    Build the transaction listing response for the given filters.
+
+    Books and users are outer-joined in the same select, with only the
+    columns that were requested, so a page costs a single query.
+    """
+    paginate = 'limit' in request.args or 'cursor' in request.args
+    
+    try:
+        fields = parse_fields(request.args.get('fields'), TRANSACTION_FIELDS)
+        limit = parse_limit(request.args.get('limit'))
+        cursor = request.args.get('cursor')
+        if cursor:
+            after_created_at, after_id = decode_cursor(cursor, 2, datetime_positions=(0,))
+        start_date = _parse_datetime_param('start_date')
+        end_date = _parse_datetime_param('end_date')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Start with base query, always selecting the keyset columns
+    columns, encode = _transaction_listing_layout(fields)
+    from_clause = Transaction.__table__
+    if 'book' in fields:
+        from_clause = from_clause.outerjoin(Book.__table__, Book.id == Transaction.book_id)
+    if 'user' in fields:
+        from_clause = from_clause.outerjoin(User.__table__, User.id == Transaction.user_id)
+    query = db.select(*columns).select_from(from_clause).where(*filters)
+    
+    if start_date:
+        query = query.where(Transaction.created_at >= start_date)
+    if end_date:
+        query = query.where(Transaction.created_at <= end_date)
     
     # Order by most recent first
-    query = query.order_by(Transaction.created_at.desc())
-    
-    # Execute query and return results
-    transactions = query.all()
-    
-    # Enhance transaction data with book and user info
-    result = []
-    for transaction in transactions:
-        transaction_dict = transaction.to_dict()
-        transaction_dict['book'] = transaction.book.to_dict() if transaction.book else None
-        transaction_dict['user'] = {
-            'id': transaction.user.id,
-            'username': transaction.user.username
-        } if transaction.user else None
-        result.append(transaction_dict)
-    
-    return jsonify(result), 200 
\ No newline at end of file
+    query = query.order_by(Transaction.created_at.desc(), Transaction.id.desc())
+    
+    if not paginate:
+        if streaming_requested():
+            return stream_response(encode(row) for row in iter_rows(query))
+        rows = db.session.execute(query).all()
+        return jsonify([encode(row) for row in rows]), 200
+    
+    if cursor:
+        query = query.where(
+            tuple_(Transaction.created_at, Transaction.id) < tuple_(after_created_at, after_id)
+        )
+    rows = db.session.execute(query.limit(limit + 1)).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].created_at, rows[-1].id])
+    
+    return jsonify({
+        'items': [encode(row) for row in rows],
+        'next_cursor': next_cursor
+    }), 200
+
+def _transaction_listing_layout(fields):
+    """
+    Columns of a joined transaction listing and the function encoding its rows.
+
+    Transaction columns come first, then the keyset columns if they were not
+    requested, then every book column (nested as a cached fragment) and the
+    user id and username.
+    """
+    transaction_fields = tuple(name for name in fields if name not in ('book', 'user'))
+    encode_transaction = transaction_serializer.encoder(transaction_fields)
+    columns = list(transaction_serializer.columns(transaction_fields))
+    for key_column in (Transaction.id, Transaction.created_at):
+        if key_column.key not in transaction_fields:
+            columns.append(key_column)
+    
+    book_slice = None
+    if 'book' in fields:
+        book_columns = book_serializer.columns()
+        book_slice = slice(len(columns), len(columns) + len(book_columns))
+        columns += [column.label(f'book__{column.key}') for column in book_columns]
+    
+    user_index = None
+    if 'user' in fields:
+        user_index = len(columns)
+        columns += [User.id.label('user__id'), User.username.label('user__username')]
+    
+    def encode(row):
+        data = encode_transaction(row)
+        if book_slice is not None:
+            book = row[book_slice]
+            # `id` is the first book column; it is NULL when the outer join found no book
+            data['book'] = book_serializer.fragment(book) if book[0] is not None else None
+        if user_index is not None:
+            data['user'] = None
+            if row[user_index] is not None:
+                data['user'] = {'id': row[user_index], 'username': row[user_index + 1]}
+        return data
+    
+    return columns, encode
+
+def _parse_datetime_param(name):
+    """Parse an optional ISO 8601 query parameter as a naive UTC datetime."""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f'Invalid date for {name}. Use ISO 8601 (e.g. 2023-01-31T12:00:00Z)')
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
@@ -0,0 +1,130 @@
+"""
+Full-text search over the book catalog.
+
+SQLite uses an external-content FTS5 table (`books_fts`) kept in sync by
+triggers; PostgreSQL uses a generated `search_vector` column with a GIN
+index. Both fold accents, so "sao" matches "São".
+"""
+import re
+from sqlalchemy import DDL, event, func, literal_column, or_, select, table, column
+from app import db
+from app.modules.inventory.models import Book
+
+# Column weights used for ranking: title, author, description, genre
+SQLITE_BM25_WEIGHTS = (10.0, 5.0, 1.0, 2.0)
+
+SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+        title, author, description, genre,
+        content='books', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, author, description, genre)
+        VALUES (new.id, new.title, new.author, new.description, new.genre);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, description, genre)
+        VALUES ('delete', old.id, old.title, old.author, old.description, old.genre);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author, description, genre ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, description, genre)
+        VALUES ('delete', old.id, old.title, old.author, old.description, old.genre);
+        INSERT INTO books_fts(rowid, title, author, description, genre)
+        VALUES (new.id, new.title, new.author, new.description, new.genre);
+    END
+    """,
+]
+
+# Re-index every existing row, used when the index is added to a populated table
+SQLITE_SEARCH_REBUILD = "INSERT INTO books_fts(books_fts) VALUES ('rebuild')"
+
+POSTGRESQL_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'pt_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION pt_unaccent (COPY = portuguese);
+            ALTER TEXT SEARCH CONFIGURATION pt_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+        END IF;
+    END $$
+    """,
+    """
+    ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('pt_unaccent', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('pt_unaccent', coalesce(author, '')), 'B') ||
+        setweight(to_tsvector('pt_unaccent', coalesce(genre, '')), 'C') ||
+        setweight(to_tsvector('pt_unaccent', coalesce(description, '')), 'D')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_books_search_vector ON books USING gin (search_vector)",
+]
+
+# Keep databases created with db.create_all() (tests, scripts) searchable too
+for _statement in SQLITE_SEARCH_DDL:
+    event.listen(Book.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+for _statement in POSTGRESQL_SEARCH_DDL:
+    event.listen(Book.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+
+_books_fts = table('books_fts', column('rowid'))
+
+_TERM_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def extract_terms(text):
+    """Split a free text query into search terms."""
+    return _TERM_PATTERN.findall(text or '')
+
+
+def build_search_query(terms, columns):
+    """
+    Build a ranked select of books matching every term (prefix match).
+
+    Args:
+        terms: Search terms as returned by extract_terms
+        columns: Columns to select
+
+    Returns:
+        Select ordered by relevance, ready for extra filters and a limit
+    """
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        rank = func.bm25(literal_column('books_fts'), *SQLITE_BM25_WEIGHTS)
+        return (
+            select(*columns)
+            .select_from(_books_fts.join(Book.__table__, Book.id == _books_fts.c.rowid))
+            .where(literal_column('books_fts').op('MATCH')(match))
+            .order_by(rank, Book.id)
+        )
+
+    if dialect == 'postgresql':
+        tsquery = func.to_tsquery('pt_unaccent', ' & '.join(f'{term}:*' for term in terms))
+        vector = literal_column('books.search_vector')
+        return (
+            select(*columns)
+            .where(vector.op('@@')(tsquery))
+            .order_by(func.ts_rank(vector, tsquery).desc(), Book.id)
+        )
+
+    # Other dialects: unranked substring match, good enough for development
+    query = select(*columns)
+    for term in terms:
+        pattern = f'%{term}%'
+        query = query.where(or_(
+            Book.title.ilike(pattern),
+            Book.author.ilike(pattern),
+            Book.description.ilike(pattern),
+            Book.genre.ilike(pattern)
+        ))
+    return query.order_by(Book.id)
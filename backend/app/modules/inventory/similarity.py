@@ -0,0 +1,572 @@
+"""
+Precomputed "similar books" index.
+
+Copies of the same book (same title and author, ignoring case and accents)
+are grouped into one *work*, and each work is described by a sparse,
+L2-normalized feature vector with two parts:
+
+- content: TF-IDF over the title, author, genre and description, weighted
+  per field (FIELD_WEIGHTS); authors and genres have their own terms, so an
+  author only matches the same author. The genre, one per work, is kept
+  apart from the sparse vector and compared densely;
+- sales: the baskets the work was sold in, a basket being the sales one
+  user recorded within BASKET_WINDOW_SECONDS (at most MAX_BASKET_SIZE works).
+
+The parts are scaled so that the dot product of two works is
+`(1 - SALES_WEIGHT) * content cosine + SALES_WEIGHT * sales cosine`. The
+SIMILAR_TOP_K best neighbours of every work are computed offline in blocks
+of rows (a sparse product through the feature postings, accumulated with
+one bincount per block, plus the genre match) and saved with the vectors
+in one `.npz` file (SIMILARITY_INDEX_PATH, default `similar_books.npz` in
+the instance folder), which every worker loads once and reloads when the
+file changes.
+
+`refresh_similarity_index()` adds the books created since the last build:
+new copies join their work, new works are vectorized with the saved
+vocabulary and merged into the neighbour lists. Edited and deleted books,
+and new sales, are taken into account by the next full build. Books newer
+than the index are answered from their text on the fly (similar_to_text).
+"""
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter
+from datetime import datetime
+from hashlib import blake2b
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+from app import db
+from app.modules.inventory.models import Book, Transaction
+
+SIMILAR_TOP_K = 20
+
+# Term weights per field, before the logarithmic damping
+FIELD_WEIGHTS = {'title': 3.0, 'author': 2.0, 'genre': 2.0, 'description': 1.0}
+
+# Terms found in fewer works than this are ignored, and so are words found in
+# more than this share of them (they behave like stop words)
+MIN_TERM_WORKS = 2
+MAX_TERM_SHARE = 0.5
+
+# In large catalogs, words found in more works than this are ignored too: the
+# cost of the all-pairs product grows with the square of each term's frequency
+MAX_TERM_WORKS = 1000
+
+GENRE_PREFIX = 'genre:'
+
+# Share of the similarity coming from sales co-occurrence
+SALES_WEIGHT = 0.4
+
+BASKET_WINDOW_SECONDS = 60
+MAX_BASKET_SIZE = 20
+
+# Cells of the dense score block computed at once (rows x works)
+BLOCK_CELLS = 4_000_000
+
+_TERM_PATTERN = re.compile(r'\w\w+', re.UNICODE)
+
+_loaded = {}
+_load_lock = threading.Lock()
+
+
+def _fold(text):
+    """Lowercase and strip accents, so "São" and "sao" are the same term."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def work_key(title, author):
+    """64-bit hash identifying the work a copy belongs to."""
+    key = ' '.join(_fold(title).split()) + '\x00' + ' '.join(_fold(author).split())
+    return int.from_bytes(blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+def work_terms(title, author, description, genre):
+    """Weighted term frequencies of a work's text."""
+    terms = Counter()
+    for term in _TERM_PATTERN.findall(_fold(title)):
+        terms[term] += FIELD_WEIGHTS['title']
+    for term in _TERM_PATTERN.findall(_fold(description)):
+        terms[term] += FIELD_WEIGHTS['description']
+    for term in _TERM_PATTERN.findall(_fold(author)):
+        terms['author:' + term] += FIELD_WEIGHTS['author']
+    if genre:
+        terms[GENRE_PREFIX + '_'.join(_fold(genre).split())] += FIELD_WEIGHTS['genre']
+    return terms
+
+
+def _content_vector(terms, vocabulary, idf):
+    """Feature ids and weights (L2-normalized, scaled to the content share) of one work."""
+    weighted = {
+        vocabulary[term]: math.log1p(count) * idf[vocabulary[term]]
+        for term, count in terms.items() if term in vocabulary
+    }
+    ids = np.fromiter(weighted.keys(), dtype=np.int32, count=len(weighted))
+    weights = np.fromiter(weighted.values(), dtype=np.float64, count=len(weighted))
+    norm = np.sqrt(np.dot(weights, weights))
+    if norm > 0:
+        weights *= math.sqrt(1 - SALES_WEIGHT) / norm
+    order = np.argsort(ids)
+    return ids[order], weights[order].astype(np.float32)
+
+
+def _split_genre(ids, weights, genre_terms):
+    """
+    Take the genre term out of a content vector.
+
+    Returns:
+        Tuple `(ids, weights, genre, genre_weight)`; genre is -1 (weight 0)
+        when the work has none
+    """
+    is_genre = genre_terms[ids]
+    if not is_genre.any():
+        return ids, weights, -1, 0.0
+    position = int(np.flatnonzero(is_genre)[0])
+    return ids[~is_genre], weights[~is_genre], int(ids[position]), float(weights[position])
+
+
+def _genre_terms(terms):
+    return np.array([term.startswith(GENRE_PREFIX) for term in terms], dtype=bool)
+
+
+def _postings(indptr, features, weights, feature_count):
+    """Transpose a CSR matrix of work features into per-feature postings (CSC)."""
+    rows = np.repeat(np.arange(len(indptr) - 1, dtype=np.int32), np.diff(indptr))
+    order = np.argsort(features, kind='stable')
+    posting_indptr = np.zeros(feature_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(features, minlength=feature_count), out=posting_indptr[1:])
+    return posting_indptr, rows[order], weights[order]
+
+
+def _score_rows(ids, weights, postings, work_count):
+    """
+    Dot products of sparse rows with every work.
+
+    Args:
+        ids: Feature ids of the nonzeros, one array per row concatenated
+        weights: Matching weights
+        postings: Tuple returned by _postings
+        work_count: Number of works (columns)
+
+    Returns:
+        Function `scores(nonzero_rows, row_count)` that takes the row of
+        each nonzero and returns the dense (rows x works) scores
+    """
+    posting_indptr, posting_rows, posting_weights = postings
+    starts = posting_indptr[ids]
+    lengths = posting_indptr[ids + 1] - starts
+    # Positions of every posting entry of every nonzero, without a Python loop
+    positions = np.arange(lengths.sum()) + np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    values = np.repeat(weights, lengths) * posting_weights[positions]
+    columns = posting_rows[positions]
+
+    def scores(nonzero_rows, row_count):
+        cells = np.repeat(nonzero_rows, lengths) * work_count + columns
+        tally = np.bincount(cells, weights=values, minlength=row_count * work_count)
+        # bincount of an empty selection is integer
+        return tally.astype(np.float64, copy=False).reshape(row_count, work_count)
+
+    return scores
+
+
+def _genre_scores(genres, genre_weights, row_genres, row_weights):
+    """Genre part of the scores: the product of the weights when the genres match."""
+    return np.where(row_genres[:, None] == genres[None, :], row_weights[:, None] * genre_weights[None, :], 0)
+
+
+def _score_block(vectors, postings, start, stop):
+    """Dense scores of the works [start, stop) against every work."""
+    indptr, features, weights = vectors['indptr'], vectors['features'], vectors['weights']
+    genres, genre_weights = vectors['genres'], vectors['genre_weights']
+    work_count = len(indptr) - 1
+    low, high = indptr[start], indptr[stop]
+    nonzero_rows = np.repeat(np.arange(stop - start), np.diff(indptr[start:stop + 1]))
+    block = _score_rows(features[low:high], weights[low:high], postings, work_count)(nonzero_rows, stop - start)
+    block += _genre_scores(genres, genre_weights, genres[start:stop], genre_weights[start:stop])
+    # A work is not its own neighbour
+    block[np.arange(stop - start), np.arange(start, stop)] = 0
+    return block
+
+
+def _top_k(scores, neighbour_ids, top_k):
+    """
+    Keep the `top_k` best positive scores of each row, best first.
+
+    Args:
+        scores: (rows x candidates) array
+        neighbour_ids: Work of each candidate, same shape as `scores` or
+            one row broadcast to all rows
+        top_k: Neighbours kept per row
+
+    Returns:
+        Tuple `(neighbours, scores)` of (rows x top_k) arrays; missing
+        neighbours are -1 with a score of 0
+    """
+    rows, candidates = scores.shape
+    neighbour_ids = np.broadcast_to(neighbour_ids, scores.shape)
+    if candidates > top_k:
+        # Selecting the smallest of the negated scores is much faster than the
+        # largest when most scores are tied at zero
+        best = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    else:
+        best = np.broadcast_to(np.arange(candidates), (rows, candidates))
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind='stable')
+    best = np.take_along_axis(best, order, axis=1)
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+
+    neighbours = np.full((rows, top_k), -1, dtype=np.int32)
+    top_scores = np.zeros((rows, top_k), dtype=np.float32)
+    width = best.shape[1]
+    neighbours[:, :width] = np.where(best_scores > 1e-6, np.take_along_axis(neighbour_ids, best, axis=1), -1)
+    top_scores[:, :width] = np.where(best_scores > 1e-6, best_scores, 0)
+    return neighbours, top_scores
+
+
+def _block_size(work_count):
+    return max(1, BLOCK_CELLS // max(work_count, 1))
+
+
+def _sale_baskets(book_ids, book_works):
+    """
+    Works sold together, as (basket, work) pairs.
+
+    Returns:
+        Tuple `(baskets, works)` of arrays, one entry per distinct pair,
+        with baskets numbered from 0
+    """
+    rows = db.session.execute(
+        select(Transaction.user_id, Transaction.created_at, Transaction.book_id)
+        .where(Transaction.transaction_type == 'sale')
+    ).all()
+    if not rows or not len(book_ids):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+
+    user_ids, created_at, sold_ids = (np.array(values) for values in zip(*rows))
+    windows = np.array(created_at, dtype='datetime64[s]').astype(np.int64) // BASKET_WINDOW_SECONDS
+    positions = np.clip(np.searchsorted(book_ids, sold_ids), 0, len(book_ids) - 1)
+    known = book_ids[positions] == sold_ids
+    works = book_works[positions[known]]
+    _, baskets = np.unique(np.stack([user_ids[known], windows[known]]), axis=1, return_inverse=True)
+    baskets = baskets.reshape(-1)
+
+    # One entry per (basket, work); only baskets of a plausible single purchase
+    pairs = np.unique(np.stack([baskets, works]), axis=1)
+    sizes = np.bincount(pairs[0])
+    kept = (sizes[pairs[0]] >= 2) & (sizes[pairs[0]] <= MAX_BASKET_SIZE)
+    _, baskets = np.unique(pairs[0][kept], return_inverse=True)
+    return baskets, pairs[1][kept].astype(np.int32)
+
+
+def index_path(app=None):
+    app = app or current_app
+    return app.config.get('SIMILARITY_INDEX_PATH') or os.path.join(app.instance_path, 'similar_books.npz')
+
+
+def _save(arrays):
+    path = index_path()
+    temporary = path + '.tmp.npz'
+    np.savez(temporary, **arrays)
+    os.replace(temporary, path)
+
+
+def build_similarity_index(top_k=SIMILAR_TOP_K):
+    """
+    Build the index from the whole catalog and sales history.
+
+    Returns:
+        Tuple `(books, works)`: books and works indexed
+    """
+    book_ids, book_works, texts, key_positions = [], [], [], {}
+    for book_id, title, author, description, genre in db.session.execute(
+        select(Book.id, Book.title, Book.author, Book.description, Book.genre).order_by(Book.id)
+    ):
+        key = work_key(title, author)
+        work = key_positions.get(key)
+        if work is None:
+            # The oldest copy describes the work
+            work = key_positions[key] = len(texts)
+            texts.append(work_terms(title, author, description, genre))
+        book_ids.append(book_id)
+        book_works.append(work)
+    work_count = len(texts)
+    book_ids = np.array(book_ids, dtype=np.int64)
+    book_works = np.array(book_works, dtype=np.int32)
+
+    # Vocabulary: terms shared by a few works but not by most of them (genres are compared apart)
+    document_frequency = Counter(term for terms in texts for term in terms)
+    max_works = min(MAX_TERM_SHARE * work_count, MAX_TERM_WORKS)
+    terms = sorted(
+        term for term, count in document_frequency.items()
+        if count >= MIN_TERM_WORKS and (count <= max_works or term.startswith(GENRE_PREFIX))
+    )
+    vocabulary = {term: position for position, term in enumerate(terms)}
+    genre_terms = _genre_terms(terms)
+    idf = np.array(
+        [math.log((1 + work_count) / (1 + document_frequency[term])) + 1 for term in terms], dtype=np.float32
+    )
+
+    # Sales baskets are features numbered after the terms, 1/sqrt(baskets) each
+    baskets, basket_works = _sale_baskets(book_ids, book_works)
+    basket_counts = np.bincount(basket_works, minlength=work_count)
+    order = np.argsort(basket_works, kind='stable')
+    basket_works, baskets = basket_works[order], baskets[order]
+    basket_starts = np.searchsorted(basket_works, np.arange(work_count + 1))
+
+    indptr = np.zeros(work_count + 1, dtype=np.int64)
+    features, weights = [], []
+    genres = np.full(work_count, -1, dtype=np.int32)
+    genre_weights = np.zeros(work_count, dtype=np.float32)
+    for work, text in enumerate(texts):
+        ids, values, genres[work], genre_weights[work] = _split_genre(
+            *_content_vector(text, vocabulary, idf), genre_terms
+        )
+        sold_in = baskets[basket_starts[work]:basket_starts[work + 1]]
+        features += [ids, (len(terms) + sold_in).astype(np.int32)]
+        weights += [values, np.full(len(sold_in), math.sqrt(SALES_WEIGHT / max(basket_counts[work], 1)), dtype=np.float32)]
+        indptr[work + 1] = indptr[work] + len(ids) + len(sold_in)
+    features = np.concatenate(features) if features else np.empty(0, dtype=np.int32)
+    weights = np.concatenate(weights) if weights else np.empty(0, dtype=np.float32)
+    feature_count = len(terms) + (int(baskets.max()) + 1 if len(baskets) else 0)
+    vectors = {
+        'indptr': indptr, 'features': features, 'weights': weights,
+        'genres': genres, 'genre_weights': genre_weights,
+    }
+
+    postings = _postings(indptr, features, weights, feature_count)
+    neighbours = np.full((work_count, top_k), -1, dtype=np.int32)
+    scores = np.zeros((work_count, top_k), dtype=np.float32)
+    step = _block_size(work_count)
+    for start in range(0, work_count, step):
+        stop = min(start + step, work_count)
+        block = _score_block(vectors, postings, start, stop)
+        neighbours[start:stop], scores[start:stop] = _top_k(block, np.arange(work_count, dtype=np.int32), top_k)
+
+    _save({
+        **vectors,
+        'book_ids': book_ids,
+        'book_works': book_works,
+        'work_keys': np.array(list(key_positions), dtype=np.int64),
+        'terms': np.frombuffer('\n'.join(terms).encode('utf-8'), dtype=np.uint8),
+        'idf': idf,
+        'feature_count': np.int64(feature_count),
+        'neighbours': neighbours,
+        'scores': scores,
+        'built_at': np.array(datetime.utcnow().isoformat()),
+    })
+    return len(book_ids), work_count
+
+
+def update_similarity_index():
+    """
+    Add the books created since the index was saved.
+
+    Returns:
+        Tuple `(books, works)`: books added and new works among them
+    """
+    with np.load(index_path()) as saved:
+        arrays = {name: saved[name] for name in saved.files}
+    book_ids, book_works = arrays['book_ids'], arrays['book_works']
+    work_keys = arrays['work_keys']
+    old_count = len(work_keys)
+    last_id = int(book_ids[-1]) if len(book_ids) else 0
+
+    terms = bytes(arrays['terms']).decode('utf-8').split('\n') if len(arrays['terms']) else []
+    vocabulary = {term: position for position, term in enumerate(terms)}
+    genre_terms = _genre_terms(terms)
+    key_positions = {key: work for work, key in enumerate(work_keys.tolist())}
+
+    new_ids, new_works, new_keys, vectors = [], [], [], []
+    for book_id, title, author, description, genre in db.session.execute(
+        select(Book.id, Book.title, Book.author, Book.description, Book.genre)
+        .where(Book.id > last_id)
+        .order_by(Book.id)
+    ):
+        key = work_key(title, author)
+        work = key_positions.get(key)
+        if work is None:
+            work = key_positions[key] = old_count + len(new_keys)
+            new_keys.append(key)
+            vectors.append(_split_genre(
+                *_content_vector(work_terms(title, author, description, genre), vocabulary, arrays['idf']), genre_terms
+            ))
+        new_ids.append(book_id)
+        new_works.append(work)
+    if not new_ids:
+        return 0, 0
+
+    indptr, features, weights = arrays['indptr'], arrays['features'], arrays['weights']
+    genres, genre_weights = arrays['genres'], arrays['genre_weights']
+    if vectors:
+        lengths = np.array([len(ids) for ids, _, _, _ in vectors], dtype=np.int64)
+        indptr = np.concatenate([indptr, indptr[-1] + np.cumsum(lengths)])
+        features = np.concatenate([features] + [ids for ids, _, _, _ in vectors])
+        weights = np.concatenate([weights] + [values for _, values, _, _ in vectors])
+        genres = np.concatenate([genres, np.array([genre for _, _, genre, _ in vectors], dtype=np.int32)])
+        genre_weights = np.concatenate([
+            genre_weights, np.array([weight for _, _, _, weight in vectors], dtype=np.float32)
+        ])
+    work_count = old_count + len(new_keys)
+    vectors = {
+        'indptr': indptr, 'features': features, 'weights': weights,
+        'genres': genres, 'genre_weights': genre_weights,
+    }
+
+    neighbours, scores = arrays['neighbours'], arrays['scores']
+    top_k = neighbours.shape[1]
+    neighbours = np.concatenate([neighbours, np.full((len(new_keys), top_k), -1, dtype=np.int32)])
+    scores = np.concatenate([scores, np.zeros((len(new_keys), top_k), dtype=np.float32)])
+    postings = _postings(indptr, features, weights, int(arrays['feature_count']))
+    step = _block_size(work_count)
+    for start in range(old_count, work_count, step):
+        stop = min(start + step, work_count)
+        block = _score_block(vectors, postings, start, stop)
+        neighbours[start:stop], scores[start:stop] = _top_k(block, np.arange(work_count, dtype=np.int32), top_k)
+        # The new works are also candidates for the lists of the older works
+        merged_ids = np.concatenate([
+            neighbours[:old_count],
+            np.broadcast_to(np.arange(start, stop, dtype=np.int32), (old_count, stop - start))
+        ], axis=1)
+        merged_scores = np.concatenate([scores[:old_count], block[:, :old_count].T], axis=1)
+        merged_scores[merged_ids < 0] = 0
+        neighbours[:old_count], scores[:old_count] = _top_k(merged_scores, merged_ids, top_k)
+
+    arrays.update(vectors)
+    arrays.update({
+        'book_ids': np.concatenate([book_ids, np.array(new_ids, dtype=np.int64)]),
+        'book_works': np.concatenate([book_works, np.array(new_works, dtype=np.int32)]),
+        'work_keys': np.concatenate([work_keys, np.array(new_keys, dtype=np.int64)]),
+        'neighbours': neighbours,
+        'scores': scores,
+    })
+    _save(arrays)
+    return len(new_ids), len(new_keys)
+
+
+def refresh_similarity_index(full=False):
+    """
+    Update the index with the new books, or rebuild it.
+
+    Args:
+        full: Rebuild from the whole catalog and sales history; also done
+            when no index was saved yet
+
+    Returns:
+        Tuple `(books, works)`: books and works added (all of them for a
+        full build)
+    """
+    if full or not os.path.exists(index_path()):
+        return build_similarity_index()
+    return update_similarity_index()
+
+
+class SimilarityIndex:
+    """A saved index, loaded in memory."""
+
+    def __init__(self, arrays):
+        self.book_ids = arrays['book_ids']
+        self.book_works = arrays['book_works']
+        self.neighbour_works = arrays['neighbours']
+        self.scores = arrays['scores']
+        self.built_at = datetime.fromisoformat(str(arrays['built_at']))
+        self._terms = arrays['terms']
+        self._work_keys = arrays['work_keys']
+        self._idf = arrays['idf']
+        self._indptr = arrays['indptr']
+        self._features = arrays['features']
+        self._weights = arrays['weights']
+        self._genres = arrays['genres']
+        self._genre_weights = arrays['genre_weights']
+        self._feature_count = int(arrays['feature_count'])
+        self._postings = None
+        self._vocabulary = None
+        self._genre_terms = None
+        self._work_positions = None
+        self._lock = threading.Lock()
+
+        # Copies of each work, by id
+        order = np.argsort(self.book_works, kind='stable')
+        self._copy_ids = self.book_ids[order]
+        self._copy_starts = np.searchsorted(self.book_works[order], np.arange(len(self.neighbour_works) + 1))
+
+    def work_of(self, book_id):
+        """Work of an indexed book, or None."""
+        position = int(np.searchsorted(self.book_ids, book_id))
+        if position < len(self.book_ids) and self.book_ids[position] == book_id:
+            return int(self.book_works[position])
+        return None
+
+    def copies(self, work):
+        """Ids of the copies of a work, oldest first."""
+        return self._copy_ids[self._copy_starts[work]:self._copy_starts[work + 1]].tolist()
+
+    def neighbours(self, work):
+        """Saved neighbours of a work as `(work, score)` pairs, best first."""
+        works = self.neighbour_works[work]
+        kept = works >= 0
+        return list(zip(works[kept].tolist(), self.scores[work][kept].tolist()))
+
+    def similar_to_text(self, title, author, description, genre, top_k=SIMILAR_TOP_K):
+        """
+        Neighbours of a book that is not in the index.
+
+        A new copy of an indexed work gets the work's saved neighbours;
+        otherwise they are computed from the book's text.
+
+        Returns:
+            List of `(work, score)` pairs, best first
+        """
+        self._load_lookups()
+        work = self._work_positions.get(work_key(title, author))
+        if work is not None:
+            return self.neighbours(work)[:top_k]
+
+        ids, weights, genre, genre_weight = _split_genre(
+            *_content_vector(work_terms(title, author, description, genre), self._vocabulary, self._idf),
+            self._genre_terms
+        )
+        work_count = len(self.neighbour_works)
+        if not work_count:
+            return []
+        scores = _score_rows(ids, weights, self._postings, work_count)(np.zeros(len(ids), dtype=np.int64), 1)
+        scores += _genre_scores(
+            self._genres, self._genre_weights, np.array([genre]), np.array([genre_weight], dtype=np.float32)
+        )
+        neighbours, top_scores = _top_k(scores, np.arange(work_count, dtype=np.int32), top_k)
+        kept = neighbours[0] >= 0
+        return list(zip(neighbours[0][kept].tolist(), top_scores[0][kept].tolist()))
+
+    def _load_lookups(self):
+        """Build the vocabulary, work keys and postings on the first on-the-fly query."""
+        with self._lock:
+            if self._postings is None:
+                terms = bytes(self._terms).decode('utf-8').split('\n') if len(self._terms) else []
+                self._vocabulary = {term: position for position, term in enumerate(terms)}
+                self._genre_terms = _genre_terms(terms)
+                self._work_positions = {key: work for work, key in enumerate(self._work_keys.tolist())}
+                self._postings = _postings(self._indptr, self._features, self._weights, self._feature_count)
+
+
+def load_similarity_index():
+    """
+    Return the saved index, or None if it was not built yet.
+
+    The index is kept per process and reloaded when the file changes.
+    """
+    path = index_path()
+    try:
+        stamp = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    with _load_lock:
+        loaded = _loaded.get(path)
+        if loaded is not None and loaded[0] == stamp:
+            return loaded[1]
+        with np.load(path) as saved:
+            index = SimilarityIndex({name: saved[name] for name in saved.files})
+        _loaded[path] = (stamp, index)
+        return index
@@ -0,0 +1,267 @@
+"""
+Demand forecasts and reorder quantities per (section, genre).
+
+The daily sales of the last HISTORY_DAYS whole days are read from the daily
+rollups with one query and laid out as a (series x day) matrix. Every
+statistic is then one NumPy operation over the whole matrix: mean velocity,
+simple exponential smoothing (a product with the smoothing weights) and the
+standard deviation used for the safety stock. The fitted model is kept in
+memory per process and refitted in the background every FORECAST_TTL
+seconds; stock is read on every request, so suggestions follow sales and
+deliveries immediately.
+"""
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app
+from sqlalchemy import func, select
+from app import db
+from app.modules.inventory.models import Book
+from app.modules.logistics.models import SectionOccupancy
+from app.modules.logistics.sections import section_registry
+from app.modules.reporting.models import DailyTransactionRollup
+
+HISTORY_DAYS = 90
+
+# Weight of the most recent day in the exponential smoothing
+SMOOTHING_ALPHA = 0.2
+
+# Safety factor on the demand deviation (about a 95% service level)
+SAFETY_Z = 1.65
+
+FORECAST_TTL = 900
+
+DEFAULT_LEAD_TIME_DAYS = 7
+DEFAULT_COVER_DAYS = 14
+
+
+class DemandModel:
+    """Fitted demand of every (section, genre) series with sales in the history."""
+
+    def __init__(self, sections, genres, velocity, forecast, deviation, history_days, fitted_at):
+        self.sections = sections
+        self.genres = genres
+        self.velocity = velocity
+        self.forecast = forecast
+        self.deviation = deviation
+        self.history_days = history_days
+        self.fitted_at = fitted_at
+
+
+def smoothing_weights(days, alpha=SMOOTHING_ALPHA):
+    """
+    Weights turning a daily history (oldest first) into its smoothed level.
+
+    Simple exponential smoothing started at the first day gives
+    `level = (1 - alpha)^(n-1) * x[0] + sum(alpha * (1 - alpha)^(n-1-t) * x[t])`,
+    so the level of many series is one matrix-vector product.
+    """
+    weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1, dtype=float)
+    weights[0] = (1 - alpha) ** (days - 1)
+    return weights
+
+
+def fit_demand(history_days=HISTORY_DAYS, alpha=SMOOTHING_ALPHA, today=None):
+    """
+    Fit the demand model from the daily sale rollups.
+
+    Args:
+        history_days: Number of whole days before `today` to learn from
+        alpha: Smoothing factor, see smoothing_weights
+        today: First day excluded from the history; today (UTC) by default
+
+    Returns:
+        DemandModel
+    """
+    today = today or datetime.utcnow().date()
+    first_day = today - timedelta(days=history_days)
+    rollup = DailyTransactionRollup
+    rows = db.session.execute(
+        select(rollup.section, rollup.genre, rollup.day, func.sum(rollup.count))
+        .where(
+            rollup.transaction_type == 'sale',
+            rollup.day >= first_day,
+            rollup.day < today,
+            rollup.section != ''
+        )
+        .group_by(rollup.section, rollup.genre, rollup.day)
+    ).all()
+
+    if rows:
+        sections, genres, days, counts = zip(*rows)
+    else:
+        sections, genres, days, counts = (), (), (), ()
+    keys = np.array([f'{section}\x00{genre}' for section, genre in zip(sections, genres)], dtype=object)
+    series_keys, series_index = np.unique(keys, return_inverse=True)
+    day_index = np.array([(day - first_day).days for day in days], dtype=np.int64)
+
+    sales = np.zeros((len(series_keys), history_days))
+    np.add.at(sales, (series_index, day_index), np.array(counts, dtype=float))
+
+    split = [key.split('\x00', 1) for key in series_keys.tolist()]
+    return DemandModel(
+        sections=np.array([section for section, _ in split], dtype=object),
+        genres=np.array([genre for _, genre in split], dtype=object),
+        velocity=sales.mean(axis=1),
+        forecast=sales @ smoothing_weights(history_days, alpha),
+        deviation=sales.std(axis=1),
+        history_days=history_days,
+        fitted_at=datetime.utcnow()
+    )
+
+
+class DemandModelCache:
+    """Per-process demand model, refitted in the background after `ttl` seconds."""
+
+    def __init__(self, ttl=FORECAST_TTL):
+        self.ttl = ttl
+        self._model = None
+        self._fitted_at = 0.0
+        self._refitting = False
+        self._lock = threading.Lock()
+
+    def get(self):
+        """
+        Return the fitted model.
+
+        The first call fits it; afterwards a stale model is still returned
+        while a refit runs on the report job pool.
+        """
+        with self._lock:
+            model = self._model
+            if model is None:
+                # Concurrent first requests wait for this fit instead of fitting again
+                model = self._model = fit_demand()
+                self._fitted_at = time.monotonic()
+            elif time.monotonic() - self._fitted_at >= self.ttl and not self._refitting:
+                self._refitting = True
+                app = current_app._get_current_object()
+                try:
+                    app.extensions['report_jobs'].submit(self._refit, app)
+                except Exception:
+                    self._refitting = False
+                    raise
+        return model
+
+    def _refit(self, app):
+        try:
+            with app.app_context():
+                try:
+                    model = fit_demand()
+                except Exception:
+                    app.logger.exception('Demand model refit failed')
+                    return
+                with self._lock:
+                    self._model = model
+                    self._fitted_at = time.monotonic()
+        finally:
+            self._refitting = False
+
+
+demand_model = DemandModelCache()
+
+
+def stock_query(section_ids):
+    """
+    Available books per (section, genre) of the given sections.
+
+    Answered from the (storage_section, status, genre) index alone.
+    """
+    genre = func.coalesce(Book.genre, '')
+    return (
+        select(Book.storage_section, genre, func.count())
+        .where(Book.storage_section.in_(section_ids), Book.status == 'available')
+        .group_by(Book.storage_section, genre)
+    )
+
+
+def reorder_suggestions(model, section_ids, lead_time_days, cover_days):
+    """
+    Compute reorder quantities for the series of the given sections.
+
+    The quantity brings the stock to the forecast demand over the lead time
+    plus the cover period, plus a safety stock of SAFETY_Z deviations over
+    the lead time. Suggestions are ranked by days of cover (most urgent
+    first) and capped so the books of a section fit its free capacity.
+
+    Args:
+        model: DemandModel
+        section_ids: Sections to consider
+        lead_time_days: Days until an order is received
+        cover_days: Days of demand the order should cover once received
+
+    Returns:
+        Dict of arrays (one entry per series, ranked): section, genre,
+        stock, velocity, forecast, safety_stock, days_of_cover (inf when
+        there is no forecast demand), quantity and capped (True when the
+        quantity was reduced to fit the section)
+    """
+    selected = np.flatnonzero(np.isin(model.sections, np.array(list(section_ids), dtype=object)))
+    sections = model.sections[selected]
+    genres = model.genres[selected]
+    forecast = model.forecast[selected]
+
+    # Available books per (section, genre) and free room per section, two indexed reads
+    stock_by_series = {
+        (section, genre): count
+        for section, genre, count in db.session.execute(stock_query(section_ids))
+    }
+    stock = np.array(
+        [stock_by_series.get(key, 0) for key in zip(sections.tolist(), genres.tolist())], dtype=float
+    )
+
+    safety_stock = SAFETY_Z * model.deviation[selected] * math.sqrt(lead_time_days)
+    target = forecast * (lead_time_days + cover_days) + safety_stock
+    quantity = np.ceil(np.maximum(target - stock, 0)).astype(np.int64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_of_cover = np.where(forecast > 0, stock / forecast, np.inf)
+
+    # Most urgent first; larger orders first among equally urgent series
+    order = np.lexsort((-quantity, days_of_cover))
+    sections, genres, stock, forecast, safety_stock, days_of_cover, quantity = (
+        array[order] for array in (sections, genres, stock, forecast, safety_stock, days_of_cover, quantity)
+    )
+    velocity = model.velocity[selected][order]
+
+    # Cap the cumulative quantity of each section, in rank order, at its free room
+    free = _free_room(section_ids)
+    room = np.array([free.get(section, 0) for section in sections.tolist()], dtype=np.int64)
+    _, section_index = np.unique(sections, return_inverse=True)
+    by_section = np.argsort(section_index, kind='stable')
+    grouped_sections = section_index[by_section]
+    grouped = quantity[by_section]
+    totals = np.cumsum(grouped)
+    first_of_section = np.ones(len(grouped), dtype=bool)
+    first_of_section[1:] = grouped_sections[1:] != grouped_sections[:-1]
+    starts = np.flatnonzero(first_of_section)
+    # Running total of each section: subtract what the previous sections added
+    before_section = (totals - grouped)[starts]
+    cumulative = np.empty_like(quantity)
+    cumulative[by_section] = totals - np.repeat(before_section, np.diff(np.r_[starts, len(grouped)]))
+    capped_quantity = np.clip(room - (cumulative - quantity), 0, quantity)
+
+    return {
+        'section': sections,
+        'genre': genres,
+        'stock': stock,
+        'velocity': velocity,
+        'forecast': forecast,
+        'safety_stock': safety_stock,
+        'days_of_cover': days_of_cover,
+        'quantity': capped_quantity,
+        'capped': capped_quantity < quantity,
+    }
+
+
+def _free_room(section_ids):
+    """Free capacity of each registered section (capacity minus books on the shelf)."""
+    occupied = dict(db.session.execute(
+        select(SectionOccupancy.section, SectionOccupancy.available + SectionOccupancy.reserved)
+        .where(SectionOccupancy.section.in_(section_ids))
+    ).all())
+    return {
+        section_id: max(section_registry.get(section_id)['capacity'] - occupied.get(section_id, 0), 0)
+        for section_id in section_ids
+    }
@@ -0,0 +1,61 @@
+"""
+Logistics models for the Book Logistics API.
+"""
+from datetime import datetime
+from app import db
+
+class StorageSection(db.Model):
+    """Storage section (shelf) where books are placed."""
+    __tablename__ = 'storage_sections'
+    
+    id = db.Column(db.String(50), primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    capacity = db.Column(db.Integer, nullable=False)
+    # Available stock below which the section is recommended for restocking
+    low_stock_threshold = db.Column(db.Integer, nullable=False, default=10, server_default='10')
+    critical_stock_threshold = db.Column(db.Integer, nullable=False, default=5, server_default='5')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __init__(self, id, name, capacity, low_stock_threshold=10, critical_stock_threshold=5):
+        self.id = id
+        self.name = name
+        self.capacity = capacity
+        self.low_stock_threshold = low_stock_threshold
+        self.critical_stock_threshold = critical_stock_threshold
+    
+    def to_dict(self):
+        """Convert section object to dictionary for API responses."""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'capacity': self.capacity,
+            'low_stock_threshold': self.low_stock_threshold,
+            'critical_stock_threshold': self.critical_stock_threshold
+        }
+    
+    def __repr__(self):
+        return f'<StorageSection {self.id}>'
+
+class SectionOccupancy(db.Model):
+    """Book counts per storage section and status, maintained incrementally."""
+    __tablename__ = 'section_occupancy'
+    
+    section = db.Column(db.String(50), primary_key=True)
+    available = db.Column(db.Integer, nullable=False, default=0)
+    reserved = db.Column(db.Integer, nullable=False, default=0)
+    sold = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        """Convert occupancy object to dictionary for API responses."""
+        return {
+            'section': self.section,
+            'available': self.available,
+            'reserved': self.reserved,
+            'sold': self.sold,
+            'updated_at': self.updated_at.isoformat()
+        }
+    
+    def __repr__(self):
+        return f'<SectionOccupancy {self.section}: {self.available} available>'
@@ -0,0 +1,140 @@
+"""
+Incremental maintenance of the section_occupancy counters.
+
+Every write that adds books, changes their status or moves them between
+sections reports the change here, in the same database transaction, so the
+section statistics are a single indexed read instead of COUNT queries over
+the books table. The same counters enforce the capacity of the registered
+storage sections. `rebuild_occupancy` recomputes everything with one
+GROUP BY for reconciliation.
+"""
+from datetime import datetime
+from sqlalchemy import case, delete, func, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app import db
+from app.modules.inventory.models import Book
+from app.modules.logistics.models import SectionOccupancy, StorageSection
+
+# Book statuses with a counter column in section_occupancy
+OCCUPANCY_STATUSES = ('available', 'reserved', 'sold')
+
+_UPSERT_INSERTS = {'sqlite': sqlite_insert, 'postgresql': postgresql_insert}
+
+
+class SectionCapacityExceeded(Exception):
+    """Raised when placing books would exceed a section's capacity."""
+
+    def __init__(self, section):
+        super().__init__(section)
+        self.section = section
+
+
+def transition(old_section, old_status, new_section, new_status):
+    """Counter changes for a book going from one (section, status) to another."""
+    if (old_section, old_status) == (new_section, new_status):
+        return []
+    return [(old_section, old_status, -1), (new_section, new_status, 1)]
+
+
+def apply_occupancy_changes(changes):
+    """
+    Add counter deltas to section_occupancy, creating missing sections.
+
+    Sections that receive books are updated with a guarded UPDATE
+    (`... WHERE available + reserved + n <= capacity`), so the capacity
+    check and the placement are one atomic statement and concurrent
+    requests cannot overfill a shelf. Sections are updated in id order, so
+    every transaction locks their rows in the same order. Sections that
+    are not registered in storage_sections have no capacity limit.
+
+    Args:
+        changes: Iterable of (section, status, delta); books without a
+            section or with an untracked status are ignored
+
+    Raises:
+        SectionCapacityExceeded: If a section would exceed its capacity;
+            the caller should roll back the transaction
+    """
+    totals = {}
+    for section, status, delta in changes:
+        if section is None or status not in OCCUPANCY_STATUSES or not delta:
+            continue
+        totals.setdefault(section, dict.fromkeys(OCCUPANCY_STATUSES, 0))[status] += delta
+    totals = {section: deltas for section, deltas in totals.items() if any(deltas.values())}
+    if not totals:
+        return
+
+    table = SectionOccupancy.__table__
+    connection = db.session.connection()
+    now = datetime.utcnow()
+    _ensure_occupancy_rows(connection, sorted(totals), now)
+
+    # Rows are locked in section order, so concurrent moves in opposite
+    # directions (A to B and B to A) cannot deadlock
+    for section, deltas in sorted(totals.items()):
+        statement = (
+            update(table)
+            .where(table.c.section == section)
+            .values(updated_at=now, **{status: table.c[status] + delta for status, delta in deltas.items()})
+        )
+        placed = deltas['available'] + deltas['reserved']
+        if placed > 0:
+            capacity = select(StorageSection.capacity).where(StorageSection.id == section).scalar_subquery()
+            statement = statement.where(or_(
+                capacity.is_(None),
+                table.c.available + table.c.reserved + placed <= capacity
+            ))
+        if not connection.execute(statement).rowcount:
+            raise SectionCapacityExceeded(section)
+
+
+def _ensure_occupancy_rows(connection, sections, now):
+    """Create zeroed counter rows for sections that have none yet."""
+    table = SectionOccupancy.__table__
+    rows = [dict(section=section, updated_at=now, **dict.fromkeys(OCCUPANCY_STATUSES, 0)) for section in sections]
+    upsert_insert = _UPSERT_INSERTS.get(connection.dialect.name)
+    if upsert_insert is not None:
+        connection.execute(upsert_insert(table).on_conflict_do_nothing(index_elements=[table.c.section]), rows)
+        return
+
+    existing = set(connection.execute(select(table.c.section).where(table.c.section.in_(sections))).scalars())
+    missing = [row for row in rows if row['section'] not in existing]
+    if missing:
+        connection.execute(insert(table), missing)
+
+
+def occupancy_query():
+    """Select computing the occupancy counters from the books table."""
+    return (
+        select(
+            Book.storage_section,
+            *[
+                func.coalesce(func.sum(case((Book.status == status, 1), else_=0)), 0).label(status)
+                for status in OCCUPANCY_STATUSES
+            ]
+        )
+        .where(Book.storage_section.isnot(None))
+        .group_by(Book.storage_section)
+    )
+
+
+def rebuild_occupancy():
+    """
+    Recompute section_occupancy from the books table with one GROUP BY.
+
+    Returns:
+        Number of sections written
+    """
+    table = SectionOccupancy.__table__
+    now = datetime.utcnow()
+    connection = db.session.connection()
+    rows = connection.execute(occupancy_query()).all()
+
+    connection.execute(delete(table))
+    if rows:
+        connection.execute(insert(table), [
+            dict(section=row.storage_section, updated_at=now, **{status: row._mapping[status] for status in OCCUPANCY_STATUSES})
+            for row in rows
+        ])
+    return len(rows)
@@ -0,0 +1,70 @@
+"""
+Set-based restock recommendations.
+
+One query groups the books of the registered sections by (section, genre),
+joins the sales of the recent window, and ranks the genres of each section
+with a window function, so the work is a single indexed aggregate instead
+of loading every book of every low-stock section.
+"""
+from sqlalchemy import and_, case, func, literal, select
+from app.modules.inventory.models import Book, Transaction
+
+# Number of genres recommended per section
+TOP_GENRES = 3
+
+# Weight of one recent sale relative to one book of the genre in the section
+RECENT_SALE_WEIGHT = 3
+
+DEFAULT_SALES_WINDOW_DAYS = 30
+DEFAULT_HORIZON_DAYS = 7
+
+
+def restock_query(section_ids, since):
+    """
+    Build the aggregated restock query.
+
+    Each row is one of the TOP_GENRES best (section, genre) groups of a
+    section, with `available` and `sales` (recent sales) for the group, the
+    section totals `section_available` and `section_sales`, and the genre
+    `rank` inside the section. Genres are ranked by books in the section
+    plus RECENT_SALE_WEIGHT per recent sale; books without a genre are
+    always ranked last.
+
+    Args:
+        section_ids: Sections to analyse
+        since: Start of the sales window
+    """
+    sales_join = and_(
+        Transaction.book_id == Book.id,
+        Transaction.transaction_type == 'sale',
+        Transaction.created_at >= since
+    )
+    books = func.count(func.distinct(Book.id))
+    available = func.count(func.distinct(case((Book.status == 'available', Book.id))))
+    sales = func.count(Transaction.id)
+    score = books + sales * RECENT_SALE_WEIGHT
+
+    ranked = (
+        select(
+            Book.storage_section.label('section'),
+            Book.genre.label('genre'),
+            available.label('available'),
+            sales.label('sales'),
+            func.sum(available).over(partition_by=Book.storage_section).label('section_available'),
+            func.sum(sales).over(partition_by=Book.storage_section).label('section_sales'),
+            func.row_number().over(
+                partition_by=Book.storage_section,
+                order_by=(case((Book.genre.is_(None), literal(1)), else_=literal(0)), score.desc(), Book.genre)
+            ).label('rank')
+        )
+        .select_from(Book)
+        .outerjoin(Transaction, sales_join)
+        .where(Book.storage_section.in_(section_ids))
+        .group_by(Book.storage_section, Book.genre)
+        .subquery()
+    )
+    return (
+        select(ranked)
+        .where(ranked.c.rank <= TOP_GENRES)
+        .order_by(ranked.c.section, ranked.c.rank)
+    )
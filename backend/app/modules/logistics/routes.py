@@ -1,11 +1,23 @@
 """
 Rotas do módulo de logística para a API de Logística de Livros.
 """
+from datetime import datetime, timedelta
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
+from sqlalchemy import insert, select
 from app import db
-from app.modules.inventory.models import Book, Transaction
+from app.modules.inventory.models import Book, Transaction, book_serializer
+from app.modules.inventory.operations import (
+    BookUpdateRejected, bulk_conditional_book_update, conditional_book_update, get_book_row
+)
+from app.modules.logistics.forecasting import DEFAULT_COVER_DAYS, DEFAULT_LEAD_TIME_DAYS, demand_model, reorder_suggestions
+from app.modules.logistics.models import SectionOccupancy, StorageSection
+from app.modules.logistics.occupancy import SectionCapacityExceeded, apply_occupancy_changes, transition
+from app.modules.logistics.recommendations import DEFAULT_HORIZON_DAYS, DEFAULT_SALES_WINDOW_DAYS, restock_query
+from app.modules.logistics.sections import section_registry
+from app.modules.logistics.slotting import plan_slots
 from app.modules.user_management.models import User
+from app.report_cache import cached_report
 
 logistics_bp = Blueprint('logistics', __name__, url_prefix='/api/logistics')
 
@@ -13,19 +25,77 @@ logistics_bp = Blueprint('logistics', __name__, url_prefix='/api/logistics')
 @jwt_required()
 def listar_secoes():
     """Listar todas as seções de armazenamento disponíveis."""
-    # Esta é uma implementação simulada - em um sistema real, isso viria de um banco de dados
-    secoes_disponiveis = [
-        {'id': 'FICT-A1', 'name': 'Ficção - Estante A1', 'capacity': 100},
-        {'id': 'FICT-A2', 'name': 'Ficção - Estante A2', 'capacity': 100},
-        {'id': 'FICT-B1', 'name': 'Ficção - Estante B1', 'capacity': 150},
-        {'id': 'NFICT-C1', 'name': 'Não-Ficção - Estante C1', 'capacity': 120},
-        {'id': 'NFICT-C2', 'name': 'Não-Ficção - Estante C2', 'capacity': 120},
-        {'id': 'INFAN-D1', 'name': 'Infantil - Estante D1', 'capacity': 80},
-        {'id': 'ACAD-E1', 'name': 'Acadêmico - Estante E1', 'capacity': 150},
-        {'id': 'ACAD-E2', 'name': 'Acadêmico - Estante E2', 'capacity': 150},
-    ]
-    
-    return jsonify(secoes_disponiveis), 200
+    return jsonify(section_registry.all()), 200
+
+@logistics_bp.route('/sections', methods=['POST'])
+@jwt_required()
+def criar_secao():
+    """Cadastrar uma nova seção de armazenamento."""
+    # Verificar se o usuário tem privilégios de administrador
+    claims = get_jwt()
+    if claims.get('role') != 'admin':
+        return jsonify({'erro': 'Privilégios de administrador necessários'}), 403
+    
+    dados = request.get_json() or {}
+    
+    # Validar campos obrigatórios
+    campos_obrigatorios = ['id', 'name', 'capacity']
+    for campo in campos_obrigatorios:
+        if campo not in dados:
+            return jsonify({'erro': f'Campo obrigatório ausente: {campo}'}), 400
+    
+    for campo in ('capacity', 'low_stock_threshold', 'critical_stock_threshold'):
+        if campo in dados:
+            erro = _validar_inteiro(campo, dados[campo])
+            if erro:
+                return jsonify({'erro': erro}), 400
+    
+    if db.session.get(StorageSection, dados['id']):
+        return jsonify({'erro': 'Seção já cadastrada'}), 409
+    
+    secao = StorageSection(
+        id=dados['id'],
+        name=dados['name'],
+        capacity=dados['capacity'],
+        low_stock_threshold=dados.get('low_stock_threshold', 10),
+        critical_stock_threshold=dados.get('critical_stock_threshold', 5)
+    )
+    db.session.add(secao)
+    db.session.commit()
+    
+    return jsonify({'mensagem': 'Seção cadastrada com sucesso', 'secao': secao.to_dict()}), 201
+
+@logistics_bp.route('/sections/<section_id>', methods=['PUT'])
+@jwt_required()
+def atualizar_secao(section_id):
+    """
+    Atualizar o nome, a capacidade ou os limiares de reposição de uma seção.
+
+    Reduzir a capacidade abaixo da ocupação atual não remove livros; apenas
+    impede novas alocações até a seção ter espaço.
+    """
+    # Verificar se o usuário tem privilégios de administrador
+    claims = get_jwt()
+    if claims.get('role') != 'admin':
+        return jsonify({'erro': 'Privilégios de administrador necessários'}), 403
+    
+    secao = db.session.get(StorageSection, section_id)
+    if not secao:
+        return jsonify({'erro': 'Seção não encontrada'}), 404
+    
+    dados = request.get_json() or {}
+    for campo in ('capacity', 'low_stock_threshold', 'critical_stock_threshold'):
+        if campo in dados:
+            erro = _validar_inteiro(campo, dados[campo])
+            if erro:
+                return jsonify({'erro': erro}), 400
+            setattr(secao, campo, dados[campo])
+    if 'name' in dados:
+        secao.name = dados['name']
+    
+    db.session.commit()
+    
+    return jsonify({'mensagem': 'Seção atualizada com sucesso', 'secao': secao.to_dict()}), 200
 
 @logistics_bp.route('/sections/<section_id>/books', methods=['GET'])
 @jwt_required()
@@ -36,6 +106,7 @@ def buscar_livros_por_secao(section_id):
 
 @logistics_bp.route('/sections/stats', methods=['GET'])
 @jwt_required()
+@cached_report
 def estatisticas_secoes():
     """Obter estatísticas de ocupação de cada seção."""
     # Verificar se o usuário tem privilégios de administrador
@@ -43,29 +114,32 @@ def estatisticas_secoes():
     if claims.get('role') != 'admin':
         return jsonify({'erro': 'Privilégios de administrador necessários'}), 403
     
-    # Lista de todas as seções (normalmente viria do banco de dados)
-    secoes_cadastradas = [
-        'FICT-A1', 'FICT-A2', 'FICT-B1', 
-        'NFICT-C1', 'NFICT-C2', 
-        'INFAN-D1', 
-        'ACAD-E1', 'ACAD-E2'
-    ]
+    # Lista de todas as seções cadastradas
+    secoes_cadastradas = section_registry.ids()
+    
+    # Uma única leitura dos contadores mantidos a cada adição, venda e movimentação
+    ocupacao = {
+        linha.section: linha
+        for linha in db.session.execute(
+            select(SectionOccupancy.section, SectionOccupancy.available, SectionOccupancy.reserved, SectionOccupancy.sold)
+            .where(SectionOccupancy.section.in_(secoes_cadastradas))
+        )
+    }
     
     resultado = []
     
     for secao in secoes_cadastradas:
-        # Contar livros disponíveis na seção
-        qtd_disponiveis = Book.query.filter_by(storage_section=secao, status='available').count()
-        
-        # Contar livros vendidos que estavam nesta seção
-        qtd_vendidos = db.session.query(Transaction).join(Book).\
-            filter(Transaction.transaction_type == 'sale', 
-                  Transaction.from_section == secao).count()
+        linha = ocupacao.get(secao)
+        qtd_disponiveis = linha.available if linha else 0
+        qtd_reservados = linha.reserved if linha else 0
+        qtd_vendidos = linha.sold if linha else 0
         
         # Adicionar estatísticas à lista de resultados
         resultado.append({
             'secao': secao,
+            'capacidade': section_registry.get(secao)['capacity'],
             'livros_disponiveis': qtd_disponiveis,
+            'livros_reservados': qtd_reservados,
             'livros_vendidos': qtd_vendidos,
             'total_movimentacoes': qtd_disponiveis + qtd_vendidos
         })
@@ -74,53 +148,169 @@ def estatisticas_secoes():
 
 @logistics_bp.route('/recommendations', methods=['GET'])
 @jwt_required()
+@cached_report
 def recomendar_estoque():
-    """Recomendar seções para reabastecimento de estoque."""
+    """
+    Recomendar seções para reabastecimento de estoque.
+
+    A velocidade de vendas é medida nos últimos `dias` (padrão 30) e o
+    estoque disponível é projetado `horizonte` dias à frente (padrão 7);
+    seções cuja projeção fica abaixo dos limiares cadastrados são
+    recomendadas, com os gêneros mais vendidos e mais presentes na seção.
+    """
     # Verificar se o usuário tem privilégios de administrador
     claims = get_jwt()
     if claims.get('role') != 'admin':
         return jsonify({'erro': 'Privilégios de administrador necessários'}), 403
     
-    # Este é um exemplo de lógica de recomendação - em um sistema real seria mais complexo
-    # e baseado em análise de dados de vendas, tendências, etc.
+    try:
+        dias = int(request.args.get('dias', DEFAULT_SALES_WINDOW_DAYS))
+        horizonte = int(request.args.get('horizonte', DEFAULT_HORIZON_DAYS))
+        if dias < 1 or horizonte < 0:
+            raise ValueError
+    except ValueError:
+        return jsonify({'erro': 'dias deve ser um inteiro positivo e horizonte um inteiro não negativo'}), 400
     
-    # Contar livros por seção
-    contagem_secoes = {}
-    secoes_conhecidas = [
-        'FICT-A1', 'FICT-A2', 'FICT-B1', 
-        'NFICT-C1', 'NFICT-C2', 
-        'INFAN-D1', 
-        'ACAD-E1', 'ACAD-E2'
-    ]
+    secoes_conhecidas = section_registry.ids()
+    desde = datetime.utcnow() - timedelta(days=dias)
     
-    for secao in secoes_conhecidas:
-        contagem_secoes[secao] = Book.query.filter_by(storage_section=secao, status='available').count()
+    # Uma única consulta agregada: estoque e vendas recentes por (seção, gênero),
+    # com os gêneros de cada seção já ordenados por uma função de janela
+    estatisticas = {}
+    for linha in db.session.execute(restock_query(secoes_conhecidas, desde)):
+        secao = estatisticas.setdefault(linha.section, {
+            'disponiveis': linha.section_available,
+            'vendas': linha.section_sales,
+            'generos': []
+        })
+        if linha.genre:
+            secao['generos'].append(linha.genre)
     
-    # Encontrar seções com poucos livros (menos de 10) para recomendar reabastecimento
+    # Recomendar seções cujo estoque projetado para o horizonte fica abaixo do limiar
     recomendacoes = []
-    for secao, qtd in contagem_secoes.items():
-        if qtd < 10:  # Limiar para considerar estoque baixo
-            # Verificar quais gêneros são populares nesta seção
-            livros_da_secao = Book.query.filter_by(storage_section=secao).all()
-            generos = {}
-            
-            for livro in livros_da_secao:
-                if livro.genre:
-                    generos[livro.genre] = generos.get(livro.genre, 0) + 1
-            
-            # Ordenar gêneros por popularidade
-            generos_ordenados = sorted(generos.items(), key=lambda x: x[1], reverse=True)
-            generos_populares = [g[0] for g in generos_ordenados[:3]] if generos_ordenados else []
-            
-            recomendacoes.append({
-                'secao': secao,
-                'qtd_atual': qtd,
-                'status': 'CRÍTICO' if qtd < 5 else 'BAIXO',
-                'generos_recomendados': generos_populares
-            })
+    for id_secao in secoes_conhecidas:
+        secao = section_registry.get(id_secao)
+        dados_secao = estatisticas.get(id_secao, {'disponiveis': 0, 'vendas': 0, 'generos': []})
+        qtd = dados_secao['disponiveis']
+        velocidade = dados_secao['vendas'] / dias
+        estoque_projetado = qtd - velocidade * horizonte
+        
+        if estoque_projetado >= secao['low_stock_threshold']:
+            continue
+        
+        recomendacoes.append({
+            'secao': id_secao,
+            'qtd_atual': qtd,
+            'vendas_recentes': dados_secao['vendas'],
+            'velocidade_vendas': round(velocidade, 2),
+            'estoque_projetado': round(estoque_projetado, 1),
+            'status': 'CRÍTICO' if estoque_projetado < secao['critical_stock_threshold'] else 'BAIXO',
+            'generos_recomendados': dados_secao['generos']
+        })
     
     return jsonify(recomendacoes), 200
 
+@logistics_bp.route('/reorder', methods=['GET'])
+@jwt_required()
+@cached_report
+def sugerir_reposicao():
+    """
+    Sugerir quantidades de reposição por seção e gênero.
+
+    A demanda diária de cada (seção, gênero) é prevista por suavização
+    exponencial das vendas dos últimos dias (modelo reajustado
+    periodicamente); a quantidade cobre `prazo` dias de entrega (padrão 7)
+    mais `cobertura` dias (padrão 14), com estoque de segurança, limitada ao
+    espaço livre da seção. As sugestões vêm das mais urgentes (menos dias de
+    cobertura) para as menos urgentes, até `limite` itens (padrão 100).
+    """
+    # Verificar se o usuário tem privilégios de administrador
+    claims = get_jwt()
+    if claims.get('role') != 'admin':
+        return jsonify({'erro': 'Privilégios de administrador necessários'}), 403
+    
+    try:
+        prazo = int(request.args.get('prazo', DEFAULT_LEAD_TIME_DAYS))
+        cobertura = int(request.args.get('cobertura', DEFAULT_COVER_DAYS))
+        limite = int(request.args.get('limite', 100))
+        if prazo < 0 or cobertura < 0 or limite < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({'erro': 'prazo e cobertura devem ser inteiros não negativos e limite um inteiro positivo'}), 400
+    
+    secoes = section_registry.ids()
+    id_secao = request.args.get('secao')
+    if id_secao is not None:
+        if not section_registry.get(id_secao):
+            return jsonify({'erro': 'Seção não encontrada'}), 404
+        secoes = [id_secao]
+    
+    modelo = demand_model.get()
+    sugestoes = reorder_suggestions(modelo, secoes, prazo, cobertura)
+    
+    # Séries sem nada a repor ficam de fora, a menos que `todas=true`
+    incluir_todas = request.args.get('todas', 'false').lower() == 'true'
+    posicoes = range(len(sugestoes['quantity'])) if incluir_todas else sugestoes['quantity'].nonzero()[0].tolist()
+    
+    resultado = []
+    for posicao in posicoes:
+        if len(resultado) == limite:
+            break
+        dias_cobertura = float(sugestoes['days_of_cover'][posicao])
+        resultado.append({
+            'secao': sugestoes['section'][posicao],
+            'genero': sugestoes['genre'][posicao] or None,
+            'estoque_atual': int(sugestoes['stock'][posicao]),
+            'velocidade_media': round(float(sugestoes['velocity'][posicao]), 2),
+            'previsao_diaria': round(float(sugestoes['forecast'][posicao]), 2),
+            'dias_cobertura': round(dias_cobertura, 1) if dias_cobertura != float('inf') else None,
+            'estoque_seguranca': round(float(sugestoes['safety_stock'][posicao]), 1),
+            'quantidade_sugerida': int(sugestoes['quantity'][posicao]),
+            'limitada_pela_capacidade': bool(sugestoes['capped'][posicao])
+        })
+    
+    return jsonify({
+        'modelo_ajustado_em': modelo.fitted_at.isoformat(),
+        'dias_historico': modelo.history_days,
+        'sugestoes': resultado
+    }), 200
+
+@logistics_bp.route('/slotting/plan', methods=['POST'])
+@jwt_required()
+def planejar_alocacao():
+    """
+    Calcular a seção de cada livro de uma remessa.
+
+    Corpo: `{'books': [{'genre': ..., 'velocity': ...}, ...]}`, onde
+    `velocity` é a venda esperada por dia (opcional). O plano respeita a
+    capacidade livre das seções, mas não reserva espaço: a capacidade é
+    verificada novamente ao adicionar os livros.
+    """
+    dados = request.get_json() or {}
+    livros = dados.get('books')
+    if not isinstance(livros, list) or not all(isinstance(livro, dict) for livro in livros):
+        return jsonify({'erro': 'books deve ser uma lista de objetos'}), 400
+    
+    for indice, livro in enumerate(livros):
+        velocidade = livro.get('velocity')
+        if velocidade is not None and (not isinstance(velocidade, (int, float)) or isinstance(velocidade, bool) or velocidade < 0):
+            return jsonify({'erro': f'velocity inválida no livro {indice}'}), 400
+        if livro.get('genre') is not None and not isinstance(livro['genre'], str):
+            return jsonify({'erro': f'genre inválido no livro {indice}'}), 400
+    
+    secoes = plan_slots(livros)
+    
+    por_secao = {}
+    for secao in secoes:
+        if secao is not None:
+            por_secao[secao] = por_secao.get(secao, 0) + 1
+    
+    return jsonify({
+        'plano': secoes,
+        'por_secao': por_secao,
+        'nao_alocados': secoes.count(None)
+    }), 200
+
 @logistics_bp.route('/move', methods=['POST'])
 @jwt_required()
 def mover_livro():
@@ -134,8 +324,11 @@ def mover_livro():
         if campo not in dados:
             return jsonify({'erro': f'Campo obrigatório ausente: {campo}'}), 400
     
-    # Buscar o livro
-    livro = Book.query.get(dados['book_id'])
+    if not section_registry.get(dados['to_section']):
+        return jsonify({'erro': 'Seção de destino não encontrada'}), 400
+    
+    # Buscar o estado atual do livro
+    livro = get_book_row(dados['book_id'])
     if not livro:
         return jsonify({'erro': 'Livro não encontrado'}), 404
     
@@ -145,8 +338,19 @@ def mover_livro():
     # Registrar a seção antiga
     secao_antiga = livro.storage_section
     
-    # Atualizar a seção do livro
-    livro.storage_section = dados['to_section']
+    # Atualizar a seção do livro em um único UPDATE condicional (status e versão lidos acima)
+    try:
+        livro = conditional_book_update(
+            livro.id,
+            {'storage_section': dados['to_section']},
+            require_status='available',
+            expected_version=livro.version
+        )
+    except BookUpdateRejected as e:
+        db.session.rollback()
+        if e.reason == 'not_available':
+            return jsonify({'erro': f'Livro não está disponível para movimentação (status atual: {e.current_status})'}), 400
+        return jsonify({'erro': 'Livro foi alterado por outra requisição, tente novamente'}), 409
     
     # Criar registro de transação
     transacao = Transaction(
@@ -159,11 +363,97 @@ def mover_livro():
     )
     
     db.session.add(transacao)
+    
+    # Ocupar a vaga na seção de destino; falha se a seção estiver cheia
+    try:
+        apply_occupancy_changes(transition(secao_antiga, 'available', dados['to_section'], 'available'))
+    except SectionCapacityExceeded:
+        db.session.rollback()
+        return jsonify({'erro': f'Seção {dados["to_section"]} está sem capacidade disponível'}), 409
     db.session.commit()
     
     return jsonify({
         'mensagem': 'Livro movido com sucesso',
-        'livro': livro.to_dict(),
+        'livro': book_serializer.fragment(livro),
         'de_secao': secao_antiga,
         'para_secao': dados['to_section']
-    }), 200 
\ No newline at end of file
+    }), 200
+
+@logistics_bp.route('/move/bulk', methods=['POST'])
+@jwt_required()
+def mover_livros_em_lote():
+    """
+    Mover vários livros para uma seção em uma única transação.
+
+    Corpo: `{'book_ids': [...], 'to_section': ..., 'notes': ...}`. Os livros
+    disponíveis são movidos com UPDATEs em conjunto e as movimentações são
+    gravadas em um único insert em lote; os demais voltam em `rejeitados`.
+    Se a seção de destino não comportar todos os livros, nada é movido (409).
+    """
+    user_id = get_jwt_identity()
+    dados = request.get_json() or {}
+    
+    # Validar campos obrigatórios
+    campos_obrigatorios = ['book_ids', 'to_section']
+    for campo in campos_obrigatorios:
+        if campo not in dados:
+            return jsonify({'erro': f'Campo obrigatório ausente: {campo}'}), 400
+    
+    ids_livros = dados['book_ids']
+    if not isinstance(ids_livros, list) or not all(isinstance(id_livro, int) for id_livro in ids_livros):
+        return jsonify({'erro': 'book_ids deve ser uma lista de inteiros'}), 400
+    
+    if not section_registry.get(dados['to_section']):
+        return jsonify({'erro': 'Seção de destino não encontrada'}), 400
+    
+    movidos, rejeitados = bulk_conditional_book_update(
+        ids_livros, {'storage_section': dados['to_section']}, require_status='available'
+    )
+    
+    if movidos:
+        db.session.execute(insert(Transaction.__table__), [
+            {
+                'book_id': livro.id,
+                'user_id': user_id,
+                'transaction_type': 'movement',
+                'from_section': livro.storage_section,
+                'to_section': dados['to_section'],
+                'notes': dados.get('notes')
+            }
+            for livro in movidos
+        ])
+        try:
+            apply_occupancy_changes(
+                mudanca
+                for livro in movidos
+                for mudanca in transition(livro.storage_section, livro.status, dados['to_section'], livro.status)
+            )
+        except SectionCapacityExceeded:
+            db.session.rollback()
+            return jsonify({'erro': f'Seção {dados["to_section"]} não comporta {len(movidos)} livros'}), 409
+    db.session.commit()
+    
+    mensagens_rejeicao = {
+        'not_found': 'Livro não encontrado',
+        'not_available': 'Livro não está disponível para movimentação',
+        'conflict': 'Livro foi alterado por outra requisição'
+    }
+    return jsonify({
+        'mensagem': f'{len(movidos)} livros movidos com sucesso',
+        'para_secao': dados['to_section'],
+        'movidos': [livro.id for livro in movidos],
+        'rejeitados': [
+            {
+                'id': erro.book_id,
+                'erro': mensagens_rejeicao[erro.reason],
+                'status_atual': erro.current_status
+            }
+            for erro in rejeitados
+        ]
+    }), 200
+
+def _validar_inteiro(campo, valor):
+    """Retorna uma mensagem de erro se o valor não for um inteiro não negativo, ou None."""
+    if not isinstance(valor, int) or isinstance(valor, bool) or valor < 0:
+        return f'{campo} deve ser um inteiro não negativo'
+    return None
@@ -0,0 +1,74 @@
+"""
+In-process registry of the storage sections.
+
+The sections change rarely and are read by every logistics endpoint, so
+they are loaded once and kept in memory. Commits that write StorageSection
+rows invalidate the registry of this process; other processes pick the
+change up after REGISTRY_TTL seconds.
+"""
+import threading
+import time
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from app import db
+from app.modules.logistics.models import StorageSection
+
+REGISTRY_TTL = 60
+
+
+class SectionRegistry:
+    """Cached, ordered view of the storage_sections table."""
+
+    def __init__(self, ttl=REGISTRY_TTL):
+        self.ttl = ttl
+        self._sections = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def all(self):
+        """Return all sections as dictionaries ordered by id."""
+        return list(self._load().values())
+
+    def get(self, section_id):
+        """Return one section as a dictionary, or None if it is not registered."""
+        return self._load().get(section_id)
+
+    def ids(self):
+        """Return the ids of all sections, ordered."""
+        return list(self._load())
+
+    def invalidate(self):
+        with self._lock:
+            self._sections = None
+
+    def _load(self):
+        sections = self._sections
+        if sections is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return sections
+
+        rows = db.session.execute(select(StorageSection).order_by(StorageSection.id)).scalars()
+        sections = {section.id: section.to_dict() for section in rows}
+        with self._lock:
+            self._sections = sections
+            self._loaded_at = time.monotonic()
+        return sections
+
+
+section_registry = SectionRegistry()
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_section_writes(session, flush_context):
+    if any(isinstance(obj, StorageSection) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['storage_sections_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('storage_sections_changed', False):
+        section_registry.invalidate()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_rolled_back_writes(session, previous_transaction):
+    session.info.pop('storage_sections_changed', None)
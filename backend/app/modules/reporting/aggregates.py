@@ -0,0 +1,88 @@
+"""
+SQL aggregates behind the reports.
+
+The breakdowns are computed by the database in one statement, so the
+reports never load the rows they summarize.
+"""
+from sqlalchemy import Date, String, cast, func, literal, select, union_all
+from app.modules.inventory.models import Book
+
+# (dimension name, column) pairs of the inventory breakdown
+INVENTORY_DIMENSIONS = (
+    ('status', Book.status),
+    ('genre', Book.genre),
+    ('section', Book.storage_section),
+)
+
+
+def inventory_breakdown_query(filters):
+    """
+    Count the filtered books in total and by status, genre and section.
+
+    One UNION ALL of GROUP BYs, the portable form of
+    `GROUP BY GROUPING SETS ((status), (genre), (storage_section), ())`.
+    Each row is (dimension, value, count); the grand total has dimension
+    `total` and a NULL value.
+    """
+    parts = [
+        select(literal('total').label('dimension'), literal(None, String).label('value'), func.count(Book.id).label('count'))
+        .where(*filters)
+    ]
+    for name, column in INVENTORY_DIMENSIONS:
+        parts.append(
+            select(literal(name), column, func.count(Book.id))
+            .where(*filters)
+            .group_by(column)
+        )
+    return union_all(*parts)
+
+
+def inventory_breakdown(session, filters):
+    """
+    Run inventory_breakdown_query.
+
+    Returns:
+        Tuple `(total, counts)`, where `counts` maps each dimension name to a
+        `{value: count}` dictionary; books without a value are only counted
+        in the total
+    """
+    total = 0
+    counts = {name: {} for name, _ in INVENTORY_DIMENSIONS}
+    for dimension, value, count in session.execute(inventory_breakdown_query(filters)):
+        if dimension == 'total':
+            total = count
+        elif value is not None:
+            counts[dimension][value] = count
+    return total, counts
+
+
+def day_bucket(column, dialect_name):
+    """SQL expression truncating a datetime column to its day."""
+    if dialect_name == 'sqlite':
+        return func.date(column)
+    return cast(column, Date)
+
+
+def time_bucket(column, granularity, dialect_name):
+    """
+    SQL expression truncating a date or datetime column to the start of its
+    bucket: `hour`, `day`, `week` (starting on Monday, as in ISO 8601) or
+    `month`.
+    """
+    if dialect_name == 'sqlite':
+        if granularity == 'hour':
+            return func.strftime('%Y-%m-%dT%H:00:00', column)
+        if granularity == 'week':
+            # Next Sunday (or the day itself), then back to its Monday
+            return func.date(column, 'weekday 0', '-6 days')
+        if granularity == 'month':
+            return func.strftime('%Y-%m-01', column)
+        return func.date(column)
+    if granularity == 'hour':
+        return func.date_trunc('hour', column)
+    return cast(func.date_trunc(granularity, column), Date)
+
+
+def bucket_key(value):
+    """Normalize a bucket returned by the database to an ISO 8601 string."""
+    return value if isinstance(value, str) else value.isoformat()
@@ -0,0 +1,200 @@
+"""
+Vectorized aggregations over the columnar transaction snapshot.
+
+The report endpoints answer from here when called with `source=snapshot`,
+so ad-hoc analysis over years of transactions never touches the database.
+Columns are memory-mapped (see app.modules.reporting.columnar): only the
+pages a query reads are loaded, and every process shares them through the
+OS page cache. Counts are computed with boolean masks and one bincount (or
+unique) over a combined integer key, never with a Python loop over rows.
+
+Answers reflect the snapshot's watermark. A request finding the snapshot
+older than ANALYTICS_SNAPSHOT_MAX_AGE seconds (default 300) starts an
+incremental refresh on the report job pool and is answered from the
+current snapshot.
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app
+from app.modules.reporting.columnar import (
+    COLUMNS, DICTIONARY_COLUMNS, MANIFEST, SnapshotBusy, column_path, read_manifest,
+    refresh_snapshot, snapshot_directory
+)
+
+DEFAULT_MAX_AGE = 300
+
+# Columns a count can be grouped by
+GROUP_COLUMNS = ('transaction_type', 'user_id', 'book_id', 'genre', 'section')
+
+# Combined keys up to this size are counted with bincount instead of unique
+_BINCOUNT_LIMIT = 1 << 22
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECONDS_PER_HOUR = 3600 * 10 ** 6
+_MICROSECONDS_PER_DAY = 24 * _MICROSECONDS_PER_HOUR
+
+_loaded = {}
+_load_lock = threading.Lock()
+_refreshing = threading.Event()
+
+
+class TransactionSnapshot:
+    """A published version of the snapshot, with its columns mapped in memory."""
+
+    def __init__(self, directory, manifest):
+        self.rows = manifest['rows']
+        self.watermark = manifest['watermark']
+        self.refreshed_at = datetime.fromisoformat(manifest['refreshed_at'])
+        self.dictionaries = manifest['dictionaries']
+        self.columns = {
+            column: np.memmap(column_path(directory, manifest, column), dtype=dtype, mode='r', shape=(self.rows,))
+            if self.rows else np.empty(0, dtype=dtype)
+            for column, dtype in COLUMNS.items()
+        }
+
+    def counts(self, start, end, group_by=(), transaction_types=None, granularity=None):
+        """
+        Count the transactions in [start, end].
+
+        Args:
+            start: Start of the window (inclusive, naive UTC)
+            end: End of the window (inclusive, naive UTC)
+            group_by: Names from GROUP_COLUMNS
+            transaction_types: Optional list of transaction types to count
+            granularity: Optional time bucket (`hour`, `day`, `week` or
+                `month`), keyed like bucket_key() in the SQL series
+
+        Returns:
+            Dict mapping `(bucket, *group values)` (without the bucket when
+            no granularity is given) to a count; genre and section are ''
+            for transactions without one
+        """
+        created_at = self.columns['created_at']
+        mask = (created_at >= _microseconds(start)) & (created_at <= _microseconds(end))
+        if transaction_types is not None:
+            codes = [
+                code for code, value in enumerate(self.dictionaries['transaction_type'])
+                if value in transaction_types
+            ]
+            mask &= np.isin(self.columns['transaction_type'], codes)
+        selected = np.flatnonzero(mask)
+
+        keys = []
+        if granularity is not None:
+            keys.append(_bucket_numbers(created_at[selected], granularity))
+        keys.extend(np.asarray(self.columns[column][selected], dtype=np.int64) for column in group_by)
+        if not keys:
+            return {(): len(selected)}
+        if not len(selected):
+            return {}
+
+        # One integer key per row: the offsets of each key in a mixed-radix number
+        lows = [int(key.min()) for key in keys]
+        sizes = [int(key.max()) - low + 1 for key, low in zip(keys, lows)]
+        combined = np.ravel_multi_index([key - low for key, low in zip(keys, lows)], sizes)
+        total_size = int(np.prod(sizes, dtype=np.float64))
+        if total_size <= _BINCOUNT_LIMIT:
+            tally = np.bincount(combined, minlength=total_size)
+            present = np.flatnonzero(tally)
+            tally = tally[present]
+        else:
+            present, tally = np.unique(combined, return_counts=True)
+
+        decoders = ([lambda number: _bucket_key(number, granularity)] if granularity is not None else []) + [
+            self.dictionaries[column].__getitem__ if column in DICTIONARY_COLUMNS else int
+            for column in group_by
+        ]
+        # Decode each distinct value of a part once, not once per result
+        parts = []
+        for position, low, decode in zip(np.unravel_index(present, sizes), lows, decoders):
+            distinct, inverse = np.unique(position, return_inverse=True)
+            decoded = np.empty(len(distinct), dtype=object)
+            decoded[:] = [decode(value) for value in (distinct + low).tolist()]
+            parts.append(decoded[inverse].tolist())
+        return {
+            values: count
+            for values, count in zip(zip(*parts), tally.tolist())
+        }
+
+
+def _microseconds(moment):
+    return (moment - _EPOCH) // timedelta(microseconds=1)
+
+
+def _bucket_numbers(created_at, granularity):
+    """Number of the bucket of each timestamp: hours, days or months since the epoch."""
+    if granularity == 'hour':
+        return created_at // _MICROSECONDS_PER_HOUR
+    days = created_at // _MICROSECONDS_PER_DAY
+    if granularity == 'week':
+        # 1970-01-01 was a Thursday; weeks start on Monday
+        return days - (days + 3) % 7
+    if granularity == 'month':
+        return days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+    return days
+
+
+def _bucket_key(number, granularity):
+    if granularity == 'hour':
+        return (_EPOCH + timedelta(hours=number)).isoformat()
+    if granularity == 'month':
+        return f'{1970 + number // 12:04d}-{number % 12 + 1:02d}-01'
+    return (_EPOCH + timedelta(days=number)).date().isoformat()
+
+
+def load_snapshot():
+    """
+    Return the latest published snapshot, or None if none was exported yet.
+
+    The mapped snapshot is kept per process and reloaded when the manifest
+    changes. A stale snapshot triggers a background refresh.
+    """
+    directory = snapshot_directory()
+    try:
+        stamp = os.stat(os.path.join(directory, MANIFEST)).st_mtime_ns
+    except FileNotFoundError:
+        stamp = None
+
+    with _load_lock:
+        loaded = _loaded.get(directory)
+        if stamp is None:
+            snapshot = None
+        elif loaded is not None and loaded[0] == stamp:
+            snapshot = loaded[1]
+        else:
+            manifest = read_manifest(directory)
+            snapshot = TransactionSnapshot(directory, manifest)
+            _loaded[directory] = (stamp, snapshot)
+
+    max_age = current_app.config.get('ANALYTICS_SNAPSHOT_MAX_AGE', DEFAULT_MAX_AGE)
+    if snapshot is None or datetime.utcnow() - snapshot.refreshed_at > timedelta(seconds=max_age):
+        refresh_in_background()
+    return snapshot
+
+
+def refresh_in_background():
+    """Start an incremental refresh on the report job pool, unless one is running here."""
+    if _refreshing.is_set():
+        return
+    _refreshing.set()
+    app = current_app._get_current_object()
+    try:
+        app.extensions['report_jobs'].submit(_refresh_in_app_context, app)
+    except Exception:
+        _refreshing.clear()
+        raise
+
+
+def _refresh_in_app_context(app):
+    try:
+        with app.app_context():
+            try:
+                refresh_snapshot()
+            except SnapshotBusy:
+                pass
+            except Exception:
+                app.logger.exception('Analytics snapshot refresh failed')
+    finally:
+        _refreshing.clear()
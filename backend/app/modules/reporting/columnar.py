@@ -0,0 +1,225 @@
+"""
+Columnar snapshot of the transaction log for analytics.
+
+Transactions are exported to one raw binary file per column in
+ANALYTICS_SNAPSHOT_DIR (default `analytics_snapshot` in the instance
+folder), which readers map in memory with NumPy. Transaction type, genre
+and section are dictionary-encoded as small integer codes; user and book
+ids are stored as they are. Genre and section are those of the book at
+export time, like the daily rollups.
+
+The snapshot is refreshed incrementally: rows with an id above the
+watermark are read in keyset batches and appended to the column files.
+`manifest.json` records the number of valid rows, the watermark and the
+dictionaries, and is replaced atomically after the data is written, so
+readers never see a partial batch. A full rebuild writes a new generation
+of files and switches the manifest once it is complete.
+
+Rows are exported in id order. On databases where a transaction can
+commit after one with a higher id (PostgreSQL sequences), a row that
+commits late is skipped until the next full rebuild.
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+from flask import current_app
+from sqlalchemy import func, select
+from app import db
+from app.modules.inventory.models import Book, Transaction
+
+# Column name -> dtype of its file
+COLUMNS = {
+    'id': np.int64,
+    'created_at': np.int64,  # microseconds since the Unix epoch (UTC)
+    'transaction_type': np.int16,
+    'user_id': np.int64,
+    'book_id': np.int64,
+    'genre': np.int32,
+    'section': np.int32,
+}
+
+# Dictionary-encoded columns; code 0 of genre and section is '' (none)
+DICTIONARY_COLUMNS = ('transaction_type', 'genre', 'section')
+
+REFRESH_BATCH_SIZE = 100000
+
+# A refresh lock older than this is considered left by a dead process
+STALE_LOCK_SECONDS = 3600
+
+MANIFEST = 'manifest.json'
+_LOCK = 'refresh.lock'
+
+
+class SnapshotBusy(Exception):
+    """Raised when another process is already refreshing the snapshot."""
+
+
+def snapshot_directory(app=None):
+    """Directory of the snapshot files, created on demand."""
+    app = app or current_app
+    directory = app.config.get('ANALYTICS_SNAPSHOT_DIR') or os.path.join(app.instance_path, 'analytics_snapshot')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def read_manifest(directory):
+    """Return the current manifest, or None if no snapshot was exported yet."""
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding='utf-8') as manifest_file:
+            return json.load(manifest_file)
+    except FileNotFoundError:
+        return None
+
+
+def column_path(directory, manifest, column):
+    return os.path.join(directory, f'{manifest["generation"]}.{column}.bin')
+
+
+def _write_manifest(directory, manifest):
+    temporary = os.path.join(directory, MANIFEST + '.tmp')
+    with open(temporary, 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file)
+        manifest_file.flush()
+        os.fsync(manifest_file.fileno())
+    os.replace(temporary, os.path.join(directory, MANIFEST))
+
+
+@contextmanager
+def _refresh_lock(directory):
+    """Hold a lock file so only one process refreshes the snapshot at a time."""
+    path = os.path.join(directory, _LOCK)
+    try:
+        descriptor = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        if time.time() - os.path.getmtime(path) < STALE_LOCK_SECONDS:
+            raise SnapshotBusy('The analytics snapshot is already being refreshed')
+        os.remove(path)
+        descriptor = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    try:
+        os.write(descriptor, str(os.getpid()).encode('ascii'))
+        os.close(descriptor)
+        yield
+    finally:
+        os.remove(path)
+
+
+def _encode(values, dictionary, positions):
+    """Dictionary-encode a batch of values, adding new values to the dictionary."""
+    unique, inverse = np.unique(np.array(values, dtype=object), return_inverse=True)
+    codes = np.empty(len(unique), dtype=np.int64)
+    for index, value in enumerate(unique.tolist()):
+        code = positions.get(value)
+        if code is None:
+            code = positions[value] = len(dictionary)
+            dictionary.append(value)
+        codes[index] = code
+    return codes[inverse]
+
+
+def refresh_snapshot(full=False, batch_size=None):
+    """
+    Append the transactions above the watermark to the snapshot.
+
+    Args:
+        full: Rebuild the snapshot from scratch in a new generation of files
+        batch_size: Rows read per query; REFRESH_BATCH_SIZE by default
+
+    Returns:
+        Tuple `(manifest, exported)`: the published manifest and the number
+        of transactions added
+
+    Raises:
+        SnapshotBusy: If another process is refreshing the snapshot
+    """
+    directory = snapshot_directory()
+    batch_size = batch_size or REFRESH_BATCH_SIZE
+
+    with _refresh_lock(directory):
+        previous = read_manifest(directory)
+        incremental = previous is not None and not full
+        if not incremental:
+            manifest = {
+                'generation': (previous['generation'] + 1) if previous else 1,
+                'rows': 0,
+                'watermark': 0,
+                'refreshed_at': None,
+                'dictionaries': {'transaction_type': [], 'genre': [''], 'section': ['']},
+            }
+        else:
+            manifest = previous
+
+        # Drop whatever an interrupted refresh appended after the last published row
+        for column, dtype in COLUMNS.items():
+            path = column_path(directory, manifest, column)
+            valid_size = manifest['rows'] * np.dtype(dtype).itemsize
+            with open(path, 'ab') as column_file:
+                if column_file.tell() != valid_size:
+                    column_file.truncate(valid_size)
+
+        dictionaries = manifest['dictionaries']
+        positions = {
+            name: {value: code for code, value in enumerate(values)}
+            for name, values in dictionaries.items()
+        }
+        query = (
+            select(
+                Transaction.id, Transaction.created_at, Transaction.transaction_type, Transaction.user_id,
+                Transaction.book_id, func.coalesce(Book.genre, ''),
+                func.coalesce(Transaction.to_section, Transaction.from_section, '')
+            )
+            .select_from(Transaction)
+            .outerjoin(Book, Book.id == Transaction.book_id)
+            .order_by(Transaction.id)
+            .limit(batch_size)
+        )
+
+        exported = 0
+        while True:
+            rows = db.session.execute(query.where(Transaction.id > manifest['watermark'])).all()
+            # Ends the read transaction between batches
+            db.session.commit()
+            if not rows:
+                break
+
+            ids, created_at, types, user_ids, book_ids, genres, sections = zip(*rows)
+            batch = {
+                'id': np.array(ids, dtype=np.int64),
+                'created_at': np.array(created_at, dtype='datetime64[us]').astype(np.int64),
+                'transaction_type': _encode(types, dictionaries['transaction_type'], positions['transaction_type']),
+                'user_id': np.array(user_ids, dtype=np.int64),
+                'book_id': np.array(book_ids, dtype=np.int64),
+                'genre': _encode(genres, dictionaries['genre'], positions['genre']),
+                'section': _encode(sections, dictionaries['section'], positions['section']),
+            }
+            for column, dtype in COLUMNS.items():
+                with open(column_path(directory, manifest, column), 'ab') as column_file:
+                    batch[column].astype(dtype).tofile(column_file)
+                    column_file.flush()
+                    os.fsync(column_file.fileno())
+
+            manifest['rows'] += len(rows)
+            manifest['watermark'] = int(ids[-1])
+            exported += len(rows)
+            # A new generation is published only when complete
+            if incremental:
+                manifest['refreshed_at'] = datetime.utcnow().isoformat()
+                _write_manifest(directory, manifest)
+
+        manifest['refreshed_at'] = datetime.utcnow().isoformat()
+        _write_manifest(directory, manifest)
+        _remove_old_generations(directory, manifest['generation'])
+    return manifest, exported
+
+
+def _remove_old_generations(directory, generation):
+    for name in os.listdir(directory):
+        prefix = name.split('.', 1)[0]
+        if name.endswith('.bin') and prefix.isdigit() and int(prefix) != generation:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                # Still mapped by a reader (Windows); removed by a later refresh
+                pass
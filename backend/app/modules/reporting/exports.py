@@ -0,0 +1,183 @@
+"""
+Incremental CSV and XLSX writers for report exports.
+
+Rows are written to disk as they are produced, so an export uses the same
+memory for ten rows or ten million. The XLSX writer needs no third-party
+package: it streams a single worksheet with inline strings straight into
+the zip archive.
+
+Text starting like a formula (`=`, `+`, `-`, `@`, tab or carriage return)
+is never evaluated when the file is opened: CSV cells get a leading `'`
+and XLSX cells are marked as quoted text.
+"""
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from xml.sax.saxutils import escape
+
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Characters not allowed in XML 1.0 documents
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+# First characters that make a spreadsheet read a cell as a formula
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# Index of the quoted text style in xl/styles.xml
+_QUOTED_TEXT_STYLE = 1
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{sheet}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # Style 0 is the default; style 1 (_QUOTED_TEXT_STYLE) keeps a cell as literal text
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0" quotePrefix="1"/></cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+
+def _text(value):
+    """Render a cell value as text (dates in ISO 8601, None as empty)."""
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _is_formula_like(text):
+    return text.startswith(_FORMULA_PREFIXES)
+
+
+def _csv_value(value):
+    """Render a CSV field, quoting text that a spreadsheet would run as a formula."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, str) and _is_formula_like(value):
+        return "'" + value
+    return value
+
+
+class CsvExportWriter:
+    """Write rows to a UTF-8 CSV file (with BOM, so spreadsheets detect the encoding)."""
+
+    def __init__(self, path, columns):
+        self._file = open(path, 'w', encoding='utf-8-sig', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write_rows(self, rows):
+        # The csv module already writes None as an empty field
+        self._writer.writerows([_csv_value(value) for value in row] for row in rows)
+
+    def close(self):
+        self._file.close()
+
+
+class XlsxExportWriter:
+    """Write rows to a single-sheet XLSX workbook, streaming the sheet XML."""
+
+    def __init__(self, path, columns, sheet_name='Relatorio'):
+        self._archive = zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED)
+        for name, content in _XLSX_STATIC_PARTS.items():
+            self._archive.writestr(name, content.replace('{sheet}', escape(sheet_name)))
+        # force_zip64: the sheet size is unknown until it is closed
+        self._sheet = self._archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True)
+        self._sheet.write(
+            b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+        )
+        self._row_number = 0
+        self.write_rows([columns])
+
+    def _cell(self, value):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return f'<c><v>{value}</v></c>'
+        text = _INVALID_XML_CHARS.sub('', _text(value))
+        style = f' s="{_QUOTED_TEXT_STYLE}"' if _is_formula_like(text) else ''
+        return f'<c t="inlineStr"{style}><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+    def write_rows(self, rows):
+        pieces = []
+        for row in rows:
+            self._row_number += 1
+            pieces.append(f'<row r="{self._row_number}">')
+            pieces.extend(self._cell(value) for value in row)
+            pieces.append('</row>')
+        self._sheet.write(''.join(pieces).encode('utf-8'))
+
+    def close(self):
+        self._sheet.write(b'</sheetData></worksheet>')
+        self._sheet.close()
+        self._archive.close()
+
+
+def open_export_writer(path, export_format, columns):
+    """
+    Create a writer for an export file.
+
+    Args:
+        path: File to create
+        export_format: One of EXPORT_FORMATS
+        columns: Header row
+
+    Returns:
+        Writer with `write_rows(rows)` and `close()`
+    """
+    if export_format == 'csv':
+        return CsvExportWriter(path, columns)
+    if export_format == 'xlsx':
+        return XlsxExportWriter(path, columns)
+    raise ValueError(f'Unsupported export format: {export_format}')
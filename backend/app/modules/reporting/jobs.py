@@ -0,0 +1,254 @@
+"""
+Report exports running in the background.
+
+An export request is recorded as a ReportJob and handed to a thread pool
+(REPORT_JOB_WORKERS threads per process, 2 by default), so the web worker
+answers at once. The job reads its rows in keyset-paginated batches of
+EXPORT_BATCH_SIZE and appends each batch to a CSV or XLSX file in
+REPORT_EXPORT_DIR (default `report_exports` in the instance folder).
+Memory stays bounded by one batch, no read transaction is held open
+across batches, and progress is committed after every batch so any
+worker can report it. The file is written under a temporary name and
+renamed when complete.
+
+A job whose process dies stays `running`; `flask purge-report-jobs`
+removes it with the other expired jobs.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func, select, tuple_
+from app import db
+from app.modules.inventory.models import Book, Transaction
+from app.modules.reporting.exports import open_export_writer
+from app.modules.reporting.models import ReportJob
+from app.modules.reporting.rollups import transaction_counts
+from app.modules.user_management.models import User
+
+DEFAULT_WORKERS = 2
+EXPORT_BATCH_SIZE = 5000
+
+SALES_COLUMNS = [
+    'id_transacao', 'data_venda', 'livro_id', 'titulo', 'autor', 'genero',
+    'vendedor_id', 'vendedor', 'secao_origem', 'observacoes'
+]
+INVENTORY_COLUMNS = [
+    'id', 'titulo', 'autor', 'genero', 'secao', 'status', 'criado_em', 'atualizado_em'
+]
+
+
+def export_sales(parameters):
+    """
+    Sales of a period, oldest first.
+
+    Args:
+        parameters: Dict with `data_inicio` and `data_fim` (ISO 8601, UTC)
+
+    Returns:
+        Tuple `(columns, total, batches)`
+    """
+    start = datetime.fromisoformat(parameters['data_inicio'])
+    end = datetime.fromisoformat(parameters['data_fim'])
+
+    counts = transaction_counts(start, end, ['transaction_type'], ['sale'])
+    total = db.session.execute(select(func.coalesce(func.sum(counts.c.count), 0))).scalar()
+
+    query = (
+        select(
+            Transaction.id, Transaction.created_at, Transaction.book_id, Book.title, Book.author,
+            Book.genre, Transaction.user_id, User.username, Transaction.from_section, Transaction.notes
+        )
+        .select_from(Transaction)
+        .outerjoin(Book, Book.id == Transaction.book_id)
+        .outerjoin(User, User.id == Transaction.user_id)
+        .where(
+            Transaction.transaction_type == 'sale',
+            Transaction.created_at >= start,
+            Transaction.created_at <= end
+        )
+        .order_by(Transaction.created_at, Transaction.id)
+    )
+
+    def batches():
+        after = None
+        while True:
+            page = query if after is None else query.where(
+                tuple_(Transaction.created_at, Transaction.id) > tuple_(*after)
+            )
+            rows = db.session.execute(page.limit(EXPORT_BATCH_SIZE)).all()
+            if not rows:
+                return
+            after = (rows[-1].created_at, rows[-1].id)
+            yield rows
+
+    return SALES_COLUMNS, total, batches()
+
+
+def export_inventory(parameters):
+    """
+    Books matching the inventory filters, by id.
+
+    Args:
+        parameters: Dict with optional `status`, `genre` and `section`
+
+    Returns:
+        Tuple `(columns, total, batches)`
+    """
+    filters = []
+    if parameters.get('status'):
+        filters.append(Book.status == parameters['status'])
+    if parameters.get('genre'):
+        filters.append(Book.genre == parameters['genre'])
+    if parameters.get('section'):
+        filters.append(Book.storage_section == parameters['section'])
+
+    total = db.session.execute(select(func.count(Book.id)).where(*filters)).scalar()
+    query = (
+        select(
+            Book.id, Book.title, Book.author, Book.genre, Book.storage_section,
+            Book.status, Book.created_at, Book.updated_at
+        )
+        .where(*filters)
+        .order_by(Book.id)
+    )
+
+    def batches():
+        after = None
+        while True:
+            page = query if after is None else query.where(Book.id > after)
+            rows = db.session.execute(page.limit(EXPORT_BATCH_SIZE)).all()
+            if not rows:
+                return
+            after = rows[-1].id
+            yield rows
+
+    return INVENTORY_COLUMNS, total, batches()
+
+
+# Exportable reports by name (the name of the matching report route)
+EXPORT_REPORTS = {
+    'vendas': export_sales,
+    'inventario': export_inventory,
+}
+
+
+def init_report_jobs(app):
+    """Create the thread pool that runs the report jobs of this process."""
+    executor = ThreadPoolExecutor(
+        max_workers=app.config.get('REPORT_JOB_WORKERS', DEFAULT_WORKERS),
+        thread_name_prefix='report-job'
+    )
+    app.extensions['report_jobs'] = executor
+    return executor
+
+
+def job_file_path(job):
+    """Path of the export file of a job; the directory is created on demand."""
+    directory = current_app.config.get('REPORT_EXPORT_DIR') or os.path.join(current_app.instance_path, 'report_exports')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{job.id}.{job.export_format}')
+
+
+def submit_report_job(report, export_format, parameters, user_id):
+    """
+    Record a report job and start it in the background.
+
+    Args:
+        report: Key of EXPORT_REPORTS
+        export_format: One of EXPORT_FORMATS
+        parameters: Validated report parameters (JSON-serializable)
+        user_id: User requesting the export
+
+    Returns:
+        The committed ReportJob
+    """
+    job = ReportJob(
+        id=os.urandom(16).hex(),
+        user_id=user_id,
+        report=report,
+        export_format=export_format,
+        parameters=json.dumps(parameters),
+        status='pending'
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    app.extensions['report_jobs'].submit(_run_in_app_context, app, job.id)
+    return job
+
+
+def _run_in_app_context(app, job_id):
+    with app.app_context():
+        run_report_job(job_id)
+
+
+def run_report_job(job_id):
+    """Run a pending job to completion, recording its progress and outcome."""
+    job = db.session.get(ReportJob, job_id)
+    if job is None or job.status != 'pending':
+        return
+    job.status = 'running'
+    job.started_at = datetime.utcnow()
+    db.session.commit()
+
+    path = job_file_path(job)
+    partial_path = path + '.part'
+    try:
+        columns, total, batches = EXPORT_REPORTS[job.report](json.loads(job.parameters))
+        job.total_rows = total
+        db.session.commit()
+
+        writer = open_export_writer(partial_path, job.export_format, columns)
+        try:
+            for rows in batches:
+                writer.write_rows(rows)
+                job.rows_written += len(rows)
+                # Ends the read transaction and publishes the progress
+                db.session.commit()
+        finally:
+            writer.close()
+        os.replace(partial_path, path)
+
+        job.status = 'done'
+        job.file_path = path
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception('Report job %s failed', job_id)
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        job.status = 'failed'
+        job.error = str(e)
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+
+
+def purge_report_jobs(max_age):
+    """
+    Delete the jobs created more than `max_age` ago and their files.
+
+    The caller commits the deletion.
+
+    Args:
+        max_age: timedelta
+
+    Returns:
+        Number of jobs deleted
+    """
+    cutoff = datetime.utcnow() - max_age
+    jobs = db.session.execute(select(ReportJob).where(ReportJob.created_at < cutoff)).scalars().all()
+    for job in jobs:
+        path = job_file_path(job)
+        for leftover in (path, path + '.part'):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        db.session.delete(job)
+    return len(jobs)
+
+
+def job_file_ready(job):
+    """Check if the job finished and its file still exists."""
+    return job.status == 'done' and job.file_path is not None and os.path.exists(job.file_path)
+
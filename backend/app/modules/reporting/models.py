@@ -0,0 +1,60 @@
+"""
+Reporting models for the Book Logistics API.
+"""
+import json
+from datetime import datetime
+from app import db
+
+class DailyTransactionRollup(db.Model):
+    """Number of transactions per day, type, user, genre and section."""
+    __tablename__ = 'daily_transaction_rollups'
+    
+    day = db.Column(db.Date, primary_key=True)
+    transaction_type = db.Column(db.String(20), primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)
+    # Empty string when the book has no genre / the transaction no section
+    genre = db.Column(db.String(100), primary_key=True, default='')
+    section = db.Column(db.String(50), primary_key=True, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DailyTransactionRollup {self.day} {self.transaction_type}: {self.count}>'
+
+class ReportJob(db.Model):
+    """Report export running in the background (see app.modules.reporting.jobs)."""
+    __tablename__ = 'report_jobs'
+    
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    user_id = db.Column(db.Integer, nullable=False)
+    report = db.Column(db.String(50), nullable=False)
+    export_format = db.Column(db.String(10), nullable=False)  # csv, xlsx
+    parameters = db.Column(db.Text, nullable=False, default='{}')  # JSON
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, done, failed
+    rows_written = db.Column(db.Integer, nullable=False, default=0)
+    total_rows = db.Column(db.Integer, nullable=True)
+    file_path = db.Column(db.String(500), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    def to_dict(self):
+        """Convert job to dictionary for API responses."""
+        return {
+            'id': self.id,
+            'report': self.report,
+            'format': self.export_format,
+            'parameters': json.loads(self.parameters),
+            'status': self.status,
+            'rows_written': self.rows_written,
+            'total_rows': self.total_rows,
+            'progress': round(min(self.rows_written / self.total_rows, 1.0), 4)
+            if self.total_rows else (1.0 if self.status == 'done' else 0.0),
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+    
+    def __repr__(self):
+        return f'<ReportJob {self.id} {self.report} {self.status}>'
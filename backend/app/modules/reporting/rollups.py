@@ -0,0 +1,185 @@
+"""
+Daily transaction rollups.
+
+`daily_transaction_rollups` counts transactions per (day, type, user, genre,
+section). A trigger on `transactions` adds every new row to its bucket in
+the same statement that writes it, whatever code path inserted it. Reports
+read the whole days of their window from the rollups and only the partial
+first and last days from `transactions`, so their cost grows with the
+number of days instead of the number of transactions.
+
+The section of a transaction is its destination (`to_section`), or its
+origin for sales. Rollups are never decremented: `rebuild_rollups` (CLI
+`flask rebuild-rollups`) recomputes them if transactions are edited or
+deleted by hand.
+"""
+from datetime import datetime, time, timedelta
+from sqlalchemy import DDL, delete, event, func, insert, select, union_all
+from app import db
+from app.modules.inventory.models import Book, Transaction
+from app.modules.reporting.aggregates import day_bucket
+from app.modules.reporting.models import DailyTransactionRollup
+
+SQLITE_ROLLUP_DDL = [
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_rollup_ai AFTER INSERT ON transactions BEGIN
+        INSERT INTO daily_transaction_rollups (day, transaction_type, user_id, genre, section, count)
+        VALUES (
+            date(new.created_at), new.transaction_type, new.user_id,
+            coalesce((SELECT genre FROM books WHERE id = new.book_id), ''),
+            coalesce(new.to_section, new.from_section, ''), 1
+        )
+        ON CONFLICT (day, transaction_type, user_id, genre, section) DO UPDATE SET count = count + 1;
+    END
+    """,
+]
+
+POSTGRESQL_ROLLUP_DDL = [
+    """
+    CREATE OR REPLACE FUNCTION transactions_rollup() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO daily_transaction_rollups (day, transaction_type, user_id, genre, section, count)
+        VALUES (
+            CAST(NEW.created_at AS DATE), NEW.transaction_type, NEW.user_id,
+            coalesce((SELECT genre FROM books WHERE id = NEW.book_id), ''),
+            coalesce(NEW.to_section, NEW.from_section, ''), 1
+        )
+        ON CONFLICT (day, transaction_type, user_id, genre, section)
+        DO UPDATE SET count = daily_transaction_rollups.count + 1;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS transactions_rollup_ai ON transactions",
+    """
+    CREATE TRIGGER transactions_rollup_ai AFTER INSERT ON transactions
+    FOR EACH ROW EXECUTE FUNCTION transactions_rollup()
+    """,
+]
+
+# Keep databases created with db.create_all() (tests, scripts) rolled up too
+for _statement in SQLITE_ROLLUP_DDL:
+    event.listen(Transaction.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+for _statement in POSTGRESQL_ROLLUP_DDL:
+    event.listen(Transaction.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+
+# Rollup dimensions and the matching expression over a raw transaction
+DIMENSIONS = ('day', 'transaction_type', 'user_id', 'genre', 'section')
+
+
+def raw_dimensions(dialect_name):
+    """
+    Expressions computing each rollup dimension from a transaction.
+
+    `genre` needs transactions outer-joined to books.
+    """
+    return {
+        'day': day_bucket(Transaction.created_at, dialect_name),
+        'transaction_type': Transaction.transaction_type,
+        'user_id': Transaction.user_id,
+        'genre': func.coalesce(Book.genre, ''),
+        'section': func.coalesce(Transaction.to_section, Transaction.from_section, ''),
+    }
+
+
+def rollup_window(start, end):
+    """
+    Split the inclusive window [start, end] at day boundaries.
+
+    Returns:
+        Tuple `(first_day, last_day, end_exclusive)`: the days in
+        [first_day, last_day) are fully covered and can be read from the
+        rollups; `start` to the first day and the last day to
+        `end_exclusive` must be read from transactions
+    """
+    end_exclusive = end + timedelta(microseconds=1)
+    first_day = start.date() if start.time() == time.min else start.date() + timedelta(days=1)
+    last_day = end_exclusive.date()
+    if first_day >= last_day:
+        first_day = last_day = None
+    return first_day, last_day, end_exclusive
+
+
+def transaction_counts(start, end, dimensions, transaction_types=None):
+    """
+    Count transactions in [start, end] grouped by some rollup dimensions.
+
+    Whole days come from the rollups and the partial edge days from
+    transactions; the parts are combined with UNION ALL, so callers should
+    aggregate the result again (`SUM(count)`) when grouping more coarsely.
+
+    Args:
+        start: Start of the window (inclusive)
+        end: End of the window (inclusive)
+        dimensions: Names from DIMENSIONS to group by
+        transaction_types: Optional list of transaction types to count
+
+    Returns:
+        Subquery with one column per dimension plus `count`
+    """
+    dialect_name = db.session.get_bind().dialect.name
+    rollup = DailyTransactionRollup.__table__
+    raw = raw_dimensions(dialect_name)
+    first_day, last_day, end_exclusive = rollup_window(start, end)
+
+    def raw_part(range_start, range_end):
+        columns = [raw[name].label(name) for name in dimensions]
+        query = (
+            select(*columns, func.count(Transaction.id).label('count'))
+            .where(Transaction.created_at >= range_start, Transaction.created_at < range_end)
+            .group_by(*columns)
+        )
+        if 'genre' in dimensions:
+            query = query.select_from(Transaction).outerjoin(Book, Book.id == Transaction.book_id)
+        if transaction_types is not None:
+            query = query.where(Transaction.transaction_type.in_(transaction_types))
+        return query
+
+    if first_day is None:
+        parts = [raw_part(start, end_exclusive)]
+    else:
+        columns = [rollup.c[name].label(name) for name in dimensions]
+        rollup_part = (
+            select(*columns, func.sum(rollup.c.count).label('count'))
+            .where(rollup.c.day >= first_day, rollup.c.day < last_day)
+            .group_by(*columns)
+        )
+        if transaction_types is not None:
+            rollup_part = rollup_part.where(rollup.c.transaction_type.in_(transaction_types))
+        parts = [
+            rollup_part,
+            raw_part(start, datetime.combine(first_day, time.min)),
+            raw_part(datetime.combine(last_day, time.min), end_exclusive),
+        ]
+    return union_all(*parts).subquery('transaction_counts')
+
+
+def rebuild_rollups(since=None):
+    """
+    Recompute the rollups from transactions with one INSERT ... SELECT.
+
+    Args:
+        since: Only rebuild the days from this date on; all days by default
+
+    Returns:
+        Number of rollup rows written
+    """
+    rollup = DailyTransactionRollup.__table__
+    dialect_name = db.session.get_bind().dialect.name
+    raw = raw_dimensions(dialect_name)
+    columns = [raw[name] for name in DIMENSIONS]
+
+    source = (
+        select(*columns, func.count(Transaction.id))
+        .select_from(Transaction)
+        .outerjoin(Book, Book.id == Transaction.book_id)
+        .group_by(*columns)
+    )
+    clear = delete(rollup)
+    if since is not None:
+        source = source.where(Transaction.created_at >= datetime.combine(since, time.min))
+        clear = clear.where(rollup.c.day >= since)
+
+    db.session.execute(clear)
+    result = db.session.execute(insert(rollup).from_select([*DIMENSIONS, 'count'], source))
+    return result.rowcount
@@ -1,20 +1,57 @@
 """
 Rotas do módulo de relatórios para a API de Logística de Livros.
 """
-from datetime import datetime, timedelta
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt
-from sqlalchemy import func, desc
+import json
+from datetime import datetime, timedelta, timezone
+from flask import Blueprint, request, jsonify, send_file, url_for
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from sqlalchemy import case, func, select, tuple_
 from app import db
-from app.modules.inventory.models import Book, Transaction
+from app.modules.inventory.models import Book, Transaction, book_serializer
+from app.modules.inventory.pagination import decode_cursor, encode_cursor, parse_limit
+from app.modules.logistics.models import SectionOccupancy
+from app.modules.logistics.occupancy import OCCUPANCY_STATUSES
+from app.modules.logistics.sections import section_registry
+from app.modules.reporting.aggregates import bucket_key, inventory_breakdown
+from app.modules.reporting.analytics import load_snapshot
+from app.modules.reporting.exports import EXPORT_FORMATS, EXPORT_MIMETYPES
+from app.modules.reporting.jobs import EXPORT_REPORTS, job_file_ready, submit_report_job
+from app.modules.reporting.models import DailyTransactionRollup, ReportJob
+from app.modules.reporting.rollups import transaction_counts
+from app.modules.reporting.series import (
+    GRANULARITIES, GROUPINGS, MAX_BUCKETS, bucket_count, transaction_series
+)
 from app.modules.user_management.models import User
+from app.report_cache import cached_report, snapshot_report
+from app.streaming import (
+    NDJSON_MIMETYPE, iter_rows, ndjson_requested, stream_pieces, streaming_requested
+)
 
 reporting_bp = Blueprint('reporting', __name__, url_prefix='/api/reports')
 
+# Tipos de transação contados no relatório de desempenho e suas chaves na resposta
+TIPOS_DESEMPENHO = (
+    ('sale', 'vendas'),
+    ('addition', 'livros_catalogados'),
+    ('movement', 'movimentacoes'),
+)
+
+# Número de gêneros mais vendidos no painel de indicadores
+GENEROS_PAINEL = 5
+
 @reporting_bp.route('/inventario', methods=['GET'])
 @jwt_required()
+@cached_report
 def relatorio_inventario():
-    """Gerar relatório de inventário com filtros opcionais."""
+    """
+    Gerar relatório de inventário com filtros opcionais.
+
+    As estatísticas são calculadas no banco por uma única consulta agregada.
+    `summary_only=true` devolve apenas o total e as estatísticas; `limit` e
+    `cursor` paginam a lista de livros por id (`proximo_cursor`). Com
+    `stream=true` ou `Accept: application/x-ndjson` a lista é enviada à
+    medida que os livros são lidos do banco.
+    """
     # Verificar se o usuário tem privilégios de administrador
     claims = get_jwt()
     if claims.get('role') != 'admin':
@@ -24,168 +61,278 @@ def relatorio_inventario():
     status = request.args.get('status')
     genero = request.args.get('genre')
     secao = request.args.get('section')
+    apenas_resumo = request.args.get('summary_only', '').lower() in ('1', 'true')
+    paginar = 'limit' in request.args or 'cursor' in request.args
     
-    # Iniciar com consulta base
-    consulta = Book.query
+    try:
+        limite = parse_limit(request.args.get('limit'))
+        cursor = request.args.get('cursor')
+        apos_id = decode_cursor(cursor, 1)[0] if cursor else None
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
     
     # Aplicar filtros se fornecidos
+    filtros = []
     if status:
-        consulta = consulta.filter(Book.status == status)
+        filtros.append(Book.status == status)
     if genero:
-        consulta = consulta.filter(Book.genre == genero)
+        filtros.append(Book.genre == genero)
     if secao:
-        consulta = consulta.filter(Book.storage_section == secao)
+        filtros.append(Book.storage_section == secao)
     
-    # Executar consulta
-    livros = consulta.all()
+    # Total e contagens por status, gênero e seção em uma única consulta
+    total, contagens = inventory_breakdown(db.session, filtros)
     
-    # Preparar dados do relatório
     dados_relatorio = {
-        'total_livros': len(livros),
+        'total_livros': total,
         'data_geracao': datetime.utcnow().isoformat(),
         'filtros_aplicados': {
             'status': status,
             'genero': genero,
             'secao': secao
-        },
-        'livros': [livro.to_dict() for livro in livros]
+        }
     }
+    if total:
+        dados_relatorio['estatisticas'] = {
+            'por_status': contagens['status'],
+            'por_genero': contagens['genre'],
+            'por_secao': contagens['section']
+        }
     
-    # Adicionar estatísticas adicionais
-    if livros:
-        # Contagem por status
-        contagem_status = {}
-        for livro in livros:
-            contagem_status[livro.status] = contagem_status.get(livro.status, 0) + 1
-        
-        # Contagem por gênero
-        contagem_genero = {}
-        for livro in livros:
-            if livro.genre:
-                contagem_genero[livro.genre] = contagem_genero.get(livro.genre, 0) + 1
+    if apenas_resumo:
+        return jsonify(dados_relatorio), 200
+    
+    consulta = select(*book_serializer.columns()).where(*filtros).order_by(Book.id)
+    
+    if paginar:
+        if apos_id is not None:
+            consulta = consulta.where(Book.id > apos_id)
         
-        # Contagem por seção
-        contagem_secao = {}
-        for livro in livros:
-            if livro.storage_section:
-                contagem_secao[livro.storage_section] = contagem_secao.get(livro.storage_section, 0) + 1
+        # Buscar uma linha extra para saber se existe outra página
+        linhas = db.session.execute(consulta.limit(limite + 1)).all()
+        proximo_cursor = None
+        if len(linhas) > limite:
+            linhas = linhas[:limite]
+            proximo_cursor = encode_cursor([linhas[-1].id])
         
-        # Adicionar contagens ao relatório
-        dados_relatorio['estatisticas'] = {
-            'por_status': contagem_status,
-            'por_genero': contagem_genero,
-            'por_secao': contagem_secao
-        }
+        dados_relatorio['livros'] = [book_serializer.fragment(linha) for linha in linhas]
+        dados_relatorio['proximo_cursor'] = proximo_cursor
+        return jsonify(dados_relatorio), 200
+    
+    # Em modo streaming, apenas a lista de livros é gerada à medida que é lida
+    if streaming_requested():
+        ndjson = ndjson_requested()
+        return stream_pieces(
+            _gerar_relatorio_inventario(consulta, dados_relatorio, ndjson),
+            mimetype=NDJSON_MIMETYPE if ndjson else 'application/json'
+        )
+    
+    linhas = db.session.execute(consulta).all()
+    dados_relatorio['livros'] = [book_serializer.fragment(linha) for linha in linhas]
     
     return jsonify(dados_relatorio), 200
 
+def _gerar_relatorio_inventario(consulta, dados_relatorio, ndjson):
+    """
+    Gerar o relatório de inventário em partes, sem manter os livros em memória.
+
+    Em JSON o formato é o mesmo do relatório completo; em NDJSON cada linha é
+    um livro e a última linha traz o cabeçalho, o total e as estatísticas.
+    """
+    if ndjson:
+        for linha in iter_rows(consulta):
+            yield book_serializer.fragment(linha) + '\n'
+        yield json.dumps(dados_relatorio) + '\n'
+        return
+    
+    yield json.dumps(dados_relatorio)[:-1] + ', "livros": ['
+    primeiro = True
+    for linha in iter_rows(consulta):
+        item = book_serializer.fragment(linha)
+        yield item if primeiro else ',' + item
+        primeiro = False
+    yield ']}'
+
 @reporting_bp.route('/vendas', methods=['GET'])
 @jwt_required()
+@cached_report
 def relatorio_vendas():
-    """Gerar relatório de vendas com filtros de data opcionais."""
+    """
+    Gerar relatório de vendas com filtros de data opcionais.
+
+    As vendas, seus livros e vendedores vêm de um único select com joins e
+    as vendas por dia vêm dos agregados diários. `limit` e `cursor` paginam a
+    lista de vendas (mais recentes primeiro, `proximo_cursor`); o total e as
+    estatísticas sempre cobrem o período inteiro.
+    """
     # Verificar se o usuário tem privilégios de administrador
     claims = get_jwt()
     if claims.get('role') != 'admin':
         return jsonify({'erro': 'Privilégios de administrador necessários'}), 403
     
-    # Obter parâmetros de data
-    data_inicio_str = request.args.get('data_inicio')
-    data_fim_str = request.args.get('data_fim')
+    paginar = 'limit' in request.args or 'cursor' in request.args
     
-    # Converter strings para objetos datetime
+    # Obter período e parâmetros de paginação
     try:
-        if data_inicio_str:
-            data_inicio = datetime.fromisoformat(data_inicio_str.replace('Z', '+00:00'))
-        else:
-            # Padrão: último mês
-            data_inicio = datetime.utcnow() - timedelta(days=30)
-        
-        if data_fim_str:
-            data_fim = datetime.fromisoformat(data_fim_str.replace('Z', '+00:00'))
-        else:
-            data_fim = datetime.utcnow()
-    except ValueError:
-        return jsonify({'erro': 'Formato de data inválido. Use ISO 8601 (ex: 2023-01-31T12:00:00Z)'}), 400
-    
-    # Buscar transações de venda no período
-    vendas = Transaction.query.filter(
+        data_inicio, data_fim = _obter_periodo()
+        limite = parse_limit(request.args.get('limit'))
+        cursor = request.args.get('cursor')
+        if cursor:
+            apos_data, apos_id = decode_cursor(cursor, 2, datetime_positions=(0,))
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    
+    filtros = [
         Transaction.transaction_type == 'sale',
         Transaction.created_at >= data_inicio,
         Transaction.created_at <= data_fim
-    ).order_by(Transaction.created_at.desc()).all()
+    ]
+    
+    # Vendas por dia lidas dos agregados diários; o total é a soma dos dias
+    contagens = transaction_counts(data_inicio, data_fim, ['day'], ['sale'])
+    vendas_por_dia = {
+        bucket_key(dia_venda): quantidade
+        for dia_venda, quantidade in db.session.execute(
+            select(contagens.c.day, func.sum(contagens.c.count))
+            .group_by(contagens.c.day)
+            .order_by(contagens.c.day)
+        )
+    }
+    
+    # Vendas com livro e vendedor em um único select
+    colunas_venda = [
+        Transaction.id, Transaction.created_at, Transaction.from_section, Transaction.notes,
+        Transaction.book_id, Transaction.user_id, User.username
+    ]
+    # As colunas do livro vêm depois; `id` é a primeira e é NULL se o livro não existir
+    inicio_livro = len(colunas_venda)
+    consulta = (
+        select(
+            *colunas_venda,
+            *[coluna.label(f'livro__{coluna.key}') for coluna in book_serializer.columns()]
+        )
+        .select_from(Transaction)
+        .outerjoin(Book, Book.id == Transaction.book_id)
+        .outerjoin(User, User.id == Transaction.user_id)
+        .where(*filtros)
+        .order_by(Transaction.created_at.desc(), Transaction.id.desc())
+    )
+    
+    proximo_cursor = None
+    if paginar:
+        if cursor:
+            consulta = consulta.where(
+                tuple_(Transaction.created_at, Transaction.id) < tuple_(apos_data, apos_id)
+            )
+        # Buscar uma linha extra para saber se existe outra página
+        linhas = db.session.execute(consulta.limit(limite + 1)).all()
+        if len(linhas) > limite:
+            linhas = linhas[:limite]
+            proximo_cursor = encode_cursor([linhas[-1].created_at, linhas[-1].id])
+    else:
+        linhas = db.session.execute(consulta).all()
     
-    # Preparar dados do relatório
     dados_relatorio = {
         'periodo': {
             'inicio': data_inicio.isoformat(),
             'fim': data_fim.isoformat()
         },
-        'total_vendas': len(vendas),
+        'total_vendas': sum(vendas_por_dia.values()),
         'data_geracao': datetime.utcnow().isoformat(),
-        'vendas': []
-    }
-    
-    # Adicionar detalhes de cada venda
-    for venda in vendas:
-        livro = Book.query.get(venda.book_id)
-        usuario = User.query.get(venda.user_id)
-        
-        item_venda = {
-            'id_transacao': venda.id,
-            'data_venda': venda.created_at.isoformat(),
-            'livro': livro.to_dict() if livro else {'id': venda.book_id, 'info': 'Livro não encontrado'},
-            'vendedor': {
-                'id': usuario.id,
-                'nome': usuario.username
-            } if usuario else {'id': venda.user_id, 'info': 'Usuário não encontrado'},
-            'secao_origem': venda.from_section,
-            'observacoes': venda.notes
+        'vendas': [
+            {
+                'id_transacao': venda.id,
+                'data_venda': venda.created_at.isoformat(),
+                'livro': book_serializer.fragment(venda[inicio_livro:])
+                if venda[inicio_livro] is not None else {'id': venda.book_id, 'info': 'Livro não encontrado'},
+                'vendedor': {
+                    'id': venda.user_id,
+                    'nome': venda.username
+                } if venda.username is not None else {'id': venda.user_id, 'info': 'Usuário não encontrado'},
+                'secao_origem': venda.from_section,
+                'observacoes': venda.notes
+            }
+            for venda in linhas
+        ],
+        'estatisticas': {
+            'vendas_por_dia': vendas_por_dia
         }
-        
-        dados_relatorio['vendas'].append(item_venda)
-    
-    # Adicionar estatísticas de vendas por dia
-    vendas_por_dia = {}
-    for venda in vendas:
-        data_str = venda.created_at.date().isoformat()
-        vendas_por_dia[data_str] = vendas_por_dia.get(data_str, 0) + 1
-    
-    dados_relatorio['estatisticas'] = {
-        'vendas_por_dia': vendas_por_dia
     }
+    if paginar:
+        dados_relatorio['proximo_cursor'] = proximo_cursor
     
     return jsonify(dados_relatorio), 200
 
 @reporting_bp.route('/desempenho', methods=['GET'])
 @jwt_required()
+@cached_report
 def relatorio_desempenho():
-    """Gerar relatório de desempenho de vendas por funcionário."""
+    """
+    Gerar relatório de desempenho de vendas por usuário.
+
+    Funcionários e administradores são cobertos por uma única consulta
+    `GROUP BY` com agregação condicional por tipo de transação, lendo os
+    dias inteiros do período dos agregados diários. Com
+    `por_dia=true` cada usuário traz também as contagens de cada dia.
+    """
     # Verificar se o usuário tem privilégios de administrador
     claims = get_jwt()
     if claims.get('role') != 'admin':
         return jsonify({'erro': 'Privilégios de administrador necessários'}), 403
     
-    # Obter parâmetros de data
-    data_inicio_str = request.args.get('data_inicio')
-    data_fim_str = request.args.get('data_fim')
-    
-    # Converter strings para objetos datetime
+    # Obter período
     try:
-        if data_inicio_str:
-            data_inicio = datetime.fromisoformat(data_inicio_str.replace('Z', '+00:00'))
-        else:
-            # Padrão: último mês
-            data_inicio = datetime.utcnow() - timedelta(days=30)
+        data_inicio, data_fim = _obter_periodo()
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    por_dia = request.args.get('por_dia', '').lower() in ('1', 'true')
+    
+    # Contagens do período (agregados diários + dias parciais) por usuário e tipo,
+    # pivotadas com agregação condicional em uma única consulta
+    dimensoes = ['user_id', 'transaction_type'] + (['day'] if por_dia else [])
+    periodo = transaction_counts(data_inicio, data_fim, dimensoes, [tipo for tipo, _ in TIPOS_DESEMPENHO])
+    contagens = [
+        func.coalesce(func.sum(case((periodo.c.transaction_type == tipo, periodo.c.count), else_=0)), 0).label(rotulo)
+        for tipo, rotulo in TIPOS_DESEMPENHO
+    ]
+    agrupamento = [User.id, User.username, User.email, User.role]
+    if por_dia:
+        agrupamento.append(periodo.c.day.label('dia'))
+    
+    consulta = (
+        select(*agrupamento, *contagens)
+        .select_from(User)
+        .outerjoin(periodo, periodo.c.user_id == User.id)
+        .group_by(*agrupamento)
+        .order_by(User.id)
+    )
+    
+    desempenho = {}
+    for linha in db.session.execute(consulta):
+        item = desempenho.get(linha.id)
+        if item is None:
+            item = desempenho[linha.id] = {
+                'funcionario': {
+                    'id': linha.id,
+                    'nome': linha.username,
+                    'email': linha.email,
+                    'funcao': linha.role
+                },
+                **{rotulo: 0 for _, rotulo in TIPOS_DESEMPENHO}
+            }
+            if por_dia:
+                item['por_dia'] = {}
         
-        if data_fim_str:
-            data_fim = datetime.fromisoformat(data_fim_str.replace('Z', '+00:00'))
-        else:
-            data_fim = datetime.utcnow()
-    except ValueError:
-        return jsonify({'erro': 'Formato de data inválido. Use ISO 8601 (ex: 2023-01-31T12:00:00Z)'}), 400
+        for _, rotulo in TIPOS_DESEMPENHO:
+            item[rotulo] += linha._mapping[rotulo]
+        if por_dia and linha.dia is not None:
+            item['por_dia'][bucket_key(linha.dia)] = {rotulo: linha._mapping[rotulo] for _, rotulo in TIPOS_DESEMPENHO}
     
-    # Buscar usuários funcionários
-    funcionarios = User.query.filter_by(role='employee').all()
+    for item in desempenho.values():
+        item['total_operacoes'] = sum(item[rotulo] for _, rotulo in TIPOS_DESEMPENHO)
+    
+    # Ordenar por número de vendas (decrescente)
+    lista_desempenho = sorted(desempenho.values(), key=lambda x: x['vendas'], reverse=True)
     
     dados_relatorio = {
         'periodo': {
@@ -193,111 +340,412 @@ def relatorio_desempenho():
             'fim': data_fim.isoformat()
         },
         'data_geracao': datetime.utcnow().isoformat(),
-        'desempenho_funcionarios': []
+        'desempenho_funcionarios': lista_desempenho,
+        'total_vendas': sum(item['vendas'] for item in lista_desempenho)
     }
     
-    total_geral = 0
-    
-    for funcionario in funcionarios:
-        # Contar vendas do funcionário no período
-        qtd_vendas = Transaction.query.filter(
-            Transaction.transaction_type == 'sale',
-            Transaction.user_id == funcionario.id,
-            Transaction.created_at >= data_inicio,
-            Transaction.created_at <= data_fim
-        ).count()
-        
-        # Contar livros catalogados (adicionados) pelo funcionário
-        qtd_catalogados = Transaction.query.filter(
-            Transaction.transaction_type == 'addition',
-            Transaction.user_id == funcionario.id,
-            Transaction.created_at >= data_inicio,
-            Transaction.created_at <= data_fim
-        ).count()
-        
-        # Contar movimentações feitas pelo funcionário
-        qtd_movimentacoes = Transaction.query.filter(
-            Transaction.transaction_type == 'movement',
-            Transaction.user_id == funcionario.id,
-            Transaction.created_at >= data_inicio,
-            Transaction.created_at <= data_fim
-        ).count()
-        
-        total_geral += qtd_vendas
-        
-        dados_relatorio['desempenho_funcionarios'].append({
-            'funcionario': {
-                'id': funcionario.id,
-                'nome': funcionario.username,
-                'email': funcionario.email
-            },
-            'vendas': qtd_vendas,
-            'livros_catalogados': qtd_catalogados,
-            'movimentacoes': qtd_movimentacoes,
-            'total_operacoes': qtd_vendas + qtd_catalogados + qtd_movimentacoes
-        })
-    
-    # Ordenar por número de vendas (decrescente)
-    dados_relatorio['desempenho_funcionarios'].sort(key=lambda x: x['vendas'], reverse=True)
-    
-    # Adicionar total geral
-    dados_relatorio['total_vendas'] = total_geral
-    
     return jsonify(dados_relatorio), 200
 
 @reporting_bp.route('/generos-populares', methods=['GET'])
 @jwt_required()
+@cached_report
 def relatorio_generos_populares():
-    """Gerar relatório de gêneros populares baseado em vendas."""
+    """
+    Gerar relatório de gêneros populares baseado em vendas.
+
+    Com `source=snapshot` as vendas são contadas no snapshot colunar das
+    transações em vez do banco (ver app.modules.reporting.analytics).
+    """
     # Obter parâmetros de data
-    data_inicio_str = request.args.get('data_inicio')
-    data_fim_str = request.args.get('data_fim')
     limite = request.args.get('limite', default=10, type=int)
-    
-    # Converter strings para objetos datetime
     try:
-        if data_inicio_str:
-            data_inicio = datetime.fromisoformat(data_inicio_str.replace('Z', '+00:00'))
-        else:
-            # Padrão: último mês
-            data_inicio = datetime.utcnow() - timedelta(days=30)
-        
-        if data_fim_str:
-            data_fim = datetime.fromisoformat(data_fim_str.replace('Z', '+00:00'))
-        else:
-            data_fim = datetime.utcnow()
-    except ValueError:
-        return jsonify({'erro': 'Formato de data inválido. Use ISO 8601 (ex: 2023-01-31T12:00:00Z)'}), 400
-    
-    # Buscar vendas no período
-    vendas = Transaction.query.filter(
-        Transaction.transaction_type == 'sale',
-        Transaction.created_at >= data_inicio,
-        Transaction.created_at <= data_fim
-    ).all()
+        data_inicio, data_fim = _obter_periodo()
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
     
-    # Contagem por gênero
-    generos_populares = {}
+    try:
+        snapshot = _obter_snapshot()
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    except LookupError as e:
+        return jsonify({'erro': str(e)}), 503
+    
+    if snapshot is not None:
+        # Contagem vetorizada sobre o snapshot colunar
+        contagens = snapshot.counts(data_inicio, data_fim, ['genre'], ['sale'])
+        lista_generos = [
+            {'genero': genero, 'vendas': qtd}
+            for (genero,), qtd in sorted(contagens.items(), key=lambda item: (-item[1], item[0][0]))
+            if genero != ''
+        ][:limite]
+    else:
+        # Vendas por gênero lidas dos agregados diários, já ordenadas e limitadas
+        contagens = transaction_counts(data_inicio, data_fim, ['genre'], ['sale'])
+        vendas = func.sum(contagens.c.count)
+        lista_generos = [
+            {'genero': genero, 'vendas': qtd}
+            for genero, qtd in db.session.execute(
+                select(contagens.c.genre, vendas)
+                .where(contagens.c.genre != '')
+                .group_by(contagens.c.genre)
+                .order_by(vendas.desc(), contagens.c.genre)
+                .limit(limite)
+            )
+        ]
     
-    for venda in vendas:
-        livro = Book.query.get(venda.book_id)
-        if livro and livro.genre:
-            generos_populares[livro.genre] = generos_populares.get(livro.genre, 0) + 1
+    dados_relatorio = {
+        'periodo': {
+            'inicio': data_inicio.isoformat(),
+            'fim': data_fim.isoformat()
+        },
+        'data_geracao': datetime.utcnow().isoformat(),
+        'generos_populares': lista_generos
+    }
+    if snapshot is not None:
+        dados_relatorio['snapshot'] = _descrever_snapshot(snapshot)
     
-    # Converter para lista e ordenar
-    lista_generos = [{'genero': genero, 'vendas': qtd} for genero, qtd in generos_populares.items()]
-    lista_generos.sort(key=lambda x: x['vendas'], reverse=True)
+    return jsonify(dados_relatorio), 200
+
+@reporting_bp.route('/series', methods=['GET'])
+@jwt_required()
+@cached_report
+def serie_temporal():
+    """
+    Gerar séries temporais de transações para gráficos.
+
+    Parâmetros: `granularidade` (hour, day, week ou month; padrão day),
+    `agrupar_por` (genre, section ou user; opcional), `metricas` (lista
+    separada por vírgulas de vendas, livros_catalogados e movimentacoes;
+    padrão vendas) e o período (`data_inicio`, `data_fim`). Os intervalos
+    são calculados no banco a partir dos agregados diários (por hora, a
+    partir das transações) e os intervalos sem transações vêm com zero, de
+    modo que cada série tem um valor por item de `intervalos`. Com
+    `source=snapshot` as contagens vêm do snapshot colunar das transações.
+    """
+    # Verificar se o usuário tem privilégios de administrador
+    claims = get_jwt()
+    if claims.get('role') != 'admin':
+        return jsonify({'erro': 'Privilégios de administrador necessários'}), 403
     
-    # Limitar a quantidade de resultados
-    lista_generos = lista_generos[:limite]
+    try:
+        data_inicio, data_fim = _obter_periodo()
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    
+    granularidade = request.args.get('granularidade', 'day')
+    agrupar_por = request.args.get('agrupar_por') or None
+    metricas = [metrica.strip() for metrica in request.args.get('metricas', 'vendas').split(',') if metrica.strip()]
+    tipos_por_metrica = {rotulo: tipo for tipo, rotulo in TIPOS_DESEMPENHO}
+    
+    if granularidade not in GRANULARITIES:
+        return jsonify({'erro': f'Granularidade inválida. Use uma de: {", ".join(GRANULARITIES)}'}), 400
+    if agrupar_por is not None and agrupar_por not in GROUPINGS:
+        return jsonify({'erro': f'Agrupamento inválido. Use um de: {", ".join(GROUPINGS)}'}), 400
+    if not metricas or any(metrica not in tipos_por_metrica for metrica in metricas):
+        return jsonify({'erro': f'Métrica inválida. Use: {", ".join(tipos_por_metrica)}'}), 400
+    if data_inicio > data_fim:
+        return jsonify({'erro': 'data_inicio deve ser anterior a data_fim'}), 400
+    if bucket_count(data_inicio, data_fim, granularidade) > MAX_BUCKETS:
+        return jsonify({'erro': f'Período longo demais para a granularidade (máximo de {MAX_BUCKETS} intervalos)'}), 400
     
-    dados_relatorio = {
+    try:
+        snapshot = _obter_snapshot()
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    except LookupError as e:
+        return jsonify({'erro': str(e)}), 503
+    
+    metricas = list(dict.fromkeys(metricas))
+    intervalos, contagens = transaction_series(
+        data_inicio, data_fim, granularidade, [tipos_por_metrica[metrica] for metrica in metricas],
+        agrupar_por, snapshot=snapshot
+    )
+    
+    # Uma série por grupo, com uma lista de valores por métrica
+    grupos = {grupo for grupo, _ in contagens} or {None}
+    series = []
+    for grupo in grupos:
+        item = {'grupo': grupo if grupo != '' else None}
+        for metrica in metricas:
+            item[metrica] = contagens.get((grupo, tipos_por_metrica[metrica]), [0] * len(intervalos))
+        series.append(item)
+    # Grupos com mais transações primeiro
+    series.sort(key=lambda item: (-sum(sum(item[metrica]) for metrica in metricas), str(item['grupo'])))
+    
+    dados_serie = {
         'periodo': {
             'inicio': data_inicio.isoformat(),
             'fim': data_fim.isoformat()
         },
+        'granularidade': granularidade,
+        'agrupar_por': agrupar_por,
         'data_geracao': datetime.utcnow().isoformat(),
-        'generos_populares': lista_generos
+        'intervalos': intervalos,
+        'series': series,
+        'totais': {metrica: sum(sum(item[metrica]) for item in series) for metrica in metricas}
     }
+    if snapshot is not None:
+        dados_serie['snapshot'] = _descrever_snapshot(snapshot)
+    
+    return jsonify(dados_serie), 200
+
+@reporting_bp.route('/dashboard', methods=['GET'])
+@jwt_required()
+@snapshot_report('DASHBOARD_TTL', 10)
+def painel_indicadores():
+    """
+    Indicadores principais da tela inicial em uma única chamada.
+
+    Estoque por status, vendas de hoje, dos últimos 7 e 30 dias, seções com
+    estoque baixo e gêneros mais vendidos vêm de três consultas agregadas
+    sobre os contadores de ocupação e os agregados diários. A resposta é
+    um instantâneo compartilhado por todos os clientes e recalculado a
+    cada DASHBOARD_TTL segundos (padrão 10).
+    """
+    # Verificar se o usuário tem privilégios de administrador
+    claims = get_jwt()
+    if claims.get('role') != 'admin':
+        return jsonify({'erro': 'Privilégios de administrador necessários'}), 403
+    
+    # Estoque por status: contadores das seções mais os livros sem seção
+    ocupacao = db.session.execute(
+        select(SectionOccupancy.section, *[getattr(SectionOccupancy, status) for status in OCCUPANCY_STATUSES])
+    ).all()
+    por_status = {status: 0 for status in OCCUPANCY_STATUSES}
+    for linha in ocupacao:
+        for status in OCCUPANCY_STATUSES:
+            por_status[status] += linha._mapping[status]
+    for status, quantidade in db.session.execute(
+        select(Book.status, func.count(Book.id))
+        .where(Book.storage_section.is_(None))
+        .group_by(Book.status)
+    ):
+        por_status[status] = por_status.get(status, 0) + quantidade
+    
+    # Seções cadastradas com estoque disponível abaixo dos limiares
+    disponiveis = {linha.section: linha.available for linha in ocupacao}
+    secoes_estoque_baixo = []
+    for secao in section_registry.all():
+        qtd_disponiveis = disponiveis.get(secao['id'], 0)
+        if qtd_disponiveis >= secao['low_stock_threshold']:
+            continue
+        secoes_estoque_baixo.append({
+            'secao': secao['id'],
+            'livros_disponiveis': qtd_disponiveis,
+            'status': 'CRÍTICO' if qtd_disponiveis < secao['critical_stock_threshold'] else 'BAIXO'
+        })
+    
+    # Vendas de hoje, 7 e 30 dias por gênero em uma única leitura dos agregados diários
+    hoje = datetime.utcnow().date()
+    inicio_semana = hoje - timedelta(days=6)
+    inicio_mes = hoje - timedelta(days=29)
+    dia = DailyTransactionRollup.day
+    quantidade = DailyTransactionRollup.count
+    vendas_por_genero = db.session.execute(
+        select(
+            DailyTransactionRollup.genre,
+            func.sum(case((dia == hoje, quantidade), else_=0)).label('hoje'),
+            func.sum(case((dia >= inicio_semana, quantidade), else_=0)).label('semana'),
+            func.sum(quantidade).label('mes')
+        )
+        .where(
+            DailyTransactionRollup.transaction_type == 'sale',
+            dia >= inicio_mes,
+            dia <= hoje
+        )
+        .group_by(DailyTransactionRollup.genre)
+    ).all()
+    
+    generos_populares = sorted(
+        (linha for linha in vendas_por_genero if linha.genre != '' and linha.mes),
+        key=lambda linha: (-linha.mes, linha.genre)
+    )[:GENEROS_PAINEL]
+    
+    dados_painel = {
+        'data_geracao': datetime.utcnow().isoformat(),
+        'estoque': {
+            'total_livros': sum(por_status.values()),
+            'por_status': por_status
+        },
+        'vendas': {
+            'hoje': sum(linha.hoje for linha in vendas_por_genero),
+            'ultimos_7_dias': sum(linha.semana for linha in vendas_por_genero),
+            'ultimos_30_dias': sum(linha.mes for linha in vendas_por_genero)
+        },
+        'secoes_estoque_baixo': secoes_estoque_baixo,
+        'generos_populares': [
+            {'genero': linha.genre, 'vendas': linha.mes} for linha in generos_populares
+        ]
+    }
+    
+    return jsonify(dados_painel), 200
+
+@reporting_bp.route('/jobs', methods=['POST'])
+@jwt_required()
+def criar_tarefa_relatorio():
+    """
+    Exportar um relatório para CSV ou XLSX em segundo plano.
+
+    Corpo: `{'report': 'vendas' | 'inventario', 'format': 'csv' | 'xlsx',
+    'params': {...}}`. Os parâmetros são os filtros do relatório
+    (`data_inicio`/`data_fim` para vendas; `status`, `genre` e `section`
+    para inventário). Responde 202 com a tarefa; o progresso é consultado
+    em `GET /jobs/<id>` e o arquivo baixado em `GET /jobs/<id>/download`.
+    """
+    # Verificar se o usuário tem privilégios de administrador
+    claims = get_jwt()
+    if claims.get('role') != 'admin':
+        return jsonify({'erro': 'Privilégios de administrador necessários'}), 403
+    
+    usuario = User.query.get(get_jwt_identity())
+    if not usuario:
+        return jsonify({'erro': 'Usuário não encontrado'}), 404
+    
+    dados = request.get_json() or {}
+    relatorio = dados.get('report')
+    formato = dados.get('format', 'csv')
+    parametros = dados.get('params') or {}
+    
+    if relatorio not in EXPORT_REPORTS:
+        return jsonify({'erro': f'Relatório inválido. Use um de: {", ".join(EXPORT_REPORTS)}'}), 400
+    if formato not in EXPORT_FORMATS:
+        return jsonify({'erro': f'Formato inválido. Use um de: {", ".join(EXPORT_FORMATS)}'}), 400
+    if not isinstance(parametros, dict):
+        return jsonify({'erro': 'params deve ser um objeto'}), 400
+    
+    # Normalizar os parâmetros; o período padrão é fixado no momento do pedido
+    if relatorio == 'vendas':
+        try:
+            data_inicio, data_fim = _obter_periodo(parametros)
+        except ValueError as e:
+            return jsonify({'erro': str(e)}), 400
+        parametros = {'data_inicio': data_inicio.isoformat(), 'data_fim': data_fim.isoformat()}
+    else:
+        filtros = {}
+        for campo in ('status', 'genre', 'section'):
+            valor = parametros.get(campo)
+            if valor is not None and not isinstance(valor, str):
+                return jsonify({'erro': f'{campo} deve ser um texto'}), 400
+            if valor:
+                filtros[campo] = valor
+        parametros = filtros
+    
+    tarefa = submit_report_job(relatorio, formato, parametros, usuario.id)
+    
+    resposta = jsonify(_descrever_tarefa(tarefa))
+    resposta.headers['Location'] = url_for('reporting.consultar_tarefa_relatorio', job_id=tarefa.id)
+    return resposta, 202
+
+@reporting_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def consultar_tarefa_relatorio(job_id):
+    """Consultar o estado e o progresso de uma exportação."""
+    # Verificar se o usuário tem privilégios de administrador
+    claims = get_jwt()
+    if claims.get('role') != 'admin':
+        return jsonify({'erro': 'Privilégios de administrador necessários'}), 403
     
-    return jsonify(dados_relatorio), 200 
\ No newline at end of file
+    tarefa = db.session.get(ReportJob, job_id)
+    if tarefa is None:
+        return jsonify({'erro': 'Tarefa não encontrada'}), 404
+    
+    return jsonify(_descrever_tarefa(tarefa)), 200
+
+@reporting_bp.route('/jobs/<job_id>/download', methods=['GET'])
+@jwt_required()
+def baixar_tarefa_relatorio(job_id):
+    """
+    Baixar o arquivo de uma exportação concluída.
+
+    Suporta requisições parciais (`Range`) e condicionais (`If-None-Match`,
+    `If-Range`), para retomar downloads interrompidos.
+    """
+    # Verificar se o usuário tem privilégios de administrador
+    claims = get_jwt()
+    if claims.get('role') != 'admin':
+        return jsonify({'erro': 'Privilégios de administrador necessários'}), 403
+    
+    tarefa = db.session.get(ReportJob, job_id)
+    if tarefa is None:
+        return jsonify({'erro': 'Tarefa não encontrada'}), 404
+    if not job_file_ready(tarefa):
+        if tarefa.status == 'done':
+            return jsonify({'erro': 'Arquivo da exportação não está mais disponível'}), 410
+        return jsonify({'erro': f'Exportação não concluída (status atual: {tarefa.status})'}), 409
+    
+    return send_file(
+        tarefa.file_path,
+        mimetype=EXPORT_MIMETYPES[tarefa.export_format],
+        as_attachment=True,
+        download_name=f'relatorio_{tarefa.report}_{tarefa.id}.{tarefa.export_format}',
+        conditional=True
+    )
+
+def _descrever_tarefa(tarefa):
+    """Representação da tarefa com o link de download quando concluída."""
+    dados = tarefa.to_dict()
+    dados['download_url'] = (
+        url_for('reporting.baixar_tarefa_relatorio', job_id=tarefa.id) if tarefa.status == 'done' else None
+    )
+    return dados
+
+def _obter_snapshot():
+    """
+    Ler o parâmetro `source` (`database`, padrão, ou `snapshot`).
+
+    Returns:
+        O snapshot colunar das transações, ou None para consultar o banco
+
+    Raises:
+        ValueError: Se `source` for inválido
+        LookupError: Se o snapshot ainda não foi gerado (a geração é
+            iniciada em segundo plano)
+    """
+    fonte = request.args.get('source', 'database')
+    if fonte not in ('database', 'snapshot'):
+        raise ValueError('source inválido. Use database ou snapshot')
+    if fonte == 'database':
+        return None
+    snapshot = load_snapshot()
+    if snapshot is None:
+        raise LookupError('Snapshot analítico ainda não disponível; a geração foi iniciada, tente novamente em instantes')
+    return snapshot
+
+def _descrever_snapshot(snapshot):
+    """Até qual transação e quando o snapshot foi atualizado."""
+    return {
+        'ultima_transacao': snapshot.watermark,
+        'atualizado_em': snapshot.refreshed_at.isoformat()
+    }
+
+def _obter_periodo(parametros=None):
+    """
+    Ler o período dos parâmetros `data_inicio` e `data_fim` (ISO 8601).
+
+    O padrão é o último mês. Datas com fuso são convertidas para UTC sem
+    fuso, como as gravadas no banco.
+
+    Args:
+        parametros: Dicionário com as datas; por padrão a query string
+
+    Raises:
+        ValueError: Se uma das datas for inválida
+    """
+    parametros = request.args if parametros is None else parametros
+    agora = datetime.utcnow()
+    periodo = []
+    for parametro, padrao in (('data_inicio', agora - timedelta(days=30)), ('data_fim', agora)):
+        valor = parametros.get(parametro)
+        if not valor:
+            periodo.append(padrao)
+            continue
+        if not isinstance(valor, str):
+            raise ValueError('Formato de data inválido. Use ISO 8601 (ex: 2023-01-31T12:00:00Z)')
+        try:
+            data = datetime.fromisoformat(valor.replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError('Formato de data inválido. Use ISO 8601 (ex: 2023-01-31T12:00:00Z)')
+        if data.tzinfo is not None:
+            data = data.astimezone(timezone.utc).replace(tzinfo=None)
+        periodo.append(data)
+    return tuple(periodo)
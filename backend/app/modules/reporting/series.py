@@ -0,0 +1,163 @@
+"""
+Transaction time series for the report charts.
+
+Transactions are counted per bucket (hour, day, week starting on Monday, or
+month, in UTC) by the database, with the dialect's date truncation, and
+optionally split by genre, section or user. Day, week and month buckets are
+built from the daily rollups (transaction_counts), so a year of data is a
+few hundred rollup rows; hourly buckets are read from the transactions
+index. Buckets without transactions are filled with zeros here, so every
+series has one value per bucket. The same series can be computed from the
+columnar snapshot instead (`snapshot` argument).
+"""
+from datetime import datetime, time, timedelta
+from sqlalchemy import func, select
+from app import db
+from app.modules.inventory.models import Book, Transaction
+from app.modules.reporting.aggregates import bucket_key, time_bucket
+from app.modules.reporting.rollups import raw_dimensions, transaction_counts
+
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+
+# Grouping names and the matching rollup dimension
+GROUPINGS = {
+    'genre': 'genre',
+    'section': 'section',
+    'user': 'user_id',
+}
+
+# Largest number of buckets in one series
+MAX_BUCKETS = 2000
+
+
+def truncate(moment, granularity):
+    """Start of the bucket containing a datetime."""
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = datetime.combine(moment.date(), time.min)
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def _next_bucket(start, granularity):
+    if granularity == 'hour':
+        return start + timedelta(hours=1)
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start + timedelta(days=1)
+
+
+def bucket_count(start, end, granularity):
+    """Number of buckets overlapping [start, end], computed without listing them."""
+    first, last = truncate(start, granularity), truncate(end, granularity)
+    if granularity == 'month':
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    size = {'hour': timedelta(hours=1), 'day': timedelta(days=1), 'week': timedelta(days=7)}[granularity]
+    return (last - first) // size + 1
+
+
+def bucket_keys(start, end, granularity):
+    """Keys of the buckets overlapping [start, end], as returned by bucket_key."""
+    keys = []
+    current, last = truncate(start, granularity), truncate(end, granularity)
+    while current <= last:
+        keys.append(current.isoformat() if granularity == 'hour' else current.date().isoformat())
+        current = _next_bucket(current, granularity)
+    return keys
+
+
+def series_query(start, end, granularity, transaction_types, group_by=None):
+    """
+    Count transactions in [start, end] per bucket, type and optional group.
+
+    Args:
+        start: Start of the window (inclusive)
+        end: End of the window (inclusive)
+        granularity: One of GRANULARITIES
+        transaction_types: Transaction types to count
+        group_by: Optional key of GROUPINGS
+
+    Returns:
+        Select with the columns `bucket`, `transaction_type`, `count` and,
+        when grouped, `group`
+    """
+    dialect_name = db.session.get_bind().dialect.name
+    dimension = GROUPINGS[group_by] if group_by else None
+
+    if granularity == 'hour':
+        raw = raw_dimensions(dialect_name)
+        columns = [
+            time_bucket(Transaction.created_at, 'hour', dialect_name).label('bucket'),
+            Transaction.transaction_type.label('transaction_type'),
+        ]
+        if dimension:
+            columns.append(raw[dimension].label('group'))
+        query = (
+            select(*columns, func.count(Transaction.id).label('count'))
+            .where(
+                Transaction.transaction_type.in_(transaction_types),
+                Transaction.created_at >= start,
+                Transaction.created_at <= end
+            )
+            .group_by(*columns)
+        )
+        if dimension == 'genre':
+            query = query.select_from(Transaction).outerjoin(Book, Book.id == Transaction.book_id)
+        return query
+
+    counts = transaction_counts(
+        start, end, ['day', 'transaction_type'] + ([dimension] if dimension else []), transaction_types
+    )
+    columns = [
+        time_bucket(counts.c.day, granularity, dialect_name).label('bucket'),
+        counts.c.transaction_type.label('transaction_type'),
+    ]
+    if dimension:
+        columns.append(counts.c[dimension].label('group'))
+    return select(*columns, func.sum(counts.c.count).label('count')).group_by(*columns)
+
+
+def transaction_series(start, end, granularity, transaction_types, group_by=None, snapshot=None):
+    """
+    Count transactions per bucket and fill the buckets without transactions with zeros.
+
+    Args:
+        snapshot: TransactionSnapshot to read instead of the database (see
+            app.modules.reporting.analytics); the other arguments are those
+            of series_query
+
+    Returns:
+        Tuple `(keys, series)`: `keys` lists the buckets in order and
+        `series` maps `(group, transaction_type)` to a list with one count
+        per bucket; `group` is None when not grouping, and the empty string
+        stands for transactions without genre or section
+    """
+    if snapshot is None:
+        rows = (
+            (row.bucket, row.transaction_type, row.group if group_by else None, row.count)
+            for row in db.session.execute(series_query(start, end, granularity, transaction_types, group_by))
+        )
+    else:
+        counts = snapshot.counts(
+            start, end, ['transaction_type'] + ([GROUPINGS[group_by]] if group_by else []),
+            transaction_types, granularity
+        )
+        rows = (
+            (key[0], key[1], key[2] if group_by else None, count)
+            for key, count in counts.items()
+        )
+
+    keys = bucket_keys(start, end, granularity)
+    positions = {key: position for position, key in enumerate(keys)}
+    series = {}
+    for bucket, transaction_type, group, count in rows:
+        values = series.get((group, transaction_type))
+        if values is None:
+            values = series[(group, transaction_type)] = [0] * len(keys)
+        values[positions[bucket_key(bucket)]] += count
+    return keys, series
@@ -0,0 +1,348 @@
+"""
+Cache of report responses shared by all worker processes.
+
+Responses of the report and statistics endpoints are stored in a
+cross-process backend: a SQLite file (default, in the instance folder) or
+Redis (`REPORT_CACHE_URL=redis://...`, needs the `redis` package). Entries
+expire after REPORT_CACHE_TTL seconds and the least recently used ones are
+evicted beyond REPORT_CACHE_MAX_ENTRIES (on Redis, eviction is left to the
+server's `maxmemory-policy allkeys-lru`).
+
+Keys embed a generation number kept in the backend. Every database commit
+that wrote to one of the INVALIDATING_TABLES (a sale, a new book, a book
+update, ...) increments it, so no worker serves a report computed before
+the write. Snapshots (snapshot_report) are the exception: they are only
+refreshed by age, for views polled by many clients.
+"""
+import contextlib
+import functools
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from flask import current_app, has_app_context, request
+from flask_jwt_extended import get_jwt
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.streaming import streaming_requested
+
+DEFAULT_TTL = 60
+DEFAULT_MAX_ENTRIES = 1000
+
+# A hit refreshes an entry's LRU position at most this often, so most reads write nothing
+ACCESS_RESOLUTION = 30
+
+# Tables whose writes make cached reports stale
+INVALIDATING_TABLES = ('books', 'transactions', 'storage_sections', 'section_occupancy')
+
+_pending = threading.local()
+
+# Snapshot recompute locks by cache key, with the number of requests holding or awaiting each
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+
+_WRITE_STATEMENT = re.compile(
+    r'^\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+FROM)\s+"?(\w+)"?',
+    re.IGNORECASE
+)
+
+
+class SQLiteCacheBackend:
+    """Cache entries in a SQLite file shared by the processes of one host."""
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+
+    def _connection(self):
+        # One connection per thread and process (connections must not cross a fork)
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS report_cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_report_cache_accessed_at ON report_cache (accessed_at)')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS report_cache_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)'
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        connection = self._connection()
+        now = time.time()
+        row = connection.execute(
+            'SELECT value, accessed_at FROM report_cache WHERE key = ? AND expires_at > ?', (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        if now - row[1] >= ACCESS_RESOLUTION:
+            connection.execute('UPDATE report_cache SET accessed_at = ? WHERE key = ?', (now, key))
+        return row[0]
+
+    def set(self, key, value, ttl):
+        connection = self._connection()
+        now = time.time()
+        connection.execute(
+            'INSERT OR REPLACE INTO report_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+            (key, value, now + ttl, now)
+        )
+        # Drop expired entries and keep the max_entries most recently used
+        connection.execute(
+            'DELETE FROM report_cache WHERE expires_at <= ? OR key IN ('
+            'SELECT key FROM report_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (now, self.max_entries)
+        )
+
+    def generation(self):
+        row = self._connection().execute(
+            "SELECT value FROM report_cache_meta WHERE name = 'generation'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def bump_generation(self):
+        self._connection().execute(
+            "INSERT INTO report_cache_meta (name, value) VALUES ('generation', 1) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + 1"
+        )
+
+    def clear(self):
+        connection = self._connection()
+        connection.execute('DELETE FROM report_cache')
+        self.bump_generation()
+
+
+class RedisCacheBackend:
+    """Cache entries in Redis, shared by every host using the same server."""
+
+    def __init__(self, url, prefix='report_cache:'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, value, ex=ttl)
+
+    def generation(self):
+        return int(self.client.get(self.prefix + 'generation') or 0)
+
+    def bump_generation(self):
+        self.client.incr(self.prefix + 'generation')
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class ReportCache:
+    """Report response cache bound to one backend."""
+
+    def __init__(self, backend, ttl=DEFAULT_TTL):
+        self.backend = backend
+        self.ttl = ttl
+
+    def key(self, *parts):
+        """Build the storage key for a response in the current generation."""
+        digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+        return f'{self.backend.generation()}:{digest}'
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, value, self.ttl if ttl is None else ttl)
+
+    def invalidate(self):
+        """Make every cached response stale, in all processes."""
+        self.backend.bump_generation()
+
+    def clear(self):
+        self.backend.clear()
+
+
+def init_report_cache(app):
+    """
+    Create the report cache configured for the app.
+
+    REPORT_CACHE_URL selects the backend: `redis://...`, a path to a SQLite
+    file (default `report_cache.db` in the instance folder) or `none`.
+    The cache is disabled by default when TESTING is set.
+    """
+    url = app.config.get('REPORT_CACHE_URL')
+    if url is None:
+        url = 'none' if app.testing else os.path.join(app.instance_path, 'report_cache.db')
+
+    if url == 'none':
+        cache = None
+    elif url.startswith(('redis://', 'rediss://', 'unix://')):
+        cache = ReportCache(RedisCacheBackend(url), app.config.get('REPORT_CACHE_TTL', DEFAULT_TTL))
+    else:
+        backend = SQLiteCacheBackend(url, app.config.get('REPORT_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+        cache = ReportCache(backend, app.config.get('REPORT_CACHE_TTL', DEFAULT_TTL))
+    app.extensions['report_cache'] = cache
+    return cache
+
+
+def get_report_cache():
+    """Return the report cache of the current app, or None if disabled."""
+    return current_app.extensions.get('report_cache')
+
+
+def cached_report(view):
+    """
+    Cache the JSON responses of a report view.
+
+    The key is the endpoint, the caller's role and the normalized query
+    string. Only 200 responses are stored; streamed responses are never
+    cached. Backend failures are logged and the report is computed normally.
+    Must be applied below `@jwt_required()`.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = get_report_cache()
+        if cache is None or streaming_requested():
+            return view(*args, **kwargs)
+
+        try:
+            key = cache.key(
+                request.endpoint,
+                get_jwt().get('role'),
+                sorted(request.args.items(multi=True)),
+                sorted(kwargs.items())
+            )
+            body = cache.get(key)
+        except Exception as e:
+            current_app.logger.warning('Report cache unavailable: %s', e)
+            return view(*args, **kwargs)
+
+        if body is not None:
+            response = current_app.response_class(body, mimetype='application/json')
+            response.headers['X-Cache'] = 'HIT'
+            return response
+
+        response = current_app.make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            try:
+                cache.set(key, response.get_data())
+            except Exception as e:
+                current_app.logger.warning('Report cache unavailable: %s', e)
+        response.headers['X-Cache'] = 'MISS'
+        return response
+
+    return wrapper
+
+
+@contextlib.contextmanager
+def _key_lock(key):
+    """Hold the process-wide lock of one cache key; it is dropped once nobody uses it."""
+    with _key_locks_guard:
+        entry = _key_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _key_locks_guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del _key_locks[key]
+
+
+def snapshot_report(ttl_setting, default_ttl):
+    """
+    Serve the same JSON snapshot of a view to every caller for a short time.
+
+    Unlike cached_report, the snapshot is not invalidated by writes: it is
+    recomputed once it is `ttl_setting` seconds old (app config, default
+    `default_ttl`), so a view polled by many clients runs about once per
+    interval. Within a process a lock per key lets only one request
+    recompute a snapshot; the others wait for its result, while requests
+    for other keys (another role or query string) are not held up. The
+    key is the endpoint, the caller's role and the normalized query
+    string, as in cached_report. Must be applied below `@jwt_required()`.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_report_cache()
+            if cache is None:
+                return view(*args, **kwargs)
+
+            try:
+                # Not tied to the generation: writes do not refresh snapshots
+                key = 'snapshot:' + hashlib.sha1('|'.join(str(part) for part in (
+                    request.endpoint,
+                    get_jwt().get('role'),
+                    sorted(request.args.items(multi=True)),
+                    sorted(kwargs.items())
+                )).encode('utf-8')).hexdigest()
+                body = cache.get(key)
+            except Exception as e:
+                current_app.logger.warning('Report cache unavailable: %s', e)
+                return view(*args, **kwargs)
+
+            if body is None:
+                with _key_lock(key):
+                    # Another request may have refreshed it while this one waited
+                    body = cache.get(key)
+                    if body is None:
+                        response = current_app.make_response(view(*args, **kwargs))
+                        if response.status_code == 200:
+                            cache.set(key, response.get_data(), current_app.config.get(ttl_setting, default_ttl))
+                        response.headers['X-Cache'] = 'MISS'
+                        return response
+
+            response = current_app.response_class(body, mimetype='application/json')
+            response.headers['X-Cache'] = 'HIT'
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _track_invalidating_writes(connection, cursor, statement, parameters, context, executemany):
+    match = _WRITE_STATEMENT.match(statement)
+    if match and match.group(1).lower() in INVALIDATING_TABLES:
+        connection.info['report_cache_stale'] = True
+
+
+@event.listens_for(Engine, 'commit')
+def _mark_committed_writes(connection):
+    # Fires just before the DBAPI commit; the generation is bumped after it,
+    # so no worker can cache a report computed without the committed write
+    if connection.info.pop('report_cache_stale', False):
+        _pending.stale = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if not getattr(_pending, 'stale', False) or not has_app_context():
+        return
+    _pending.stale = False
+    cache = get_report_cache()
+    if cache is None:
+        return
+    try:
+        cache.invalidate()
+    except Exception as e:
+        current_app.logger.error('Could not invalidate the report cache: %s', e)
+
+
+@event.listens_for(Engine, 'rollback')
+def _forget_rolled_back_writes(connection):
+    connection.info.pop('report_cache_stale', None)
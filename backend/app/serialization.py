@@ -0,0 +1,182 @@
+"""
+Fast serialization of Core result rows.
+
+`RowSerializer` precompiles, per model and per set of fields, an encoder
+that turns a row selected with `columns()` into a dict by position, without
+going through ORM instances or `to_dict()`. Rows of models with an
+`updated_at` column can also be encoded straight to JSON; the encoded
+fragments are kept in a bounded LRU cache keyed by `(id, updated_at)`, and
+`FragmentJSONProvider` splices them into responses without re-encoding.
+"""
+import json
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+
+FRAGMENT_CACHE_SIZE = 10000
+
+
+class JSONFragment(str):
+    """Already encoded JSON text, written verbatim by FragmentJSONProvider."""
+
+    __slots__ = ()
+
+
+class LRUCache:
+    """Small thread-safe LRU mapping with a fixed number of entries."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def _dumps(data):
+    """Encode like Flask's default provider in production (sorted, compact)."""
+    return json.dumps(data, sort_keys=True, separators=(',', ':'))
+
+
+class RowSerializer:
+    """
+    Serializer for the rows of one table.
+
+    Args:
+        table: SQLAlchemy Table to serialize
+        exclude: Column names that are never exposed (e.g. password hashes)
+        cache: LRUCache for JSON fragments; only used if the table has
+            `id` and `updated_at` columns
+    """
+
+    def __init__(self, table, exclude=(), cache=None):
+        self.table = table
+        self.fields = tuple(column.key for column in table.c if column.key not in exclude)
+        self.cache = cache if {'id', 'updated_at'} <= set(table.c.keys()) else None
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def columns(self, fields=None):
+        """
+        Columns to select for `fields`, in the order the encoders expect.
+
+        The cache key columns are appended when they are not requested, so
+        every row selected this way can be cached.
+        """
+        return self._compile(fields)[1]
+
+    def encoder(self, fields=None):
+        """Return a function encoding a row (or row slice) selected with columns(fields) to a dict."""
+        return self._compile(fields)[2]
+
+    def fragment(self, row, fields=None):
+        """Encode a row selected with columns(fields) to a cached JSON fragment."""
+        names, _, encode, key_positions = self._compile(fields)
+        if self.cache is None:
+            return JSONFragment(_dumps(encode(row)))
+
+        key = (self.table.name, names) + tuple(row[position] for position in key_positions)
+        fragment = self.cache.get(key)
+        if fragment is None:
+            fragment = JSONFragment(_dumps(encode(row)))
+            self.cache.set(key, fragment)
+        return fragment
+
+    def _compile(self, fields):
+        names = self.fields if fields is None else tuple(fields)
+        compiled = self._compiled.get(names)
+        if compiled is not None:
+            return compiled
+
+        selected = list(names)
+        if self.cache is not None:
+            selected += [key for key in ('id', 'updated_at') if key not in selected]
+        columns = [self.table.c[name] for name in selected]
+
+        # Positional (name, index, converter) triples resolved once per fieldset
+        plan = []
+        for index, name in enumerate(names):
+            try:
+                python_type = self.table.c[name].type.python_type
+            except NotImplementedError:
+                python_type = None
+            converter = _isoformat if python_type in (datetime, date) else None
+            plan.append((name, index, converter))
+        plain = tuple((name, index) for name, index, converter in plan if converter is None)
+        converted = tuple((name, index, converter) for name, index, converter in plan if converter is not None)
+
+        def encode(row):
+            data = {name: row[index] for name, index in plain}
+            for name, index, converter in converted:
+                data[name] = converter(row[index])
+            return data
+
+        key_positions = (selected.index('id'), selected.index('updated_at')) if self.cache is not None else ()
+        compiled = (names, columns, encode, key_positions)
+        with self._lock:
+            self._compiled[names] = compiled
+        return compiled
+
+
+class FragmentJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that writes JSONFragment values without re-encoding them."""
+
+    def dumps(self, obj, **kwargs):
+        if not _contains_fragments(obj):
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj, kwargs)
+
+    def _encode(self, obj, kwargs):
+        if isinstance(obj, JSONFragment):
+            return str(obj)
+        if isinstance(obj, dict):
+            items = sorted(obj.items()) if self.sort_keys else obj.items()
+            return '{' + ','.join(
+                f'{json.dumps(str(key))}:{self._encode(value, kwargs)}' for key, value in items
+            ) + '}'
+        if isinstance(obj, (list, tuple)):
+            return '[' + ','.join(self._encode(value, kwargs) for value in obj) + ']'
+        return super().dumps(obj, **kwargs)
+
+
+def _contains_fragments(obj):
+    """
+    Check a response payload for JSON fragments.
+
+    Every item is inspected: a row whose nested object is None (a
+    transaction without a book, say) may precede rows holding fragments.
+    """
+    if isinstance(obj, JSONFragment):
+        return True
+    if isinstance(obj, dict):
+        return any(_contains_fragments(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_contains_fragments(value) for value in obj)
+    return False
+
+
+fragment_cache = LRUCache(FRAGMENT_CACHE_SIZE)
@@ -0,0 +1,81 @@
+"""
+Streaming JSON responses for large listings and reports.
+
+Rows are fetched with a server-side cursor (`yield_per`) and written as they
+arrive, either as a chunked JSON array or as NDJSON when the client sends
+`Accept: application/x-ndjson`.
+"""
+from flask import Response, current_app, request, stream_with_context
+from app import db
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_BATCH_SIZE = 500
+
+
+def ndjson_requested():
+    """Check if the client prefers NDJSON over a JSON document."""
+    best = request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+def streaming_requested():
+    """Check if the response should be streamed (NDJSON or `?stream=true`)."""
+    return ndjson_requested() or request.args.get('stream', '').lower() in ('1', 'true')
+
+
+def iter_rows(query):
+    """Execute a select with a server-side cursor, fetching STREAM_BATCH_SIZE rows at a time."""
+    return db.session.execute(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+
+
+def _buffered(pieces):
+    """Group small string pieces into chunks of roughly STREAM_BATCH_SIZE items."""
+    buffer = []
+    for piece in pieces:
+        buffer.append(piece)
+        if len(buffer) >= STREAM_BATCH_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def generate_json_array(items):
+    """Yield the pieces of a JSON array, one item at a time."""
+    dumps = current_app.json.dumps
+    yield '['
+    first = True
+    for item in items:
+        yield dumps(item) if first else ',' + dumps(item)
+        first = False
+    yield ']'
+
+
+def generate_ndjson(items):
+    """Yield one JSON document per line."""
+    dumps = current_app.json.dumps
+    for item in items:
+        yield dumps(item) + '\n'
+
+
+def stream_response(items, status=200):
+    """
+    Build a streamed response for an iterable of JSON-serializable items.
+
+    Args:
+        items: Iterable (usually a generator over database rows)
+        status: HTTP status code
+
+    Returns:
+        Flask Response that writes the items as they are produced
+    """
+    if ndjson_requested():
+        generator, mimetype = generate_ndjson(items), NDJSON_MIMETYPE
+    else:
+        generator, mimetype = generate_json_array(items), 'application/json'
+    return Response(stream_with_context(_buffered(generator)), status=status, mimetype=mimetype)
+
+
+def stream_pieces(pieces, mimetype='application/json', status=200):
+    """Stream pre-encoded string pieces, e.g. a JSON object assembled incrementally."""
+    return Response(stream_with_context(_buffered(pieces)), status=status, mimetype=mimetype)
@@ -0,0 +1,27 @@
+"""Indice de estoque por secao e genero
+
+Revision ID: 4e7b2c9a1f63
+Revises: 9c5e1a7d3b84
+Create Date: 2026-10-18 20:58:31.204417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e7b2c9a1f63'
+down_revision = '9c5e1a7d3b84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # O novo índice começa pelas mesmas colunas e cobre também a contagem por gênero
+    op.create_index('ix_books_section_status_genre', 'books', ['storage_section', 'status', 'genre'], unique=False)
+    op.drop_index('ix_books_storage_section_status', table_name='books')
+
+
+def downgrade():
+    op.create_index('ix_books_storage_section_status', 'books', ['storage_section', 'status'], unique=False)
+    op.drop_index('ix_books_section_status_genre', table_name='books')
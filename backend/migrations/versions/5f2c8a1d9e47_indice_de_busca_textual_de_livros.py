@@ -0,0 +1,96 @@
+"""Indice de busca textual de livros
+
+Revision ID: 5f2c8a1d9e47
+Revises: 332333378660
+Create Date: 2026-10-18 09:12:31.104522
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f2c8a1d9e47'
+down_revision = '332333378660'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+        title, author, description, genre,
+        content='books', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, author, description, genre)
+        VALUES (new.id, new.title, new.author, new.description, new.genre);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, description, genre)
+        VALUES ('delete', old.id, old.title, old.author, old.description, old.genre);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author, description, genre ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, description, genre)
+        VALUES ('delete', old.id, old.title, old.author, old.description, old.genre);
+        INSERT INTO books_fts(rowid, title, author, description, genre)
+        VALUES (new.id, new.title, new.author, new.description, new.genre);
+    END
+    """,
+]
+
+# Re-index every existing row, used when the index is added to a populated table
+SQLITE_SEARCH_REBUILD = "INSERT INTO books_fts(books_fts) VALUES ('rebuild')"
+
+POSTGRESQL_SEARCH_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'pt_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION pt_unaccent (COPY = portuguese);
+            ALTER TEXT SEARCH CONFIGURATION pt_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+        END IF;
+    END $$
+    """,
+    """
+    ALTER TABLE books ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('pt_unaccent', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('pt_unaccent', coalesce(author, '')), 'B') ||
+        setweight(to_tsvector('pt_unaccent', coalesce(genre, '')), 'C') ||
+        setweight(to_tsvector('pt_unaccent', coalesce(description, '')), 'D')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_books_search_vector ON books USING gin (search_vector)",
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_SEARCH_DDL:
+            op.execute(statement)
+        op.execute(SQLITE_SEARCH_REBUILD)
+    elif dialect == 'postgresql':
+        for statement in POSTGRESQL_SEARCH_DDL:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS books_fts_au')
+        op.execute('DROP TRIGGER IF EXISTS books_fts_ad')
+        op.execute('DROP TRIGGER IF EXISTS books_fts_ai')
+        op.execute('DROP TABLE IF EXISTS books_fts')
+    elif dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_books_search_vector')
+        op.execute('ALTER TABLE books DROP COLUMN IF EXISTS search_vector')
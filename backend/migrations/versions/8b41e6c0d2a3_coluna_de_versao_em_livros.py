@@ -0,0 +1,24 @@
+"""Coluna de versao em livros
+
+Revision ID: 8b41e6c0d2a3
+Revises: 5f2c8a1d9e47
+Create Date: 2026-10-18 10:47:05.218930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b41e6c0d2a3'
+down_revision = '5f2c8a1d9e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('books', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    op.drop_column('books', 'version')
@@ -0,0 +1,28 @@
+"""
+Shared fixtures: an app built by the factory on a temporary SQLite database.
+"""
+import pytest
+from app import create_app, db
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "test.db"}',
+        'JWT_SECRET_KEY': 'test-jwt-secret-key-of-at-least-32-bytes',
+        'REPORT_CACHE_URL': 'none',
+        'REPORT_EXPORT_DIR': str(tmp_path / 'exports'),
+        'ANALYTICS_SNAPSHOT_DIR': str(tmp_path / 'analytics_snapshot'),
+        'SIMILARITY_INDEX_PATH': str(tmp_path / 'similar_books.npz'),
+    })
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
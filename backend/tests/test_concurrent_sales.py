@@ -0,0 +1,95 @@
+"""
+Concurrent sales: no copy is ever sold twice.
+
+Several threads sell the same copies at once, one by one through
+`sell_book` and in batches through `sell_books_bulk`. Every copy must end
+up with exactly one sale transaction, and the incremental occupancy
+counters must match a rebuild from the books table.
+"""
+import random
+import threading
+from sqlalchemy import func, insert, select
+from app import db
+from app.modules.inventory.models import Book, Transaction
+from app.modules.logistics.models import SectionOccupancy, StorageSection
+from app.modules.logistics.occupancy import OCCUPANCY_STATUSES, rebuild_occupancy
+from app.modules.user_management.models import User
+
+BOOK_COUNT = 60
+THREADS = 8
+BATCH_SIZE = 5
+
+
+def _occupancy():
+    return {
+        row.section: tuple(getattr(row, status) for status in OCCUPANCY_STATUSES)
+        for row in db.session.execute(select(SectionOccupancy)).scalars()
+    }
+
+
+def test_each_copy_is_sold_exactly_once(app):
+    db.session.add(User('caixa', 'caixa@example.com', 'senha'))
+    db.session.add_all([StorageSection('A1', 'Seção A1', 100), StorageSection('B2', 'Seção B2', 100)])
+    db.session.execute(insert(Book.__table__), [
+        {'title': f'Livro {number}', 'author': 'Autor', 'storage_section': ('A1', 'B2')[number % 2],
+         'status': 'available'}
+        for number in range(BOOK_COUNT)
+    ])
+    rebuild_occupancy()
+    db.session.commit()
+    book_ids = list(db.session.execute(select(Book.id)).scalars())
+
+    sold_by_request = []
+    failures = []
+    start = threading.Barrier(THREADS)
+
+    def register(seed):
+        client = app.test_client()
+        order = list(book_ids)
+        random.Random(seed).shuffle(order)
+        sold = []
+        start.wait()
+        try:
+            if seed % 2:
+                for book_id in order:
+                    response = client.post(f'/api/inventory/books/{book_id}/sell', json={})
+                    assert response.status_code in (200, 400), response.get_data(as_text=True)
+                    if response.status_code == 200:
+                        sold.append(book_id)
+            else:
+                for position in range(0, len(order), BATCH_SIZE):
+                    response = client.post(
+                        '/api/inventory/books/bulk-sell', json={'book_ids': order[position:position + BATCH_SIZE]}
+                    )
+                    assert response.status_code == 200, response.get_data(as_text=True)
+                    sold.extend(response.get_json()['sold'])
+        except Exception as e:
+            failures.append(e)
+        sold_by_request.extend(sold)
+
+    threads = [threading.Thread(target=register, args=(seed,)) for seed in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not failures, failures
+    # Every copy was reported sold to exactly one register...
+    assert sorted(sold_by_request) == sorted(book_ids)
+
+    # ...and recorded exactly one sale
+    db.session.expire_all()
+    sales = dict(db.session.execute(
+        select(Transaction.book_id, func.count())
+        .where(Transaction.transaction_type == 'sale')
+        .group_by(Transaction.book_id)
+    ).all())
+    assert sales == {book_id: 1 for book_id in book_ids}
+    assert db.session.execute(select(func.count()).where(Book.status != 'sold')).scalar() == 0
+
+    # The incremental counters agree with a full rebuild
+    counters = _occupancy()
+    rebuild_occupancy()
+    db.session.commit()
+    assert counters == _occupancy()
+    assert counters == {'A1': (0, 0, BOOK_COUNT // 2), 'B2': (0, 0, BOOK_COUNT // 2)}
@@ -0,0 +1,137 @@
+"""
+Keyset pagination, page size limits and sparse fieldsets of the listings.
+"""
+import base64
+import json
+from datetime import datetime
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert
+from app import db
+from app.modules.inventory.models import Book, Transaction
+from app.modules.inventory.pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor
+from app.modules.user_management.models import User
+
+BOOK_COUNT = MAX_PAGE_SIZE + 5
+
+
+def _cursor(values):
+    """Encode arbitrary JSON as a cursor, the way a client could forge one."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+# Well-formed base64 and JSON, wrong content
+INVALID_ID_CURSORS = ['W10', 'W251bGxd', 'WyJhIl0', _cursor([1, 2]), _cursor([True]), _cursor({'id': 1}), '%%%']
+INVALID_KEYSET_CURSORS = [_cursor(['2026-01-01T00:00:00', None]), _cursor(['2026-01-01T00:00:00']),
+                          _cursor([None, 1]), _cursor(['ontem', 1]), 'W10']
+
+
+@pytest.fixture
+def books(app):
+    db.session.execute(insert(Book.__table__), [
+        {'title': f'Livro {number}', 'author': 'Autor', 'genre': ('Romance', 'Poesia')[number % 2],
+         'status': 'available'}
+        for number in range(BOOK_COUNT)
+    ])
+    db.session.commit()
+
+
+@pytest.fixture
+def admin_headers(app):
+    db.session.add(User('admin', 'admin@example.com', 'senha', role='admin'))
+    db.session.commit()
+    return {'Authorization': 'Bearer ' + create_access_token(identity='1', additional_claims={'role': 'admin'})}
+
+
+def test_cursor_round_trip():
+    moment = datetime(2026, 10, 18, 12, 30)
+    assert decode_cursor(encode_cursor([moment, 7]), 2, datetime_positions=(0,)) == [moment, 7]
+    assert decode_cursor(encode_cursor([42]), 1) == [42]
+
+
+@pytest.mark.parametrize('cursor', INVALID_ID_CURSORS)
+def test_decode_cursor_rejects_malformed_cursors(cursor):
+    with pytest.raises(ValueError, match='^Invalid cursor$'):
+        decode_cursor(cursor, 1)
+
+
+def test_keyset_pages_cover_every_book_once(client, books):
+    seen = []
+    cursor = None
+    while True:
+        response = client.get('/api/inventory/books', query_string={'limit': 60, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        page = response.get_json()
+        seen.extend(item['id'] for item in page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert seen == sorted(seen)
+    assert len(seen) == len(set(seen)) == BOOK_COUNT
+
+
+def test_limit_is_capped(client, books):
+    page = client.get('/api/inventory/books?limit=1000').get_json()
+    assert len(page['items']) == MAX_PAGE_SIZE
+    assert page['next_cursor'] is not None
+
+
+@pytest.mark.parametrize('limit', ['0', '-3', 'dez'])
+def test_invalid_limit_is_rejected(client, limit):
+    assert client.get(f'/api/inventory/books?limit={limit}').status_code == 400
+
+
+def test_fields_select_columns(client, books):
+    page = client.get('/api/inventory/books?fields=title,genre&limit=3').get_json()
+    assert [sorted(item) for item in page['items']] == [['genre', 'title']] * 3
+    # The keyset column is still read, so the cursor works without `id` in the fields
+    next_page = client.get('/api/inventory/books', query_string={'fields': 'id', 'cursor': page['next_cursor']})
+    assert next_page.get_json()['items'][0] == {'id': 4}
+
+
+def test_unknown_field_is_rejected(client):
+    response = client.get('/api/inventory/books?fields=title,password')
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Unknown field: password'}
+
+
+@pytest.mark.parametrize('cursor', INVALID_ID_CURSORS)
+def test_invalid_cursor_on_books(client, cursor):
+    response = client.get('/api/inventory/books', query_string={'cursor': cursor})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}
+
+
+@pytest.mark.parametrize('cursor', INVALID_ID_CURSORS)
+def test_invalid_cursor_on_inventory_report(client, admin_headers, cursor):
+    response = client.get('/api/reports/inventario', query_string={'cursor': cursor}, headers=admin_headers)
+    assert response.status_code == 400
+    assert response.get_json() == {'erro': 'Invalid cursor'}
+
+
+@pytest.mark.parametrize('cursor', INVALID_KEYSET_CURSORS)
+def test_invalid_cursor_on_sales_report(client, admin_headers, cursor):
+    response = client.get('/api/reports/vendas', query_string={'cursor': cursor}, headers=admin_headers)
+    assert response.status_code == 400
+    assert response.get_json() == {'erro': 'Invalid cursor'}
+
+
+def test_sales_report_pages(client, books, admin_headers):
+    db.session.execute(insert(Transaction.__table__), [
+        {'book_id': number + 1, 'user_id': 1, 'transaction_type': 'sale', 'created_at': datetime.utcnow()}
+        for number in range(25)
+    ])
+    db.session.commit()
+
+    seen = []
+    cursor = None
+    while True:
+        response = client.get('/api/reports/vendas', headers=admin_headers,
+                              query_string={'limit': 10, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        page = response.get_json()
+        seen.extend(sale['id_transacao'] for sale in page['vendas'])
+        cursor = page['proximo_cursor']
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 25
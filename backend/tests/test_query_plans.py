@@ -0,0 +1,103 @@
+"""
+Query plan regression suite for the hot endpoints.
+
+Each case calls a real endpoint on a seeded database, captures every
+SELECT it sends, and runs `EXPLAIN QUERY PLAN` on the statement with its
+parameters. The case fails when a watched table is read with a full table
+scan, so a dropped or mismatched index, or a query rewrite that no longer
+matches the indexes, shows up here. No query is copied: the statements are
+exactly those the endpoints run.
+"""
+from datetime import datetime, timedelta
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, insert
+from app import db
+from app.modules.inventory.models import Book, Transaction
+from app.modules.logistics.models import StorageSection
+from app.modules.logistics.occupancy import rebuild_occupancy
+from app.modules.user_management.models import User
+
+# Tables large enough that a full scan on a hot path is a regression
+WATCHED_TABLES = ('books', 'transactions', 'daily_transaction_rollups')
+
+HOT_REQUESTS = [
+    ('inventory.get_books?status', '/api/inventory/books?status=available'),
+    ('inventory.get_books?genre', '/api/inventory/books?genre=Romance&limit=20'),
+    ('inventory.get_books?status&genre', '/api/inventory/books?status=available&genre=Romance'),
+    ('inventory.get_books?section', '/api/inventory/books?section=FICT-A1&limit=20'),
+    ('inventory.get_book_history', '/api/inventory/books/1/history'),
+    ('logistics.buscar_livros_por_secao', '/api/logistics/sections/FICT-A1/books'),
+    ('logistics.estatisticas_secoes', '/api/logistics/sections/stats'),
+    ('logistics.recomendar_estoque', '/api/logistics/recommendations'),
+    ('logistics.sugerir_reposicao', '/api/logistics/reorder'),
+    ('reporting.relatorio_inventario?status', '/api/reports/inventario?status=available&summary_only=true'),
+    ('reporting.relatorio_inventario?section', '/api/reports/inventario?section=FICT-A1&limit=20'),
+    ('reporting.relatorio_vendas', '/api/reports/vendas?limit=20'),
+    ('reporting.relatorio_desempenho', '/api/reports/desempenho?por_dia=true'),
+    ('reporting.generos_populares', '/api/reports/generos-populares'),
+    ('reporting.serie_temporal (hour)', '/api/reports/series?granularidade=hour&agrupar_por=section'),
+    ('reporting.serie_temporal (day)', '/api/reports/series?granularidade=day&agrupar_por=genre'),
+    ('reporting.painel_indicadores', '/api/reports/dashboard'),
+]
+
+
+@pytest.fixture
+def seeded(app):
+    db.session.add(User('admin', 'admin@example.com', 'senha', role='admin'))
+    db.session.add_all([StorageSection('FICT-A1', 'Ficção A1', 500), StorageSection('FICT-A2', 'Ficção A2', 500)])
+    db.session.execute(insert(Book.__table__), [
+        {'title': f'Livro {number}', 'author': 'Autor', 'genre': ('Romance', 'Poesia')[number % 2],
+         'storage_section': ('FICT-A1', 'FICT-A2', None)[number % 3], 'status': 'available'}
+        for number in range(200)
+    ])
+    now = datetime.utcnow()
+    db.session.execute(insert(Transaction.__table__), [
+        {'book_id': number % 200 + 1, 'user_id': 1, 'transaction_type': 'sale', 'from_section': 'FICT-A1',
+         'created_at': now - timedelta(hours=number)}
+        for number in range(300)
+    ])
+    rebuild_occupancy()
+    db.session.commit()
+    return {'Authorization': 'Bearer ' + create_access_token(identity='1', additional_claims={'role': 'admin'})}
+
+
+@pytest.fixture
+def captured_selects(app):
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    yield statements
+    event.remove(db.engine, 'before_cursor_execute', capture)
+
+
+def full_table_scans(statement, parameters):
+    """Return the watched tables that SQLite reads without an index for a statement."""
+    plan = db.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)
+    scans = []
+    for line in (row[3] for row in plan):
+        # 'SCAN books' is a full scan; 'SCAN books USING [COVERING] INDEX ...' is not
+        if line.startswith('SCAN ') and 'USING' not in line:
+            table_name = line.split()[1]
+            if table_name in WATCHED_TABLES and table_name not in scans:
+                scans.append(table_name)
+    return scans
+
+
+@pytest.mark.parametrize('url', [url for _, url in HOT_REQUESTS], ids=[name for name, _ in HOT_REQUESTS])
+def test_hot_queries_use_indexes(client, seeded, captured_selects, url):
+    response = client.get(url, headers=seeded)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    statements = list(captured_selects)
+    assert statements, 'the endpoint ran no query'
+
+    regressions = {
+        ' '.join(statement.split()): scans
+        for statement, parameters in statements
+        if (scans := full_table_scans(statement, parameters))
+    }
+    assert not regressions
@@ -0,0 +1,45 @@
+"""
+Slotting: fast-selling books get the prime sections.
+"""
+from app import db
+from app.modules.logistics.models import StorageSection
+from app.modules.logistics.slotting import plan_slots
+
+
+def _sections(*capacities):
+    sections = [StorageSection(f'S{number}', f'Seção {number}', capacity) for number, capacity in enumerate(capacities)]
+    db.session.add_all(sections)
+    db.session.commit()
+    return [section.to_dict() for section in sections]
+
+
+def test_fast_books_take_the_first_sections(app):
+    sections = _sections(10, 10, 10)
+    # Slow books first, so input order alone would give them the first section
+    books = [{'genre': 'Romance', 'velocity': 0.1}] * 20 + [{'genre': 'Romance', 'velocity': 5.0}] * 10
+
+    plan = plan_slots(books, sections)
+
+    assert plan[20:] == ['S0'] * 10
+    assert sorted(plan[:20]) == ['S1'] * 10 + ['S2'] * 10
+
+
+def test_velocity_orders_groups_across_genres(app):
+    sections = _sections(5, 5)
+    books = [{'genre': 'Poesia', 'velocity': 0}] * 5 + [{'genre': 'Romance', 'velocity': 3.0}] * 5
+
+    plan = plan_slots(books, sections)
+
+    assert plan == ['S1'] * 5 + ['S0'] * 5
+
+
+def test_genre_match_still_outweighs_velocity(app):
+    sections = _sections(10, 10)
+    db.session.execute(db.text(
+        "INSERT INTO books (title, author, genre, storage_section, status, version) "
+        "VALUES ('Livro', 'Autor', 'Poesia', 'S1', 'available', 1)"
+    ))
+    db.session.commit()
+    books = [{'genre': 'Poesia', 'velocity': 4.0}] * 3
+
+    assert plan_slots(books, sections) == ['S1'] * 3
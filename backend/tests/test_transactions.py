@@ -0,0 +1,98 @@
+"""
+Transaction listing: access without a token and the number of queries a page costs.
+
+The listing embeds the book and user of every transaction through outer
+joins, so the number of SELECTs must not grow with the number of rows.
+"""
+from datetime import datetime, timedelta
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, insert
+from app import db
+from app.modules.inventory.models import Book, Transaction
+from app.modules.user_management.models import User
+
+TRANSACTION_COUNT = 120
+
+
+@pytest.fixture
+def transactions(app):
+    db.session.add_all([User('admin', 'admin@example.com', 'senha', role='admin'),
+                        User('leitor', 'leitor@example.com', 'senha')])
+    db.session.execute(insert(Book.__table__), [
+        {'title': f'Livro {number}', 'author': 'Autor', 'status': 'available'}
+        for number in range(40)
+    ])
+    now = datetime.utcnow()
+    db.session.execute(insert(Transaction.__table__), [
+        {'book_id': number % 40 + 1, 'user_id': number % 2 + 1, 'transaction_type': 'sale',
+         'created_at': now - timedelta(minutes=number)}
+        for number in range(TRANSACTION_COUNT)
+    ])
+    db.session.commit()
+
+
+@pytest.fixture
+def counted_selects(app):
+    statements = []
+
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    yield statements
+    event.remove(db.engine, 'before_cursor_execute', capture)
+
+
+def test_transactions_without_token(client, transactions):
+    response = client.get('/api/inventory/transactions')
+    assert response.status_code == 200, response.get_data(as_text=True)
+    # Without a token the listing runs as the fixed test user, with full access
+    assert len(response.get_json()) == TRANSACTION_COUNT
+
+
+def test_transactions_with_token_are_limited_to_the_user(client, transactions):
+    headers = {'Authorization': 'Bearer ' + create_access_token(identity='2', additional_claims={'role': 'user'})}
+    response = client.get('/api/inventory/transactions', headers=headers)
+    assert response.status_code == 200
+    assert {item['user_id'] for item in response.get_json()} == {2}
+
+
+@pytest.mark.parametrize('query_string', [
+    {},
+    {'fields': 'id,book_id,transaction_type,book,user'},
+    {'fields': 'id,book_id,book,user', 'limit': 50},
+])
+def test_transactions_query_count_is_fixed(client, transactions, counted_selects, query_string):
+    response = client.get('/api/inventory/transactions', query_string=query_string)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    body = response.get_json()
+    items = body['items'] if 'limit' in query_string else body
+    assert items
+    if 'fields' in query_string:
+        assert all(item['book']['id'] == item['book_id'] for item in items)
+        assert all(item['user']['username'] in ('admin', 'leitor') for item in items)
+    assert len(counted_selects) == 1
+
+
+def test_transaction_pages(client, transactions):
+    seen = []
+    cursor = None
+    while True:
+        response = client.get('/api/inventory/transactions',
+                              query_string={'limit': 50, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        page = response.get_json()
+        seen.extend(item['id'] for item in page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == TRANSACTION_COUNT
+
+
+@pytest.mark.parametrize('cursor', ['W10', 'WyIyMDI2LTAxLTAxVDAwOjAwOjAwIiwgbnVsbF0', '%%%'])
+def test_invalid_transaction_cursor(client, cursor):
+    response = client.get('/api/inventory/transactions', query_string={'cursor': cursor})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'Invalid cursor'}